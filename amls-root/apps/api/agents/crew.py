@@ -1,20 +1,35 @@
+import json
 import os
 from dotenv import load_dotenv
-from crewai import Agent, Task, Crew, Process
-from langchain_google_genai import ChatGoogleGenerativeAI
-from tools.search_tools import search_syllabi, format_roadmap_json, validate_prerequisites, web_syllabus_search, find_resource_links
+from crewai import Agent, Task, Crew, Process, LLM
+from core.llm_scheduler import rate_limited, PRIORITY_INTERACTIVE
+from core.llm_cache import cached, get_completion_cache
+from core.telemetry import install_crew_telemetry
+from core.roadmap import NOT_A_ROADMAP, ordered_roadmap, parse_roadmap, roadmap_problems
+from tools.search_tools import search_syllabi, validate_prerequisites, web_syllabus_search, find_resource_links
 
 # 1. Force Python to load the GEMINI_API_KEY from your .env file
 load_dotenv(override=True)
 
+completion_cache = get_completion_cache()
+
+# Crew, task, agent, LLM and tool spans for /metrics, tagged with the running job id
+install_crew_telemetry()
+
+def wrap_llm(llm):
+    """Route a crewai LLM's calls through the completion cache and the process-wide Gemini scheduler. Returns the same llm object."""
+    # Agent(llm=...) would rebuild anything that isn't a crewai LLM and drop the wrapping, so this has to be one
+    return cached(rate_limited(llm, priority=PRIORITY_INTERACTIVE), completion_cache)
+
 # 2. Define the Gemini LLM explicitly
-gemini_llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash", # The core reasoning engine for your agents
-    verbose=True,
+# Every roadmap worker shares one RPM/TPM budget, so concurrent jobs don't trigger 429 retry storms
+gemini_llm = wrap_llm(LLM(
+    model="gemini/gemini-2.5-flash", # The core reasoning engine for your agents
+    api_key=os.getenv("GEMINI_API_KEY"),
     temperature=0.5,
-    google_api_key=os.getenv("GEMINI_API_KEY"),
-    max_retries=5
-)
+    # Retry 429/5xx in the google-genai client, as langchain's max_retries=5 used to
+    client_params={"http_options": {"retry_options": {"attempts": 5}}}
+))
 
 def generate_roadmap(skill: str):
     # Agent 1: Researcher
@@ -33,7 +48,7 @@ def generate_roadmap(skill: str):
         role='Micro-Learning Architect',
         goal='Synthesize research into a step-by-step roadmap.',
         backstory='You design engaging and effective micro-learning paths optimized for student success.',
-        tools=[format_roadmap_json],
+        tools=[],
         llm=gemini_llm, # <--- Hooking up the Gemini Brain
         verbose=True,
         allow_delegation=False
@@ -69,17 +84,11 @@ def generate_roadmap(skill: str):
     )
 
     design_task = Task(
-        description='Using the research summary, create a structured step-by-step learning roadmap. Format the output strictly as JSON. Make sure to include a "source_urls" array in the root of the JSON object containing any URLs found in the research phase.',
+        description='Using the research summary, create a structured step-by-step learning roadmap. Format the output strictly as JSON. Give every step in "learning_path" a "title", a "topics" array and a "prerequisites" array with the titles of the earlier steps it builds on (empty for foundational steps). Make sure to include a "source_urls" array in the root of the JSON object containing any URLs found in the research phase.',
         expected_output='A JSON structured learning roadmap with title, description, learning_path, and source_urls.',
         agent=designer
     )
 
-    qa_task = Task(
-        description='Review the proposed JSON learning roadmap to ensure it is logically sequenced and foundational skills are not skipped. Make corrections if necessary.',
-        expected_output='The final validated JSON learning roadmap.',
-        agent=critic
-    )
-
     # content_gathering_task = Task(
     #     description='Take the validated JSON learning roadmap from the Critic. Iterate through...',
     #     expected_output='...',
@@ -88,15 +97,35 @@ def generate_roadmap(skill: str):
 
     # Form the Crew
     amls_crew = Crew(
-        agents=[researcher, designer, critic],
-        tasks=[research_task, design_task, qa_task],
+        agents=[researcher, designer],
+        tasks=[research_task, design_task],
         process=Process.sequential,
-        verbose=True,
-        max_rpm=15
+        verbose=True
     )
 
     # Kickoff the process
     result = amls_crew.kickoff()
     
     # Safely extract the raw string output from the CrewOutput object
-    return getattr(result, 'raw', str(result))
\ No newline at end of file
+    draft = getattr(result, 'raw', str(result))
+
+    # Prerequisites are checked in code; the Critic only gets an LLM round trip when that check finds something to fix
+    roadmap = parse_roadmap(draft)
+    problems = roadmap_problems(roadmap) if roadmap is not None else [NOT_A_ROADMAP]
+    if not problems:
+        return json.dumps(ordered_roadmap(roadmap))
+
+    print(f"Roadmap draft failed validation, sending it to QA: {problems}")
+    problem_list = "\n".join(f"- {problem}" for problem in problems)
+    qa_task = Task(
+        description=f'Fix the JSON learning roadmap below. The Prerequisite Validator found these problems:\n{problem_list}\n\nCorrect them while keeping the roadmap logically sequenced and without skipping foundational skills, then check your corrected roadmap with the Prerequisite Validator tool. Keep the "source_urls" array.\n\nRoadmap:\n{draft}',
+        expected_output='The final validated JSON learning roadmap.',
+        agent=critic
+    )
+    qa_result = Crew(
+        agents=[critic],
+        tasks=[qa_task],
+        process=Process.sequential,
+        verbose=True
+    ).kickoff()
+    return getattr(qa_result, 'raw', str(qa_result))
@@ -0,0 +1,115 @@
+"""Compare the torch, ONNX and int8 ONNX embedding backends on CPU.
+
+For each backend this reports batch throughput, single-query latency and the
+cosine similarity of its vectors against the PyTorch reference, so a backend
+is only switched on once its vectors agree with the ones already in the index.
+
+Usage (from apps/api):
+    python benchmarks/bench_embedding_backends.py
+    python benchmarks/bench_embedding_backends.py --backends torch onnx-int8 --texts 2000
+    python benchmarks/bench_embedding_backends.py --dataset data/courses.json
+"""
+import argparse
+import itertools
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.dataset import build_course_document, iter_courses
+from core.embedding_backends import BACKEND_TORCH, EMBEDDING_BACKENDS, load_sentence_transformer
+from core.models import EMBEDDING_MODEL_NAME
+
+SAMPLE_TEXTS = [
+    "Introduction to Python programming for beginners",
+    "Machine learning fundamentals: regression, classification and clustering",
+    "Advanced React patterns and state management",
+    "Data structures and algorithms interview preparation",
+    "Cloud computing with AWS: EC2, S3 and Lambda",
+    "Statistics for data science with hands-on exercises",
+    "Building REST APIs with FastAPI and PostgreSQL",
+    "Deep learning for computer vision using convolutional networks",
+    "Project management essentials and agile methodologies",
+    "UX design principles and prototyping in Figma",
+    "SQL for analysts: joins, window functions and query tuning",
+    "Natural language processing with transformers",
+]
+
+
+def summarize(name, timings_s):
+    timings_ms = sorted(t * 1e3 for t in timings_s)
+    p95 = timings_ms[max(0, int(len(timings_ms) * 0.95) - 1)]
+    print(f"{name:<10} n={len(timings_ms):<5} mean={statistics.mean(timings_ms):8.2f}ms "
+          f"p50={statistics.median(timings_ms):8.2f}ms p95={p95:8.2f}ms")
+
+
+def load_texts(dataset, count):
+    texts = SAMPLE_TEXTS
+    if dataset:
+        # The same text the ingestion embeds, so parity is measured on real index inputs
+        texts = [build_course_document(item)[1] for item in itertools.islice(iter_courses(dataset), count)] or SAMPLE_TEXTS
+    # Repeat the pool up to count, varying each copy so no two inputs are identical
+    return [f"{texts[i % len(texts)]} ({i // len(texts)})" if i >= len(texts) else texts[i] for i in range(count)]
+
+
+def measure(model, texts, batch_size, latency_queries):
+    model.encode(texts[:batch_size], batch_size=batch_size, show_progress_bar=False)  # warm up
+
+    started = time.perf_counter()
+    vectors = model.encode(texts, batch_size=batch_size, show_progress_bar=False, normalize_embeddings=True)
+    throughput = len(texts) / (time.perf_counter() - started)
+
+    timings = []
+    for text in texts[:latency_queries]:
+        started = time.perf_counter()
+        model.encode(text, show_progress_bar=False)
+        timings.append(time.perf_counter() - started)
+    return np.asarray(vectors, dtype=np.float32), throughput, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    parser.add_argument("--backends", nargs="+", choices=EMBEDDING_BACKENDS, default=list(EMBEDDING_BACKENDS))
+    parser.add_argument("--texts", type=int, default=1000, help="Texts encoded for the throughput and parity runs.")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--latency-queries", type=int, default=200)
+    parser.add_argument("--dataset", default=None, help="Course JSON to draw texts from instead of the built-in samples.")
+    parser.add_argument("--min-cosine", type=float, default=0.99,
+                        help="Flag a backend whose worst-case cosine against torch falls below this.")
+    args = parser.parse_args()
+
+    texts = load_texts(args.dataset, args.texts)
+    backends = [BACKEND_TORCH] + [b for b in args.backends if b != BACKEND_TORCH]
+    reference, results = None, {}
+
+    for backend in backends:
+        started = time.perf_counter()
+        model = load_sentence_transformer(args.model, backend=backend)
+        print(f"Loaded {backend} in {(time.perf_counter() - started):.2f}s")
+        vectors, throughput, timings = measure(model, texts, args.batch_size, args.latency_queries)
+        if reference is None:
+            reference = vectors
+        cosines = np.sum(vectors * reference, axis=1)
+        results[backend] = (throughput, timings, cosines)
+        del model
+
+    print(f"\n{len(texts)} texts, batch {args.batch_size}, model {args.model}\n")
+    print("Throughput:")
+    for backend, (throughput, _, _) in results.items():
+        print(f"{backend:<10} {throughput:9.1f} texts/s  ({throughput / results[BACKEND_TORCH][0]:.2f}x torch)")
+    print("\nSingle-query latency:")
+    for backend, (_, timings, _) in results.items():
+        summarize(backend, timings)
+    print("\nCosine agreement with torch:")
+    for backend, (_, _, cosines) in results.items():
+        flag = "" if cosines.min() >= args.min_cosine else f"  BELOW {args.min_cosine}"
+        print(f"{backend:<10} mean={cosines.mean():.5f} min={cosines.min():.5f}{flag}")
+
+
+if __name__ == "__main__":
+    main()
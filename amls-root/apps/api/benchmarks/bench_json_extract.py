@@ -0,0 +1,112 @@
+"""Compare the old regex JSON extraction with core.json_extract on large LLM replies.
+
+Each case is a synthetic agent reply, mostly built around a known roadmap.
+The "legacy" extractors are the regexes _run_roadmap_crew and
+MasterFlow.execute_macro_planning used before: the fenced-block pattern with
+a greedy {.*}|[.*] fallback, and the bare greedy {.*}. The report shows each
+extractor's median time and whether it recovered the expected result.
+
+Usage (from apps/api):
+    python benchmarks/bench_json_extract.py
+    python benchmarks/bench_json_extract.py --sizes 10000 1000000 --repeat 5
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.json_extract import extract_json
+
+
+def legacy_roadmap(text):
+    match = re.search(r'```(?:json)?\s*(\{.*\}|\[.*\])\s*```', text.strip(), re.DOTALL)
+    if match is None:
+        match = re.search(r'(\{.*\}|\[.*\])', text.strip(), re.DOTALL)
+    return json.loads(match.group(1)) if match else None
+
+
+def legacy_blueprint(text):
+    match = re.search(r'\{.*\}', text, re.DOTALL)
+    return json.loads(match.group(0)) if match else None
+
+
+EXTRACTORS = {
+    "legacy-roadmap": legacy_roadmap,
+    "legacy-blueprint": legacy_blueprint,
+    "extract_json": extract_json,
+}
+
+
+def make_roadmap(steps):
+    return {
+        "title": "Python Programming Roadmap",
+        "learning_path": [
+            {"step": i, "title": f"Module {i}", "description": f"Covers {{topic {i}}} and [exercise {i}].", "topics": ["a", "b", "c"]}
+            for i in range(1, steps + 1)
+        ],
+        "source_urls": ["https://roadmap.sh/python"],
+    }
+
+
+def _pad(size, unit):
+    return unit * max(1, size // len(unit))
+
+
+# name -> (reply builder, description); each builder gets the roadmap JSON and a target size
+CASES = {
+    "fenced": (lambda doc, size: f"{_pad(size, 'Thought: compiling the research. ')}\n```json\n{doc}\n```\n",
+               "prose, then the roadmap in a ```json fence"),
+    "chatty": (lambda doc, size: f"{_pad(size // 2, 'I looked at {syllabus} and [notes]. ')}\n{doc}\n{_pad(size // 2, 'Note: see {appendix}. ')}",
+               "braces and brackets in the prose on both sides"),
+    "no-json": (lambda doc, size: _pad(size, "Thought: {still researching "),
+                "no roadmap at all, only unclosed braces (the regexes' worst case)"),
+}
+
+
+def run_case(extractor, reply, expected, repeat):
+    timings, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        try:
+            result = extractor(reply)
+        except ValueError:
+            result = None
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result == expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000, 1_000_000],
+                        help="Approximate characters of surrounding prose per reply.")
+    parser.add_argument("--steps", type=int, default=50, help="Learning path steps in the embedded roadmap.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--extractors", nargs="+", choices=list(EXTRACTORS), default=list(EXTRACTORS))
+    parser.add_argument("--max-legacy-size", type=int, default=100_000,
+                        help="Skip the legacy regexes on the 'no-json' case above this size; they are quadratic there.")
+    args = parser.parse_args()
+
+    expected = make_roadmap(args.steps)
+    doc = json.dumps(expected, indent=2)
+
+    print(f"{'case':<10} {'size':>9}  {'extractor':<17} {'median':>10}  result")
+    for case, (build, description) in CASES.items():
+        for size in args.sizes:
+            reply = build(doc, size)
+            want = None if case == "no-json" else expected
+            for name in args.extractors:
+                if case == "no-json" and name.startswith("legacy") and size > args.max_legacy_size:
+                    print(f"{case:<10} {len(reply):>9}  {name:<17} {'skipped':>10}")
+                    continue
+                median, correct = run_case(EXTRACTORS[name], reply, want, args.repeat)
+                print(f"{case:<10} {len(reply):>9}  {name:<17} {median * 1e3:8.2f}ms  {'ok' if correct else 'WRONG'}")
+        print(f"  ({case}: {description})")
+
+
+if __name__ == "__main__":
+    main()
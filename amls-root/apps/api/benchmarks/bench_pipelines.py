@@ -0,0 +1,386 @@
+"""Offline end-to-end benchmark of the roadmap pipeline and MasterFlow.
+
+Both pipelines run for real (crews, tools, caches, scheduler, JSON handling)
+against local stand-ins from offline_fakes.py: a scripted Gemini, a Tavily
+server replaying recorded results and an in-memory Qdrant seeded from
+benchmarks/fixtures. Nothing leaves the machine, so runs are repeatable and
+comparable between commits.
+
+Each pipeline runs in its own subprocess. The report gives per-stage wall and
+CPU time, Python allocations (tracemalloc), and call counts and time per
+dependency. Results are saved as JSON under benchmarks/results/.
+
+Usage (from apps/api):
+    python benchmarks/bench_pipelines.py                            # both pipelines, 3 runs each
+    python benchmarks/bench_pipelines.py --pipelines amls --runs 5 --llm-latency-ms 0
+    python benchmarks/bench_pipelines.py --compare benchmarks/results/<baseline>.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.dirname(BENCH_DIR)
+MASTER_FLOW_SRC = os.path.abspath(os.path.join(API_DIR, "..", "..", "..", "master_flow", "src"))
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+PIPELINES = ("amls", "master_flow")
+
+REQUEST = {
+    "topic": "Python Programming",
+    "experience": "Beginner",
+    "requirements": "Focus on data analysis",
+    "goal": "Analyse datasets with Python",
+}
+
+
+def _load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _offline_env(args, scratch):
+    """Environment for a worker: fake endpoints, throwaway caches and no telemetry."""
+    return {
+        "GEMINI_API_KEY": "offline",
+        "TAVILY_API_KEY": "offline",
+        "GEMINI_RPM": str(args.rpm),
+        "GEMINI_TPM": str(args.tpm),
+        "LLM_CACHE_MODE": "off",
+        "VECTOR_BACKEND": "qdrant",
+        "LOCAL_INDEX_PATH": os.path.join(scratch, "no_local_index"),
+        "TAVILY_CACHE_PATH": os.path.join(scratch, "tavily.sqlite3"),
+        "ROADMAP_CACHE_PATH": os.path.join(scratch, "roadmaps.sqlite3"),
+        "QUERY_EMBEDDING_CACHE_PATH": "",
+        "EMBEDDING_SERVICE_URL": "",
+        "WARMUP_ON_STARTUP": "false",
+        # Flow persistence lives under the XDG data dir; keep benchmark sessions out of the real one
+        "XDG_DATA_HOME": scratch,
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        "CREWAI_TRACING_ENABLED": "false",
+        "OTEL_SDK_DISABLED": "true",
+    }
+
+
+def _common_fakes(args, stats, scratch):
+    """Start fake Tavily and point tavily_client at it. Must run before the app modules are imported."""
+    from offline_fakes import FakeTavilyServer
+    os.environ.update(_offline_env(args, scratch))
+    tavily = FakeTavilyServer(_load_fixture("tavily.json"), latency_ms=args.tavily_latency_ms).start()
+    os.environ["TAVILY_SEARCH_URL"] = tavily.url
+    return tavily
+
+
+def run_amls(args, stats, recorder, scratch):
+    """generate_roadmap through _run_roadmap_crew, the body of a /api/roadmap job."""
+    sys.path.insert(0, API_DIR)
+    from offline_fakes import HashingEmbedder, in_memory_qdrant, instrument, scripted_llm
+    tavily = _common_fakes(args, stats, scratch)
+
+    started = time.perf_counter()
+    from crewai import LLM
+    from core import models, sparse, tavily_client
+    import main
+    from agents import crew as crew_module
+    from tools import search_tools
+    import_seconds = time.perf_counter() - started
+
+    embedder = HashingEmbedder(stats=stats)
+    models._embedding_model = embedder
+    models._qdrant_client = instrument(in_memory_qdrant("course_materials", _load_fixture("courses.json"), embedder, sparse),
+                                       ["query_points", "query_batch_points"], "qdrant", stats, args.qdrant_latency_ms)
+    instrument(tavily_client, ["search"], "tavily", stats)
+    # Same wrapping as the real gemini_llm, only the provider call is scripted
+    crew_module.gemini_llm = crew_module.wrap_llm(
+        scripted_llm(LLM(model="gemini/gemini-2.5-flash", api_key="offline"), _load_fixture("llm_amls.json"), stats, args.llm_latency_ms)
+    )
+
+    generate_roadmap = crew_module.generate_roadmap
+
+    def timed_generate_roadmap(skill):
+        try:
+            return generate_roadmap(skill)
+        finally:
+            recorder.mark("crew")
+
+    crew_module.generate_roadmap = timed_generate_roadmap
+    request = main.GenerateRequest(topic=REQUEST["topic"], experience=REQUEST["experience"], requirements=REQUEST["requirements"])
+
+    def run_once():
+        if not args.warm_caches:
+            search_tools.tavily_cache.clear()
+            search_tools.query_embedding_cache.clear()
+            main.roadmap_cache.clear()
+        recorder.start()
+        result = main._run_roadmap_crew(request, main._roadmap_cache_key(request))
+        recorder.mark("parse_and_cache")
+        return result.get("status") == "success", result.get("message"), None
+
+    return import_seconds, run_once, tavily
+
+
+def run_master_flow(args, stats, recorder, scratch):
+    """MasterFlow.kickoff_async as /api/start_macro runs it: macro planning, then every node crew."""
+    sys.path.insert(0, MASTER_FLOW_SRC)
+    from offline_fakes import HashingEmbedder, in_memory_qdrant, instrument, scripted_llm
+    tavily = _common_fakes(args, stats, scratch)
+    os.environ["MASTER_FLOW_NODE_CONCURRENCY"] = str(args.node_concurrency)
+
+    started = time.perf_counter()
+    import asyncio
+    from crewai import LLM
+    from master_flow import main as flow_module
+    from master_flow.core import sparse, tavily_client
+    from master_flow.core.llm_scheduler import PRIORITY_MACRO, PRIORITY_MICRO, rate_limited
+    from master_flow.core.progress import progress_bus
+    from master_flow.crews.macro_planning_crew.macro_crew import MacroPlanningCrew
+    from master_flow.crews.micro_learning_crew.micro_crew import MicroLearningCrew
+    from master_flow.tools import search_tools
+    import_seconds = time.perf_counter() - started
+
+    embedder = HashingEmbedder(stats=stats)
+    search_tools._embedding_model = embedder
+    search_tools._qdrant_client = instrument(in_memory_qdrant("course_materials", _load_fixture("courses.json"), embedder, sparse),
+                                             ["query_points", "query_batch_points"], "qdrant", stats, args.qdrant_latency_ms)
+    instrument(tavily_client, ["search", "asearch"], "tavily", stats)
+
+    script = _load_fixture("llm_master_flow.json")
+
+    def fake_llm(priority):
+        return lambda crew_self: rate_limited(
+            scripted_llm(LLM(model="gemini/gemini-2.5-flash", api_key="offline"), script, stats, args.llm_latency_ms),
+            priority=priority
+        )
+
+    MacroPlanningCrew.get_llm = fake_llm(PRIORITY_MACRO)
+    MicroLearningCrew.get_llm = fake_llm(PRIORITY_MICRO)
+
+    # The flow announces its stage boundaries on the progress bus; use them to split the run
+    node_times = []
+    publish = progress_bus.publish
+
+    def timed_publish(session_id, event, data=None):
+        if event == "blueprint":
+            recorder.mark("macro_planning")
+        elif event in ("node_completed", "node_failed"):
+            node_times.append((event, recorder.elapsed()))
+        return publish(session_id, event, data)
+
+    progress_bus.publish = timed_publish
+    run_count = [0]
+
+    def run_once():
+        if not args.warm_caches:
+            search_tools.get_tavily_cache().clear()
+            search_tools.get_query_embedding_cache().clear()
+        node_times.clear()
+        run_count[0] += 1
+        flow = flow_module.MasterFlow()
+        flow.state.id = f"bench-{os.getpid()}-{run_count[0]}"
+        flow.state.topic = REQUEST["topic"]
+        flow.state.experience = REQUEST["experience"]
+        flow.state.goal = REQUEST["goal"]
+        flow.state.constraints = REQUEST["requirements"]
+        recorder.start()
+        result = asyncio.run(flow.kickoff_async())
+        recorder.mark("node_processing")
+        failed = [event for event, _ in node_times if event == "node_failed"]
+        ok = isinstance(result, dict) and bool(result.get("course_content")) and not failed
+        timeline = {
+            "nodes_completed": len(node_times) - len(failed),
+            "nodes_failed": len(failed),
+            "first_node_seconds": round(node_times[0][1], 4) if node_times else None,
+            "last_node_seconds": round(node_times[-1][1], 4) if node_times else None,
+        }
+        return ok, None if ok else f"{len(failed)} node(s) failed", timeline
+
+    return import_seconds, run_once, tavily
+
+
+WORKERS = {"amls": run_amls, "master_flow": run_master_flow}
+
+
+def worker(args):
+    """Run one pipeline args.runs times in this process and write the raw runs to args.worker_output."""
+    from offline_fakes import CallStats, StageRecorder
+    stats = CallStats()
+    recorder = StageRecorder(trace_allocations=not args.no_tracemalloc)
+    scratch = tempfile.mkdtemp(prefix=f"bench_{args.worker}_")
+    import_seconds, run_once, tavily = WORKERS[args.worker](args, stats, recorder, scratch)
+
+    runs = []
+    try:
+        for i in range(args.warmup + args.runs):
+            stats.reset()
+            try:
+                ok, error, timeline = run_once()
+            except Exception as e:
+                ok, error, timeline = False, f"{type(e).__name__}: {e}", None
+            if i < args.warmup:
+                continue
+            run = {"ok": ok, "error": error, **recorder.totals(), "stages": list(recorder.stages), "calls": stats.snapshot()}
+            if timeline:
+                run["timeline"] = timeline
+            runs.append(run)
+    finally:
+        tavily.close()
+
+    with open(args.worker_output, "w", encoding="utf-8") as f:
+        json.dump({"import_seconds": round(import_seconds, 4), "runs": runs}, f)
+
+
+def _median(values):
+    values = [v for v in values if v is not None]
+    return round(statistics.median(values), 4) if values else None
+
+
+def aggregate(raw):
+    """Medians over the measured runs, per stage and per dependency."""
+    runs = raw["runs"]
+    ok_runs = [run for run in runs if run["ok"]] or runs
+    summary = {
+        "import_seconds": raw["import_seconds"],
+        "runs": len(runs),
+        "failed_runs": sum(1 for run in runs if not run["ok"]),
+        "errors": sorted({run["error"] for run in runs if run.get("error")}),
+        "total": {key: _median([run.get(key) for run in ok_runs])
+                  for key in ("wall_seconds", "cpu_seconds", "alloc_net_kib", "alloc_peak_kib")},
+        "stages": {},
+        "calls": {},
+    }
+    for name in dict.fromkeys(stage["name"] for run in ok_runs for stage in run["stages"]):
+        stages = [stage for run in ok_runs for stage in run["stages"] if stage["name"] == name]
+        summary["stages"][name] = {key: _median([stage.get(key) for stage in stages])
+                                   for key in ("wall_seconds", "cpu_seconds", "alloc_net_kib", "alloc_peak_kib")}
+    for name in sorted({name for run in ok_runs for name in run["calls"]}):
+        summary["calls"][name] = {
+            "calls": _median([run["calls"].get(name, {}).get("calls", 0) for run in ok_runs]),
+            "seconds": _median([run["calls"].get(name, {}).get("seconds", 0.0) for run in ok_runs]),
+        }
+    timelines = [run["timeline"] for run in ok_runs if run.get("timeline")]
+    if timelines:
+        summary["timeline"] = {key: _median([t.get(key) for t in timelines]) for key in timelines[0]}
+    return summary
+
+
+def _git(*cmd):
+    try:
+        return subprocess.run(["git", *cmd], cwd=API_DIR, capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def print_report(name, summary):
+    total = summary["total"]
+    print(f"\n== {name}: {summary['runs']} runs, {summary['failed_runs']} failed, imports {summary['import_seconds']:.2f}s")
+    for error in summary["errors"]:
+        print(f"   error: {error}")
+    rows = list(summary["stages"].items()) + [("total", total)]
+    for stage, values in rows:
+        alloc = ""
+        if values.get("alloc_peak_kib") is not None:
+            alloc = f" net={values['alloc_net_kib']:9.1f}KiB peak={values['alloc_peak_kib']:9.1f}KiB"
+        print(f"   {stage:<18} wall={values['wall_seconds']:8.3f}s cpu={values['cpu_seconds']:8.3f}s{alloc}")
+    for dependency, values in summary["calls"].items():
+        print(f"   {dependency:<42} calls={values['calls']:<6} time={values['seconds']:8.3f}s")
+    for key, value in summary.get("timeline", {}).items():
+        print(f"   {key:<18} {value}")
+
+
+def compare(current, baseline, threshold):
+    """Print median wall-time deltas against a saved result. Returns the regressions found."""
+    regressions = []
+    print(f"\nCompared with {baseline.get('git', {}).get('commit', '?')[:10]} ({baseline.get('created_at')}):")
+    for name, summary in current["pipelines"].items():
+        previous = baseline.get("pipelines", {}).get(name)
+        if not previous:
+            continue
+        rows = [(stage, values, previous["stages"].get(stage)) for stage, values in summary["stages"].items()]
+        rows.append(("total", summary["total"], previous["total"]))
+        for stage, values, old in rows:
+            if not old or not old.get("wall_seconds") or values.get("wall_seconds") is None:
+                continue
+            change = (values["wall_seconds"] - old["wall_seconds"]) / old["wall_seconds"]
+            flag = ""
+            if change > threshold:
+                flag = "  REGRESSION"
+                regressions.append(f"{name}.{stage}")
+            print(f"   {name + '.' + stage:<32} {old['wall_seconds']:8.3f}s -> {values['wall_seconds']:8.3f}s ({change:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pipelines", nargs="+", choices=PIPELINES, default=list(PIPELINES))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured runs before the measured ones.")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--tavily-latency-ms", type=float, default=150.0)
+    parser.add_argument("--qdrant-latency-ms", type=float, default=10.0)
+    parser.add_argument("--node-concurrency", type=int, default=int(os.getenv("MASTER_FLOW_NODE_CONCURRENCY", "3")))
+    parser.add_argument("--rpm", type=int, default=100000, help="Scheduler RPM; the default never throttles, 15 mimics the free tier.")
+    parser.add_argument("--tpm", type=int, default=100000000)
+    parser.add_argument("--warm-caches", action="store_true", help="Keep Tavily/embedding/roadmap caches between runs.")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="Skip allocation tracking (it slows Python code down).")
+    parser.add_argument("--output", default=None, help="Result file (default: benchmarks/results/<time>-<commit>.json).")
+    parser.add_argument("--compare", default=None, help="Saved result to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative wall-time increase reported as a regression.")
+    parser.add_argument("--worker", choices=PIPELINES, help=argparse.SUPPRESS)
+    parser.add_argument("--worker-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    commit = _git("rev-parse", "HEAD")
+    result = {
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "git": {"commit": commit, "dirty": bool(_git("status", "--porcelain", "--untracked-files=no"))},
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: getattr(args, key) for key in ("runs", "warmup", "llm_latency_ms", "tavily_latency_ms",
+                                                       "qdrant_latency_ms", "node_concurrency", "rpm", "tpm", "warm_caches")},
+        "pipelines": {},
+    }
+
+    for name in args.pipelines:
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+            worker_output = f.name
+        print(f"Running {name} ({args.warmup} warmup + {args.runs} measured)...")
+        command = [sys.executable, os.path.abspath(__file__), *sys.argv[1:], "--worker", name, "--worker-output", worker_output]
+        # Crew chatter goes to a log instead of drowning the report
+        log_path = os.path.join(tempfile.gettempdir(), f"bench_{name}.log")
+        with open(log_path, "w", encoding="utf-8") as log:
+            completed = subprocess.run(command, cwd=API_DIR, stdout=log, stderr=subprocess.STDOUT)
+        if completed.returncode != 0:
+            print(f"{name} worker exited with {completed.returncode}; see {log_path}")
+            continue
+        with open(worker_output, "r", encoding="utf-8") as f:
+            result["pipelines"][name] = aggregate(json.load(f))
+        os.remove(worker_output)
+        print_report(name, result["pipelines"][name])
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit[:10] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nSaved {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) slower than the baseline by more than {args.threshold:.0%}.")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Recall@k vs. memory report for quantized copies of the course_materials collection.
+
+Copies the vectors of the live collection into temporary collections (none / int8 / binary),
+queries each with and without oversampled rescoring, and compares against exact cosine top-k
+computed in numpy. Memory figures are the vector bytes Qdrant keeps in RAM for each layout
+plus payload bytes when payloads are not stored on disk.
+
+Usage (from apps/api, Qdrant running):
+    python benchmarks/bench_quantization.py --queries 200 --k 5
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qdrant_client.models import PointStruct, SearchParams, QuantizationSearchParams
+from core.vector_store import client, model, init_collection, COLLECTION_NAME
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+LAYOUTS = ["none", "int8", "binary"]
+# (rescore, oversampling) combinations tried against every quantized layout
+SEARCH_VARIANTS = [(False, 1.0), (True, 1.0), (True, 2.0), (True, 4.0)]
+
+
+def load_collection(page_size=1024):
+    ids, vectors, payloads = [], [], []
+    offset = None
+    while True:
+        records, offset = client.scroll(collection_name=COLLECTION_NAME, limit=page_size, offset=offset,
+                                        with_payload=True, with_vectors=True)
+        for r in records:
+            ids.append(r.id)
+            vectors.append(r.vector)
+            payloads.append(r.payload or {})
+        if offset is None:
+            break
+    matrix = np.asarray(vectors, dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    return ids, matrix, payloads
+
+
+def ram_bytes(layout, rows, dim, payload_bytes, on_disk_payload):
+    per_vector = {"none": dim * 4, "int8": dim + 4, "binary": math.ceil(dim / 8)}[layout]
+    return rows * per_vector + (0 if on_disk_payload else payload_bytes)
+
+
+def wait_green(name, timeout=300):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if str(client.get_collection(name).status).lower().endswith("green"):
+            return
+        time.sleep(1)
+    print(f"Warning: {name} not green after {timeout}s; results may reflect unoptimized segments.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--on-disk-payload", action="store_true")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary bench collections.")
+    args = parser.parse_args()
+
+    ids, matrix, payloads = load_collection()
+    rows, dim = matrix.shape
+    payload_bytes = sum(len(json.dumps(p, ensure_ascii=False).encode("utf-8")) for p in payloads)
+    print(f"Loaded {rows} vectors ({dim}d), payloads {payload_bytes / 1e6:.1f} MB")
+
+    # Realistic queries: course titles as an agent would type them
+    rng = np.random.default_rng(0)
+    picks = rng.choice(rows, size=min(args.queries, rows), replace=False)
+    query_texts = [payloads[i].get("course_name") or payloads[i].get("text", "")[:80] for i in picks]
+    queries = model.encode(query_texts, normalize_embeddings=True, show_progress_bar=False)
+    exact = [set(np.argsort(-(matrix @ q))[:args.k].tolist()) for q in queries]
+    position = {str(pid): i for i, pid in enumerate(ids)}
+
+    report = {"rows": rows, "dim": dim, "k": args.k, "queries": len(queries),
+              "on_disk_payload": args.on_disk_payload, "results": []}
+
+    for layout in LAYOUTS:
+        name = f"{COLLECTION_NAME}_bench_{layout}"
+        if client.collection_exists(name):
+            client.delete_collection(name)
+        init_collection(quantization=layout, on_disk_payload=args.on_disk_payload, collection_name=name)
+        for start in range(0, rows, 512):
+            client.upsert(collection_name=name, points=[
+                PointStruct(id=ids[i], vector=matrix[i].tolist(), payload=payloads[i])
+                for i in range(start, min(start + 512, rows))
+            ])
+        wait_green(name)
+
+        variants = SEARCH_VARIANTS if layout != "none" else [(False, 1.0)]
+        for rescore, oversampling in variants:
+            params = SearchParams(quantization=QuantizationSearchParams(rescore=rescore, oversampling=oversampling))
+            hits, started = 0, time.perf_counter()
+            for q, truth in zip(queries, exact):
+                points = client.query_points(collection_name=name, query=q.tolist(), limit=args.k,
+                                             search_params=params).points
+                hits += len({position[str(p.id)] for p in points} & truth)
+            elapsed = time.perf_counter() - started
+            row = {
+                "layout": layout,
+                "rescore": rescore,
+                "oversampling": oversampling,
+                f"recall@{args.k}": round(hits / (len(queries) * args.k), 4),
+                "ram_mb": round(ram_bytes(layout, rows, dim, payload_bytes, args.on_disk_payload) / 1e6, 2),
+                "avg_query_ms": round(elapsed / len(queries) * 1000, 2),
+            }
+            report["results"].append(row)
+            print(f"{layout:<7} rescore={str(rescore):<5} oversampling={oversampling:<4} "
+                  f"recall@{args.k}={row[f'recall@{args.k}']:.4f} ram={row['ram_mb']:8.2f} MB "
+                  f"avg={row['avg_query_ms']:.2f} ms")
+
+        if not args.keep:
+            client.delete_collection(name)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out_path = os.path.join(RESULTS_DIR, "quantization_report.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
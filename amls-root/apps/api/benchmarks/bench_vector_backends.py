@@ -0,0 +1,94 @@
+"""Compare query latency of the Qdrant server against the in-process local index.
+
+Usage (from apps/api):
+    python benchmarks/bench_vector_backends.py                  # real index + Qdrant
+    python benchmarks/bench_vector_backends.py --synthetic 50000 # local index only, random vectors
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.local_index import LocalIndexWriter, LocalVectorIndex
+from core.vector_backends import LocalBackend, QdrantBackend
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def summarize(name, timings_s):
+    timings_us = sorted(t * 1e6 for t in timings_s)
+    p95 = timings_us[max(0, int(len(timings_us) * 0.95) - 1)]
+    print(f"{name:<10} n={len(timings_us):<5} mean={statistics.mean(timings_us):9.1f}us "
+          f"p50={statistics.median(timings_us):9.1f}us p95={p95:9.1f}us")
+
+
+def time_queries(backend, queries, limit):
+    timings, results = [], []
+    for vector in queries:
+        started = time.perf_counter()
+        hits = backend.query(vector, limit)
+        timings.append(time.perf_counter() - started)
+        results.append([str(h.id) for h in hits])
+    return timings, results
+
+
+def build_synthetic(path, rows, dim, dtype):
+    rng = np.random.default_rng(0)
+    writer = LocalIndexWriter(path, dim, dtype=dtype)
+    for start in range(0, rows, 8192):
+        count = min(8192, rows - start)
+        writer.add([str(i) for i in range(start, start + count)],
+                   rng.normal(size=(count, dim)).astype(np.float32),
+                   [{"course_name": f"course {i}"} for i in range(start, start + count)])
+    writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", default=os.getenv("LOCAL_INDEX_PATH", os.path.join(API_DIR, "data", "local_index")))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--synthetic", type=int, default=0, help="Build a random index with this many rows instead.")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--dtype", choices=["float16", "float32"], default="float16")
+    args = parser.parse_args()
+
+    index_path = args.index
+    if args.synthetic:
+        index_path = tempfile.mkdtemp(prefix="local_index_")
+        build_synthetic(index_path, args.synthetic, args.dim, args.dtype)
+
+    started = time.perf_counter()
+    index = LocalVectorIndex.load(index_path)
+    print(f"Loaded local index: {len(index)} x {index.dim} {index.vectors.dtype} in "
+          f"{(time.perf_counter() - started) * 1000:.2f} ms")
+
+    # Query with stored vectors (perturbed) so both backends see realistic, answerable queries
+    rng = np.random.default_rng(1)
+    picks = rng.integers(0, len(index), size=args.queries)
+    queries = [(np.asarray(index.vectors[i], dtype=np.float32) + rng.normal(scale=0.01, size=index.dim)).tolist() for i in picks]
+
+    local_timings, local_results = time_queries(LocalBackend(index), queries, args.limit)
+    summarize("local", local_timings)
+
+    if args.synthetic:
+        return
+
+    from qdrant_client import QdrantClient
+    client = QdrantClient(url=os.getenv("QDRANT_URL"), api_key=os.getenv("QDRANT_API_KEY"))
+    qdrant_timings, qdrant_results = time_queries(QdrantBackend(client, "course_materials"), queries, args.limit)
+    summarize("qdrant", qdrant_timings)
+
+    overlap = statistics.mean(len(set(a) & set(b)) / args.limit for a, b in zip(local_results, qdrant_results))
+    print(f"Top-{args.limit} agreement (local vs qdrant): {overlap:.3f}")
+    print(f"Speedup (p50): {statistics.median(qdrant_timings) / statistics.median(local_timings):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
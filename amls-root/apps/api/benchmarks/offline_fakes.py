@@ -0,0 +1,358 @@
+"""Local stand-ins for Gemini, Tavily and Qdrant used by bench_pipelines.py.
+
+Everything here is deterministic: the LLM replays scripted responses, Tavily
+is a local HTTP server replaying recorded search results, and Qdrant runs in
+memory over a small fixture dataset embedded with a hashing embedder. Each
+fake adds a fixed, configurable latency so a run approximates production
+timing without touching the network.
+"""
+import asyncio
+import functools
+import hashlib
+import importlib.util
+import inspect
+import json
+import os
+import re
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+class CallStats:
+    """Thread-safe call counts and cumulative seconds, keyed by dependency name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def record(self, name, seconds):
+        with self._lock:
+            entry = self._calls.setdefault(name, {"calls": 0, "seconds": 0.0})
+            entry["calls"] += 1
+            entry["seconds"] += seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: {"calls": e["calls"], "seconds": round(e["seconds"], 4)} for name, e in sorted(self._calls.items())}
+
+    def reset(self):
+        with self._lock:
+            self._calls.clear()
+
+
+def instrument(target, attrs, name, stats, latency_ms=0.0):
+    """Replace target.<attr> for each attr with a wrapper that sleeps latency_ms and records the call.
+
+    Works on modules and plain objects, for both sync and async callables.
+    """
+    delay = latency_ms / 1000.0
+    for attr in attrs:
+        original = getattr(target, attr)
+        if inspect.iscoroutinefunction(original):
+            @functools.wraps(original)
+            async def wrapper(*args, _original=original, **kwargs):
+                started = time.perf_counter()
+                try:
+                    if delay:
+                        await asyncio.sleep(delay)
+                    return await _original(*args, **kwargs)
+                finally:
+                    stats.record(name, time.perf_counter() - started)
+        else:
+            @functools.wraps(original)
+            def wrapper(*args, _original=original, **kwargs):
+                started = time.perf_counter()
+                try:
+                    if delay:
+                        time.sleep(delay)
+                    return _original(*args, **kwargs)
+                finally:
+                    stats.record(name, time.perf_counter() - started)
+        setattr(target, attr, wrapper)
+    return target
+
+
+class HashingEmbedder:
+    """Deterministic bag-of-words embedder with the SentenceTransformer encode() surface.
+
+    Texts sharing words get similar vectors, which is enough for retrieval to
+    behave plausibly. Its cost is negligible, so embedding time in a run is
+    the time the pipeline spends around the model, not in it.
+    """
+
+    def __init__(self, dim=384, stats=None):
+        self.dim = dim
+        self.stats = stats
+
+    def _vector(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in re.findall(r"[a-z0-9+#]+", text.lower()):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, sentences, batch_size=None, show_progress_bar=None, **kwargs):
+        started = time.perf_counter()
+        single = isinstance(sentences, str)
+        vectors = np.stack([self._vector(text) for text in ([sentences] if single else sentences)])
+        if self.stats is not None:
+            self.stats.record("embedding", time.perf_counter() - started)
+        return vectors[0] if single else vectors
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+
+def _build_course_document():
+    """core.dataset.build_course_document from the amls API, which ingests the collection both pipelines search.
+
+    Loaded by path because the master_flow worker doesn't have the amls API on sys.path.
+    """
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "core", "dataset.py")
+    spec = importlib.util.spec_from_file_location("_bench_amls_dataset", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.build_course_document
+
+
+def in_memory_qdrant(collection_name, courses, embedder, sparse):
+    """QdrantClient(":memory:") holding courses with dense and BM25 sparse vectors, like the real collection.
+
+    sparse is the app's core.sparse module, so documents are weighted exactly as the ingestion does.
+    """
+    from qdrant_client import QdrantClient
+    from qdrant_client.models import Distance, Modifier, PointStruct, SparseVectorParams, VectorParams
+
+    client = QdrantClient(":memory:")
+    client.create_collection(
+        collection_name=collection_name,
+        vectors_config=VectorParams(size=embedder.get_sentence_embedding_dimension(), distance=Distance.COSINE),
+        sparse_vectors_config={sparse.SPARSE_VECTOR_NAME: SparseVectorParams(modifier=Modifier.IDF)}
+    )
+    build_course_document = _build_course_document()
+    documents = [build_course_document(course) for course in courses]
+    payloads = [payload for _, _, payload in documents]
+    vectors = embedder.encode([text for _, text, _ in documents])
+    client.upsert(collection_name=collection_name, points=[
+        PointStruct(id=i, payload=payload, vector={
+            "": vector.tolist(),
+            sparse.SPARSE_VECTOR_NAME: sparse.to_sparse_vector(sparse.document_weights(sparse.course_lexical_text(payload)))
+        })
+        for i, (payload, vector) in enumerate(zip(payloads, vectors))
+    ])
+    return client
+
+
+class FakeTavilyServer:
+    """Local HTTP server answering Tavily /search requests from recorded responses.
+
+    responses is {"default": [...results], "responses": [{"match": "...", "results": [...]}]};
+    the first entry whose match appears in the lower-cased query wins.
+    """
+
+    def __init__(self, responses, latency_ms=0.0):
+        self.responses = responses
+        self.delay = latency_ms / 1000.0
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/search"
+
+    def results_for(self, query):
+        query = query.lower()
+        for entry in self.responses.get("responses", []):
+            if entry["match"].lower() in query:
+                return entry["results"]
+        return self.responses.get("default", [])
+
+    def _handler(self):
+        fake = self
+
+        class TavilyHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with fake._lock:
+                    fake.requests += 1
+                if fake.delay:
+                    time.sleep(fake.delay)
+                query = body.get("query", "")
+                results = fake.results_for(query)[:int(body.get("max_results", 5))]
+                data = json.dumps({"query": query, "results": results, "response_time": fake.delay}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return TavilyHandler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-tavily", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _message_text(message):
+    if isinstance(message, dict):
+        content = message.get("content", "")
+        return content if isinstance(content, str) else json.dumps(content, default=str)
+    return str(message)
+
+
+def _fill(value, variables):
+    text = value if isinstance(value, str) else json.dumps(value)
+    for name, replacement in variables.items():
+        text = text.replace("{{" + name + "}}", replacement)
+    return text
+
+
+def script_response(script, messages):
+    """The scripted reply to a conversation, in crewai's ReAct text format.
+
+    script is {"agents": {role: {"actions": [...], "final": ..., "extract": {...}}}, "default": ...}.
+    The agent is found by its role in the system prompt. Each assistant turn
+    already in the conversation is one tool call made, so the next scripted
+    action (or the final answer once they are used up) is chosen without any
+    per-run state, which keeps concurrent crews with the same roles independent.
+    extract maps {{placeholders}} to regexes run over the conversation, e.g. a
+    node id from the task prompt.
+    """
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    texts = [_message_text(m) for m in messages]
+    conversation = "\n".join(texts)
+
+    agent = None
+    for role, entry in script.get("agents", {}).items():
+        if role in (texts[0] if texts else ""):
+            agent = entry
+            break
+    if agent is None:
+        for role, entry in script.get("agents", {}).items():
+            if role in conversation:
+                agent = entry
+                break
+    if agent is None:
+        return f"Thought: I now know the final answer\nFinal Answer: {_fill(script.get('default', ''), {})}"
+
+    variables = {}
+    for name, pattern in agent.get("extract", {}).items():
+        match = re.search(pattern, conversation)
+        if match:
+            variables[name] = match.group(1)
+
+    turns = sum(1 for m in messages if isinstance(m, dict) and m.get("role") == "assistant")
+    actions = agent.get("actions", [])
+    if turns < len(actions):
+        action = actions[turns]
+        return (f"Thought: I should use the {action['tool']} tool.\nAction: {action['tool']}\n"
+                f"Action Input: {_fill(action.get('input', {}), variables)}")
+    return f"Thought: I now know the final answer\nFinal Answer: {_fill(agent['final'], variables)}"
+
+
+def scripted_llm(llm, script, stats, latency_ms=0.0):
+    """Make a crewai LLM answer from script instead of the provider. Returns the same llm object.
+
+    Tool use is forced through the ReAct text protocol, which is what the
+    scripted replies are written in.
+    """
+    delay = latency_ms / 1000.0
+
+    def _role(messages):
+        first = _message_text(messages[0]) if isinstance(messages, list) and messages else ""
+        match = re.match(r"\s*You are ([^.\n]+)", first)
+        return match.group(1).strip() if match else "unknown"
+
+    def call(messages, *args, **kwargs):
+        started = time.perf_counter()
+        if delay:
+            time.sleep(delay)
+        reply = script_response(script, messages)
+        stats.record(f"llm:{_role(messages)}", time.perf_counter() - started)
+        return reply
+
+    async def acall(messages, *args, **kwargs):
+        started = time.perf_counter()
+        if delay:
+            await asyncio.sleep(delay)
+        reply = script_response(script, messages)
+        stats.record(f"llm:{_role(messages)}", time.perf_counter() - started)
+        return reply
+
+    object.__setattr__(llm, "call", call)
+    object.__setattr__(llm, "acall", acall)
+    object.__setattr__(llm, "supports_function_calling", lambda: False)
+    return llm
+
+
+class StageRecorder:
+    """Wall time, CPU time and Python allocations for consecutive pipeline stages.
+
+    start() opens the first stage and every mark(name) closes the current one
+    under name and opens the next. Allocations come from tracemalloc: net is
+    what the stage left allocated, peak is its high-water mark above the
+    stage's starting point.
+    """
+
+    def __init__(self, trace_allocations=True):
+        self.trace_allocations = trace_allocations
+        self.stages = []
+        self._lock = threading.Lock()
+
+    def _now(self):
+        current = tracemalloc.get_traced_memory()[0] if self.trace_allocations else 0
+        return time.perf_counter(), time.process_time(), current
+
+    def start(self):
+        if self.trace_allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        self.stages = []
+        self._peak = 0
+        self._started = self._stage_started = self._now()
+
+    def mark(self, name):
+        with self._lock:
+            wall, cpu, current = self._now()
+            wall0, cpu0, current0 = self._stage_started
+            stage = {"name": name, "wall_seconds": round(wall - wall0, 4), "cpu_seconds": round(cpu - cpu0, 4)}
+            if self.trace_allocations:
+                peak = tracemalloc.get_traced_memory()[1]
+                self._peak = max(self._peak, peak)
+                stage["alloc_net_kib"] = round((current - current0) / 1024, 1)
+                stage["alloc_peak_kib"] = round(max(0, peak - current0) / 1024, 1)
+                tracemalloc.reset_peak()
+            self.stages.append(stage)
+            self._stage_started = self._now()
+
+    def elapsed(self):
+        return time.perf_counter() - self._started[0]
+
+    def totals(self) -> dict:
+        wall, cpu, current = self._now()
+        totals = {"wall_seconds": round(wall - self._started[0], 4), "cpu_seconds": round(cpu - self._started[1], 4)}
+        if self.trace_allocations:
+            totals["alloc_net_kib"] = round((current - self._started[2]) / 1024, 1)
+            peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+            totals["alloc_peak_kib"] = round(max(0, peak - self._started[2]) / 1024, 1)
+        return totals
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import uuid
+
+# Keys that hold the course array when the dataset is wrapped in an object
+COURSE_ARRAY_KEYS = ("courses", "data")
+
+_WHITESPACE = " \t\n\r"
+
+# Fixed namespace so the same course always maps to the same Qdrant point ID
+COURSE_ID_NAMESPACE = uuid.UUID("5b0d6c1e-6a55-4c0f-9a3e-1f4f2a7c9d21")
+
+
+class _JSONStream:
+    """Minimal incremental JSON reader over a text file.
+
+    Only the outer container is walked by hand; every element is decoded with
+    json.JSONDecoder.raw_decode, so memory stays bounded by the largest single
+    course instead of the whole file.
+    """
+
+    def __init__(self, f, chunk_size=1 << 16):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size=None):
+        chunk = self.f.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Malformed dataset: expected {char!r}, found {found!r}")
+        self.pos += 1
+
+    def _delimited(self, end):
+        while end < len(self.buf) and self.buf[end] in _WHITESPACE:
+            end += 1
+        return end < len(self.buf) and self.buf[end] in ",]}"
+
+    def decode(self):
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A bare number cut by the buffer edge ("1." of "1.5") may still be incomplete
+                is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+                if self.eof or (end < len(self.buf) and (not is_number or self._delimited(end))):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Value spans past the buffer: grow the read size so huge values stay linear
+            self._fill(size)
+            size *= 2
+
+    def iter_array(self):
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.decode()
+            sep = self.peek()
+            self.pos += 1
+            if sep == "]":
+                return
+            if sep != ",":
+                raise ValueError(f"Malformed dataset: expected ',' or ']', found {sep!r}")
+
+
+def iter_courses(filepath, chunk_size=1 << 16):
+    """Stream course records from a dataset file one at a time.
+
+    Accepts the same layouts the ingestion has always handled: a top-level
+    list, an object with a "courses" or "data" array, or an object whose
+    values are the courses.
+    """
+    with open(filepath, "r", encoding="utf-8") as f:
+        stream = _JSONStream(f, chunk_size)
+        first = stream.peek()
+
+        if first == "[":
+            yield from stream.iter_array()
+            return
+        if first != "{":
+            raise ValueError(f"Malformed dataset: unexpected top-level token {first!r}")
+
+        # Values seen before we know whether a course array key exists
+        held_values = []
+        stream.expect("{")
+        if stream.peek() == "}":
+            return
+        while True:
+            key = stream.decode()
+            stream.expect(":")
+            if key in COURSE_ARRAY_KEYS and stream.peek() == "[":
+                yield from stream.iter_array()
+                return
+            held_values.append(stream.decode())
+            sep = stream.peek()
+            stream.pos += 1
+            if sep == "}":
+                break
+            if sep != ",":
+                raise ValueError(f"Malformed dataset: expected ',' or '}}', found {sep!r}")
+
+        yield from held_values
+
+
+def course_key(item):
+    """Identity of a course that survives reordering and edits to its content."""
+    explicit = item.get("id") or item.get("course_id") or item.get("url")
+    if explicit:
+        return str(explicit).strip()
+    course_name = " ".join(str(item.get("course_name", "")).split()).lower()
+    provider = " ".join(str(item.get("provider", "")).split()).lower()
+    return f"{provider}::{course_name}"
+
+
+def course_point_id(key):
+    return str(uuid.uuid5(COURSE_ID_NAMESPACE, key))
+
+
+def content_hash(text, payload, salt=""):
+    """Hash of everything that ends up in the point, so any edit triggers a re-embed."""
+    digest = hashlib.sha256()
+    digest.update(salt.encode("utf-8"))
+    digest.update(text.encode("utf-8"))
+    digest.update(json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def build_course_document(item, salt="", key=None):
+    """Return (point_id, text_for_embedding, payload) for a single raw course record.
+
+    key overrides course_key(item), e.g. to tell apart records that share one.
+    """
+    course_name = item.get("course_name", "")
+    provider = item.get("provider", "")
+    level = item.get("level", "")
+    skills = item.get("skills", [])
+    syllabus = item.get("description", "") # Note: updated from "syllabus" based on your dataset format
+
+    skills_str = ", ".join(skills) if isinstance(skills, list) else str(skills)
+    text_for_embedding = f"Course: {course_name}\nProvider: {provider}\nLevel: {level}\nSkills: {skills_str}\nSyllabus: {syllabus}"
+
+    payload = {
+        "course_name": course_name,
+        "provider": provider,
+        "level": level,
+        "skills": skills,
+        "syllabus": syllabus,
+        "text": text_for_embedding
+    }
+    key = key or course_key(item)
+    payload["course_key"] = key
+    payload["content_hash"] = content_hash(text_for_embedding, payload, salt)
+    return course_point_id(key), text_for_embedding, payload
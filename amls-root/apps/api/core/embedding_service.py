@@ -0,0 +1,265 @@
+"""Local embedding service: one bge-small model per host, shared by every API worker.
+
+Run it next to the API workers and point them at it with EMBEDDING_SERVICE_URL:
+
+    python -m core.embedding_service --port 8765            # http://127.0.0.1:8765
+    python -m core.embedding_service --socket /tmp/emb.sock # unix:///tmp/emb.sock
+
+Concurrent /encode requests are coalesced into micro-batches: a batch is run as
+soon as it holds max_batch_size texts or max_wait_ms after its first request
+arrived, whichever comes first.
+"""
+import argparse
+import bisect
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import numpy as np
+
+from core.embedding_backends import EMBEDDING_BACKENDS, load_sentence_transformer
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+LATENCY_MS_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus style) with count and sum."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def snapshot(self) -> dict:
+        cumulative, running = {}, 0
+        for bound, n in zip(self.buckets, self.counts):
+            running += n
+            cumulative[str(bound)] = running
+        cumulative["+Inf"] = self.count
+        return {"buckets": cumulative, "count": self.count, "sum": round(self.total, 3),
+                "mean": round(self.total / self.count, 3) if self.count else 0.0}
+
+
+class MicroBatcher:
+    """Coalesces encode requests from many threads into batched encode_fn calls."""
+
+    def __init__(self, encode_fn, max_batch_size=64, max_wait_ms=5.0):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_ms = Histogram(LATENCY_MS_BUCKETS)
+        self.encode_ms = Histogram(LATENCY_MS_BUCKETS)
+        self.requests = 0
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts) -> Future:
+        future = Future()
+        self._queue.put((list(texts), future, time.perf_counter()))
+        return future
+
+    def encode(self, texts):
+        return self.submit(texts).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = batch[0][2] + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [text for item in batch for text in item[0]]
+            started = time.perf_counter()
+            try:
+                vectors = np.asarray(self.encode_fn(texts), dtype=np.float32)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+
+            with self._lock:
+                self.requests += len(batch)
+                self.batch_sizes.observe(len(texts))
+                self.encode_ms.observe((finished - started) * 1000)
+                for _, _, submitted in batch:
+                    self.queue_ms.observe((started - submitted) * 1000)
+
+            offset = 0
+            for item_texts, future, _ in batch:
+                future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "batch_size": self.batch_sizes.snapshot(),
+                "queue_wait_ms": self.queue_ms.snapshot(),
+                "encode_ms": self.encode_ms.snapshot(),
+            }
+
+
+def _make_handler(batcher, model_name, dimension):
+    class EmbeddingHandler(BaseHTTPRequestHandler):
+        def _send(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, {"status": "healthy", "model": model_name, "dimension": dimension})
+            elif self.path == "/stats":
+                self._send(200, batcher.stats())
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/encode":
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                texts = body["texts"]
+            except (ValueError, KeyError, TypeError) as e:
+                self._send(400, {"error": f"Expected JSON body with 'texts': {e}"})
+                return
+            # A bare string would otherwise be encoded one character at a time
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                self._send(400, {"error": "'texts' must be a list of strings."})
+                return
+            try:
+                vectors = batcher.encode(texts)
+            except Exception as e:
+                self._send(500, {"error": str(e)})
+                return
+            self._send(200, {"vectors": vectors.tolist()})
+
+        def address_string(self):
+            # Unix socket peers have no (host, port)
+            return self.client_address[0] if isinstance(self.client_address, tuple) and self.client_address else "unix"
+
+        def log_message(self, format, *args):
+            pass
+
+    return EmbeddingHandler
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        super().server_bind()
+
+
+def serve(model_name, host="127.0.0.1", port=8765, socket_path=None, max_batch_size=64, max_wait_ms=5.0, backend=None):
+    model = load_sentence_transformer(model_name, backend=backend)
+    batcher = MicroBatcher(lambda texts: model.encode(texts, batch_size=len(texts), show_progress_bar=False),
+                           max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    handler = _make_handler(batcher, model_name, model.get_sentence_embedding_dimension())
+
+    if socket_path:
+        server = UnixHTTPServer(socket_path, handler)
+        where = f"unix://{socket_path}"
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+        where = f"http://{host}:{port}"
+    print(f"Embedding service for {model_name} ({backend or os.getenv('EMBEDDING_BACKEND', 'torch')}) listening on {where} "
+          f"(batch <= {max_batch_size}, wait <= {max_wait_ms}ms)")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+class EmbeddingServiceClient:
+    """Stands in for a SentenceTransformer by calling the local embedding service.
+
+    url is http://host:port or unix:///path/to.sock. Only encode() and
+    get_sentence_embedding_dimension() are provided, which is all the search
+    tools and the ingestion pipeline use.
+    """
+
+    def __init__(self, url, timeout=30.0):
+        self.url = url
+        if url.startswith("unix://"):
+            transport = httpx.HTTPTransport(uds=url[len("unix://"):])
+            self._client = httpx.Client(transport=transport, base_url="http://embedding", timeout=timeout)
+        else:
+            self._client = httpx.Client(base_url=url, timeout=timeout)
+        self._dimension = None
+
+    def encode(self, sentences, batch_size=None, show_progress_bar=None, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        response = self._client.post("/encode", json={"texts": texts})
+        response.raise_for_status()
+        vectors = np.asarray(response.json()["vectors"], dtype=np.float32)
+        return vectors[0] if single else vectors
+
+    def get_sentence_embedding_dimension(self):
+        if self._dimension is None:
+            response = self._client.get("/health")
+            response.raise_for_status()
+            self._dimension = response.json()["dimension"]
+        return self._dimension
+
+    def stats(self) -> dict:
+        response = self._client.get("/stats")
+        response.raise_for_status()
+        return response.json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve batched sentence embeddings to local API workers.")
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL_NAME", "BAAI/bge-small-en-v1.5"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("EMBEDDING_SERVICE_PORT", "8765")))
+    parser.add_argument("--socket", default=None, help="Listen on this unix socket instead of TCP.")
+    parser.add_argument("--max-batch-size", type=int, default=int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "64")))
+    parser.add_argument("--max-wait-ms", type=float, default=float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5")))
+    parser.add_argument("--backend", choices=EMBEDDING_BACKENDS, default=None,
+                        help="Inference runtime; defaults to EMBEDDING_BACKEND or torch.")
+    args = parser.parse_args()
+    serve(args.model, host=args.host, port=args.port, socket_path=args.socket,
+          max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms, backend=args.backend)
+
+
+if __name__ == "__main__":
+    main()
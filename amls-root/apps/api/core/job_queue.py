@@ -0,0 +1,141 @@
+import math
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from core.session_context import bind_session, current_session
+
+
+class QueueFullError(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class JobQueue:
+    """Bounded FIFO of background jobs drained by a fixed pool of worker threads.
+
+    submit() returns a job id straight away and raises QueueFullError once
+    max_pending jobs are waiting, so callers can shed load instead of queueing
+    without bound. A job submitted under the key of a job that is still queued
+    or running attaches to that job rather than enqueueing a duplicate.
+    Finished jobs are kept for finished_ttl_seconds (at most max_finished of
+    them) so clients can poll for the result.
+    """
+
+    def __init__(self, name="jobs", workers=2, max_pending=8, max_finished=500, finished_ttl_seconds=3600):
+        self.name = name
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self.finished_ttl_seconds = finished_ttl_seconds
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._active_keys = {}
+        self._threads = []
+        self._avg_duration = None
+        self.submitted = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    def _ensure_workers(self):
+        # Started on first use so importing the app (e.g. under --reload) doesn't spawn threads
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"{self.name}-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _retry_after(self) -> int:
+        per_job = self._avg_duration or 30.0
+        return max(1, math.ceil(per_job * (self._queue.qsize() + 1) / self.workers))
+
+    def submit(self, key, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs). Returns (job_id, shared)."""
+        with self._lock:
+            self._ensure_workers()
+            self._prune()
+            job_id = self._active_keys.get(key) if key is not None else None
+            if job_id is not None:
+                self.coalesced += 1
+                return job_id, True
+
+            job_id = uuid.uuid4().hex
+            job = {"job_id": job_id, "key": key, "status": "queued", "result": None, "submitted_at": time.time(), "started_at": None, "finished_at": None}
+            try:
+                self._queue.put_nowait((job, fn, args, kwargs))
+            except queue.Full:
+                self.rejected += 1
+                raise QueueFullError(self._retry_after())
+            self._jobs[job_id] = job
+            if key is not None:
+                self._active_keys[key] = job_id
+            self.submitted += 1
+            return job_id, False
+
+    def _work(self):
+        while True:
+            job, fn, args, kwargs = self._queue.get()
+            with self._lock:
+                job["status"] = "processing"
+                job["started_at"] = time.time()
+            # Spans recorded while the job runs are tagged with its id
+            session = bind_session(job["job_id"])
+            try:
+                result, status = fn(*args, **kwargs), "completed"
+            except Exception as e:
+                result, status = {"status": "error", "message": str(e)}, "error"
+            finally:
+                current_session.reset(session)
+                self._queue.task_done()
+
+            with self._lock:
+                job["result"] = result
+                job["status"] = status
+                job["finished_at"] = time.time()
+                if self._active_keys.get(job["key"]) == job["job_id"]:
+                    del self._active_keys[job["key"]]
+                duration = job["finished_at"] - job["started_at"]
+                self._avg_duration = duration if self._avg_duration is None else 0.8 * self._avg_duration + 0.2 * duration
+
+    def _prune(self):
+        cutoff = time.time() - self.finished_ttl_seconds
+        finished = [job_id for job_id, job in self._jobs.items() if job["finished_at"] is not None]
+        excess = len(finished) - self.max_finished
+        for job_id in finished:
+            if excess <= 0 and self._jobs[job_id]["finished_at"] >= cutoff:
+                continue
+            del self._jobs[job_id]
+            excess -= 1
+
+    def get(self, job_id):
+        """Snapshot of a job (without its key), or None if unknown or already pruned."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = {k: v for k, v in job.items() if k != "key"}
+            if job["status"] == "queued":
+                queued = [j for j in self._jobs.values() if j["status"] == "queued"]
+                snapshot["position"] = queued.index(job) + 1
+            return snapshot
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {"queued": 0, "processing": 0}
+            for job in self._jobs.values():
+                if job["status"] in counts:
+                    counts[job["status"]] += 1
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                **counts,
+                "submitted": self.submitted,
+                "coalesced": self.coalesced,
+                "rejected": self.rejected,
+                "avg_job_seconds": round(self._avg_duration, 2) if self._avg_duration is not None else None,
+            }
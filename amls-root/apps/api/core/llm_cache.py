@@ -0,0 +1,136 @@
+import asyncio
+import functools
+import os
+import threading
+
+from core.ttl_cache import SQLiteTTLCache, make_key
+
+# off: no caching (default); readwrite: serve hits and store misses; replay: serve hits, never write
+CACHE_MODES = ("off", "readwrite", "replay")
+
+DEFAULT_CACHE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".cache", "llm_completions.sqlite3"))  # per-app
+
+
+class CompletionCache:
+    """Content-addressed store of LLM completions.
+
+    Keys hash everything that determines a completion (model, temperature,
+    messages, tool schemas and any response format), so a hit is only ever
+    returned for an identical request. Entries live in a SQLiteTTLCache, which
+    bounds the store by entry count with LRU eviction. In replay mode the store
+    is read-only: hits are served and misses go to the model without being
+    recorded, which keeps a recorded run reproducible.
+    """
+
+    def __init__(self, store: SQLiteTTLCache, mode="readwrite"):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown LLM cache mode {mode!r}, expected one of {CACHE_MODES}")
+        self.store = store
+        self.mode = mode
+        self._lock = threading.Lock()
+        self.writes = 0
+        self.skipped_writes = 0
+
+    @staticmethod
+    def key(model, temperature, messages, tools=None, **extra) -> str:
+        return make_key("completion", model, temperature, messages, tools, extra)
+
+    def lookup(self, key):
+        if self.mode == "off":
+            return None
+        return self.store.get(key)
+
+    def save(self, key, value):
+        if self.mode != "readwrite":
+            with self._lock:
+                self.skipped_writes += 1
+            return
+        self.store.set(key, value)
+        with self._lock:
+            self.writes += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"mode": self.mode, "writes": self.writes, "skipped_writes": self.skipped_writes, **self.store.stats()}
+
+
+def completion_cache_from_env(default_path):
+    """The LLM_CACHE_MODE-configured cache, or None when caching is off."""
+    mode = os.getenv("LLM_CACHE_MODE", "off").lower()
+    if mode == "off":
+        return None
+    store = SQLiteTTLCache(
+        os.getenv("LLM_CACHE_PATH", default_path),
+        table="llm_completions",
+        ttl_seconds=int(os.getenv("LLM_CACHE_TTL_SECONDS", "0")),
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+    )
+    return CompletionCache(store, mode=mode)
+
+
+_completion_cache = None
+_completion_cache_loaded = False
+_completion_cache_lock = threading.Lock()
+
+
+def get_completion_cache():
+    """Process-wide completion cache shared by every crew, or None when caching is off."""
+    global _completion_cache, _completion_cache_loaded
+    if not _completion_cache_loaded:
+        with _completion_cache_lock:
+            if not _completion_cache_loaded:
+                _completion_cache = completion_cache_from_env(DEFAULT_CACHE_PATH)
+                _completion_cache_loaded = True
+    return _completion_cache
+
+
+def _request_key(llm, messages, kwargs):
+    response_model = kwargs.get("response_model")
+    return CompletionCache.key(
+        getattr(llm, "model", None),
+        getattr(llm, "temperature", None),
+        messages,
+        kwargs.get("tools"),
+        response_model=getattr(response_model, "__name__", response_model)
+    )
+
+
+def cached(llm, cache):
+    """Serve llm.call / llm.acall from cache when possible. Returns the same llm object.
+
+    Wrap outermost (around rate_limited) so hits never wait for rate-limit budget.
+    Only plain-text completions are stored; tool-call objects always go to the model.
+    """
+    if cache is None:
+        return llm
+    call = getattr(llm, "call", None)
+    acall = getattr(llm, "acall", None)
+
+    if call is not None:
+        @functools.wraps(call)
+        def cached_call(messages, *args, **kwargs):
+            key = _request_key(llm, messages, kwargs)
+            hit = cache.lookup(key)
+            if hit is not None:
+                return hit
+            result = call(messages, *args, **kwargs)
+            if isinstance(result, str) and result:
+                cache.save(key, result)
+            return result
+        object.__setattr__(llm, "call", cached_call)
+
+    if acall is not None:
+        @functools.wraps(acall)
+        async def cached_acall(messages, *args, **kwargs):
+            key = _request_key(llm, messages, kwargs)
+            # SQLite reads and writes block, so they run off the loop
+            hit = await asyncio.to_thread(cache.lookup, key)
+            if hit is not None:
+                return hit
+            result = await acall(messages, *args, **kwargs)
+            if isinstance(result, str) and result:
+                await asyncio.to_thread(cache.save, key, result)
+            return result
+        object.__setattr__(llm, "acall", cached_acall)
+
+    return llm
@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+
+EMBEDDING_MODEL_NAME = "BAAI/bge-small-en-v1.5"
+
+# Component name -> {"status": "pending" | "loading" | "ready" | "error", "seconds": ..., "error": ...}
+_components = {}
+_components_lock = threading.Lock()
+_load_locks = {}
+
+_embedding_model = None
+_qdrant_client = None
+
+
+def _set_status(name, status, **details):
+    with _components_lock:
+        entry = _components.setdefault(name, {})
+        entry.clear()
+        entry.update({"status": status, **details})
+
+
+def _load_once(name, loader):
+    """Run loader exactly once per process, recording timing and failures under name."""
+    with _components_lock:
+        lock = _load_locks.setdefault(name, threading.Lock())
+    with lock:
+        with _components_lock:
+            if _components.get(name, {}).get("status") == "ready":
+                return
+        _set_status(name, "loading")
+        started = time.perf_counter()
+        try:
+            loader()
+        except Exception as e:
+            _set_status(name, "error", error=str(e), seconds=round(time.perf_counter() - started, 3))
+            raise
+        _set_status(name, "ready", seconds=round(time.perf_counter() - started, 3))
+
+
+def get_embedding_model():
+    """The process's single bge-small SentenceTransformer, loaded on first use.
+
+    With EMBEDDING_SERVICE_URL set this is a client for the shared local
+    embedding service (core.embedding_service) instead of an in-process model.
+    EMBEDDING_BACKEND picks the in-process runtime (see core.embedding_backends).
+    """
+    if _embedding_model is None:
+        def load():
+            global _embedding_model
+            service_url = os.getenv("EMBEDDING_SERVICE_URL")
+            if _embedding_model is None and service_url:
+                from core.embedding_service import EmbeddingServiceClient
+                _embedding_model = EmbeddingServiceClient(service_url)
+            elif _embedding_model is None:
+                # Imported here: sentence_transformers pulls in torch, which dominates cold start
+                from core.embedding_backends import load_sentence_transformer
+                _embedding_model = load_sentence_transformer(EMBEDDING_MODEL_NAME)
+        _load_once("embedding_model", load)
+    return _embedding_model
+
+
+def get_qdrant_client():
+    """Shared QdrantClient, constructed on first use."""
+    if _qdrant_client is None:
+        def load():
+            global _qdrant_client
+            if _qdrant_client is None:
+                from qdrant_client import QdrantClient
+                _qdrant_client = QdrantClient(
+                    url=os.getenv("QDRANT_URL"),
+                    api_key=os.getenv("QDRANT_API_KEY")
+                )
+        _load_once("qdrant_client", load)
+    return _qdrant_client
+
+
+def warm_component(name, loader):
+    """Load an extra component (e.g. the crew modules) and track it for readiness."""
+    _load_once(name, loader)
+
+
+def component_status() -> dict:
+    with _components_lock:
+        return {name: dict(entry) for name, entry in _components.items()}
+
+
+def is_ready(required) -> bool:
+    statuses = component_status()
+    return all(statuses.get(name, {}).get("status") == "ready" for name in required)
@@ -0,0 +1,87 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict, model_validator
+
+from core.dag import dag_problems, topological_order
+from core.json_extract import extract_json
+
+# Where the web app looks for a roadmap's steps, in the order it looks
+STEP_KEYS = ("learning_path", "phases", "modules", "nodes")
+TOPIC_KEYS = ("topics", "micro_topics", "suggested_micro_topics")
+# Topics per step; steps without a topics list aren't checked
+TOPICS_PER_STEP = (1, 10)
+
+NOT_A_ROADMAP = "The output is not a JSON roadmap: expected an object with a non-empty learning_path array."
+
+
+class Roadmap(BaseModel):
+    """A roadmap as the web app reads it: the steps under one of several keys. Any other keys the agents add are kept."""
+    model_config = ConfigDict(extra="allow")
+
+    title: Optional[str] = None
+    description: Optional[str] = None
+    learning_path: Optional[List[dict]] = None
+    phases: Optional[List[dict]] = None
+    modules: Optional[List[dict]] = None
+    nodes: Optional[List[dict]] = None
+
+    @model_validator(mode="after")
+    def has_steps(self):
+        if not self.steps_key():
+            raise ValueError("roadmap has no learning_path, phases, modules or nodes")
+        return self
+
+    def steps_key(self) -> Optional[str]:
+        return next((key for key in STEP_KEYS if getattr(self, key)), None)
+
+
+def _validate_roadmap(value) -> Roadmap:
+    # A bare list of steps is still a roadmap; the web app reads it as the learning path
+    if isinstance(value, list):
+        value = {"learning_path": value}
+    return Roadmap.model_validate(value)
+
+
+def parse_roadmap(text) -> Optional[Roadmap]:
+    """The roadmap in an agent's reply, or None if there is no JSON that looks like one."""
+    return extract_json(text, _validate_roadmap)
+
+
+def _step_id(step, position) -> str:
+    for key in ("node_id", "id", "step"):
+        if step.get(key) not in (None, ""):
+            return str(step[key])
+    return str(step.get("title") or position)
+
+
+def _as_nodes(steps):
+    """Roadmap steps as core.dag nodes. Prerequisites may name a step by id, step number or title."""
+    ids = [_step_id(step, i + 1) for i, step in enumerate(steps)]
+    by_title = {str(step["title"]).lower(): node_id for step, node_id in zip(steps, ids) if step.get("title")}
+    nodes = []
+    for position, (step, node_id) in enumerate(zip(steps, ids)):
+        prerequisites = step.get("prerequisites") or []
+        if not isinstance(prerequisites, list):
+            prerequisites = [prerequisites]
+        nodes.append({
+            "node_id": node_id,
+            "title": step.get("title"),
+            "prerequisites": [by_title.get(str(p).lower(), str(p)) for p in prerequisites],
+            "topics": next((step[key] for key in TOPIC_KEYS if isinstance(step.get(key), list)), None),
+            "position": position,
+        })
+    return nodes
+
+
+def roadmap_problems(roadmap: Roadmap) -> List[str]:
+    """What's structurally wrong with the roadmap's step graph; empty if nothing is. Runs in microseconds."""
+    return dag_problems(_as_nodes(getattr(roadmap, roadmap.steps_key())), *TOPICS_PER_STEP, topics_key="topics")
+
+
+def ordered_roadmap(roadmap: Roadmap) -> dict:
+    """The roadmap as a dict, with its steps moved after their prerequisites where they weren't already."""
+    data = roadmap.model_dump(exclude_unset=True)
+    key = roadmap.steps_key()
+    steps = data[key]
+    data[key] = [steps[node["position"]] for node in topological_order(_as_nodes(steps))]
+    return data
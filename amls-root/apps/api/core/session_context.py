@@ -0,0 +1,10 @@
+import contextvars
+
+# The job a span belongs to; JobQueue binds it around each job so spans from the
+# crew (and threads it spawns) can be looked up per roadmap request.
+current_session = contextvars.ContextVar("telemetry_session_id", default=None)
+
+
+def bind_session(session_id):
+    """Attach spans recorded in the current context (and tasks/threads spawned from it) to session_id."""
+    return current_session.set(session_id)
@@ -0,0 +1,110 @@
+import math
+import re
+import zlib
+from collections import Counter
+
+SPARSE_VECTOR_NAME = "bm25"
+
+# BM25 document-side constants; IDF is applied by Qdrant's IDF modifier at query time
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Length normalisation needs an average document length before the stream is fully read,
+# so use a fixed estimate close to our course records
+BM25_AVG_DOC_LEN = 120.0
+
+# Keeps technical spellings intact: c++, c#, node.js, ci/cd, gpt-4
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#./\-]*")
+_STOPWORDS = frozenset("""
+a an and are as at be by for from how in into is it of on or the to with your you
+learn learning course courses tutorial guide beginner beginners intro introduction basics
+""".split())
+
+
+def tokenize(text):
+    tokens = []
+    for token in _TOKEN_RE.findall(str(text).lower()):
+        token = token.rstrip(".-/")
+        if token and token not in _STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+def token_id(token):
+    # Stable across processes and Python versions (unlike hash())
+    return zlib.crc32(token.encode("utf-8")) & 0x7FFFFFFF
+
+
+def course_lexical_text(payload):
+    """Fields that carry the course identity; name and skills are repeated to boost them."""
+    skills = payload.get("skills", [])
+    skills_str = " ".join(skills) if isinstance(skills, list) else str(skills or "")
+    name = payload.get("course_name") or payload.get("name") or ""
+    return f"{name} {name} {skills_str} {skills_str} {payload.get('syllabus', '')}"
+
+
+def document_weights(text, avg_doc_len=BM25_AVG_DOC_LEN):
+    """BM25 term-frequency weights for a document as {token_id: weight}."""
+    counts = Counter(tokenize(text))
+    doc_len = sum(counts.values()) or 1
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len / avg_doc_len)
+    weights = {}
+    for token, tf in counts.items():
+        index = token_id(token)
+        weights[index] = weights.get(index, 0.0) + tf * (BM25_K1 + 1) / (tf + norm)
+    return weights
+
+
+def query_weights(text):
+    return {token_id(token): 1.0 for token in set(tokenize(text))}
+
+
+def to_sparse_vector(weights):
+    from qdrant_client.models import SparseVector
+    indices = sorted(weights)
+    return SparseVector(indices=indices, values=[float(weights[i]) for i in indices])
+
+
+def lexical_match(query, payload):
+    """True when every content word of the query appears in the course name or skills.
+
+    This is what lets "Kubernetes" or "Rust lifetimes" be answered locally even when
+    the dense cosine score sits below the confidence threshold.
+    """
+    query_tokens = set(tokenize(query))
+    if not query_tokens:
+        return False
+    skills = payload.get("skills", [])
+    skills_str = " ".join(skills) if isinstance(skills, list) else str(skills or "")
+    name = payload.get("course_name") or payload.get("name") or ""
+    return query_tokens <= set(tokenize(f"{name} {skills_str}"))
+
+
+class SparseIndex:
+    """In-memory BM25 inverted index used by the local vector backend."""
+
+    def __init__(self, payloads):
+        self.postings = {}
+        self.doc_count = len(payloads)
+        lengths = []
+        doc_tokens = []
+        for payload in payloads:
+            tokens = tokenize(course_lexical_text(payload))
+            doc_tokens.append(tokens)
+            lengths.append(len(tokens))
+        avg_len = (sum(lengths) / len(lengths)) if lengths else BM25_AVG_DOC_LEN
+        for doc, tokens in enumerate(doc_tokens):
+            counts = Counter(tokens)
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * (len(tokens) or 1) / (avg_len or 1))
+            for token, tf in counts.items():
+                self.postings.setdefault(token, []).append((doc, tf * (BM25_K1 + 1) / (tf + norm)))
+
+    def search(self, query, limit=20):
+        scores = {}
+        for token in set(tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (self.doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, weight in postings:
+                scores[doc] = scores.get(doc, 0.0) + idf * weight
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
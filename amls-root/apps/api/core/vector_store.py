@@ -1,10 +1,27 @@
-import json
+import argparse
 import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-from sentence_transformers import SentenceTransformer
+from qdrant_client.models import (
+    Distance, VectorParams, VectorParamsDiff, PointStruct, PointIdsList, CollectionParamsDiff,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType, BinaryQuantization, BinaryQuantizationConfig,
+    SparseVectorParams, Modifier
+)
 from dotenv import load_dotenv
 
+# Allow running this file directly (python core/vector_store.py)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.dataset import iter_courses, build_course_document
+from core.local_index import LocalIndexWriter
+from core.sparse import SPARSE_VECTOR_NAME, course_lexical_text, document_weights, to_sparse_vector
+from core.vector_backends import BACKEND_QDRANT, BACKEND_LOCAL
+from core.models import EMBEDDING_MODEL_NAME, get_embedding_model
+
 load_dotenv()
 
 # Initialize Qdrant client with an extended timeout
@@ -16,88 +33,430 @@ client = QdrantClient(
 
 COLLECTION_NAME = "course_materials"
 
-# Initialize Sentence Transformer model
-model = SentenceTransformer("BAAI/bge-small-en-v1.5")
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", os.path.join(API_DIR, "data", "local_index"))
+
+# Same instance the search tools use, so a process that ingests and searches holds one copy
+model = get_embedding_model()
+
+# Ingestion tuning knobs (overridable from the environment or the CLI)
+UPSERT_BATCH_SIZE = int(os.getenv("INGEST_UPSERT_BATCH_SIZE", "256"))
+UPSERT_WORKERS = int(os.getenv("INGEST_UPSERT_WORKERS", "4"))
+READ_AHEAD = int(os.getenv("INGEST_READ_AHEAD", "2048"))
+
+# Storage layout: "none", "int8" (scalar) or "binary" quantization. Quantized collections keep
+# full-precision originals on disk for rescoring and only the compressed vectors in RAM.
+QUANTIZATION = os.getenv("INGEST_QUANTIZATION", "none").lower()
+ON_DISK_PAYLOAD = os.getenv("INGEST_ON_DISK_PAYLOAD", "false").lower() == "true"
+# Payload fields to leave out entirely; "text" is rebuilt by the search tools when missing.
+# course_key and content_hash are what --diff compares against, so they are always kept.
+REQUIRED_PAYLOAD_FIELDS = ("course_key", "content_hash")
+DROP_PAYLOAD_FIELDS = [
+    f.strip() for f in os.getenv("INGEST_DROP_PAYLOAD_FIELDS", "").split(",")
+    if f.strip() and f.strip() not in REQUIRED_PAYLOAD_FIELDS
+]
+# BM25-style sparse vectors stored next to the dense ones for hybrid search
+SPARSE_ENABLED = os.getenv("INGEST_SPARSE", "true").lower() == "true"
+
+
+def default_encode_batch_size():
+    # bge-small is cheap per item; bigger batches amortise tokenizer and matmul overhead per core
+    env_value = os.getenv("INGEST_ENCODE_BATCH_SIZE")
+    if env_value:
+        return int(env_value)
+    return max(32, min(512, 32 * (os.cpu_count() or 1)))
+
 
-def init_collection():
-    if not client.collection_exists(collection_name=COLLECTION_NAME):
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None if unavailable."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KB, macOS reports bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def quantization_config(kind):
+    if kind == "int8":
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True))
+    if kind == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    if kind in ("none", "", None):
+        return None
+    raise ValueError(f"Unknown quantization '{kind}'. Use none, int8 or binary.")
+
+
+def collection_has_sparse(collection_name: str = COLLECTION_NAME) -> bool:
+    params = client.get_collection(collection_name=collection_name).config.params
+    return SPARSE_VECTOR_NAME in (params.sparse_vectors or {})
+
+
+def init_collection(quantization: str = QUANTIZATION, on_disk_payload: bool = ON_DISK_PAYLOAD,
+                    collection_name: str = COLLECTION_NAME, sparse: bool = SPARSE_ENABLED,
+                    recreate: bool = False) -> bool:
+    """Create or update the collection. Returns whether it carries the sparse index."""
+    quant = quantization_config(quantization)
+    on_disk_vectors = quant is not None
+
+    if recreate and client.collection_exists(collection_name=collection_name):
+        client.delete_collection(collection_name=collection_name)
+
+    if not client.collection_exists(collection_name=collection_name):
         client.create_collection(
-            collection_name=COLLECTION_NAME,
+            collection_name=collection_name,
             vectors_config=VectorParams(
-                size=model.get_sentence_embedding_dimension(), 
-                distance=Distance.COSINE
+                size=model.get_sentence_embedding_dimension(),
+                distance=Distance.COSINE,
+                on_disk=on_disk_vectors
             ),
+            # Qdrant applies IDF at query time, so documents only store BM25 term-frequency weights
+            sparse_vectors_config={SPARSE_VECTOR_NAME: SparseVectorParams(modifier=Modifier.IDF)} if sparse else None,
+            quantization_config=quant,
+            on_disk_payload=on_disk_payload
+        )
+        return sparse
+    if quant is not None or on_disk_payload:
+        # Existing collection: switch the storage layout in place, Qdrant re-optimizes in the background
+        client.update_collection(
+            collection_name=collection_name,
+            vectors_config={"": VectorParamsDiff(on_disk=on_disk_vectors)},
+            quantization_config=quant,
+            collection_params=CollectionParamsDiff(on_disk_payload=on_disk_payload)
         )
 
-def process_and_upsert_data(filepath: str):
-    init_collection()
-    
-    if not os.path.exists(filepath):
-        print(f"File not found: {filepath}")
-        return
+    has_sparse = collection_has_sparse(collection_name)
+    if sparse and not has_sparse:
+        # Named vectors can't be added to an existing collection
+        print(f"Collection '{collection_name}' has no '{SPARSE_VECTOR_NAME}' sparse index; "
+              f"ingesting dense vectors only. Re-run with --recreate to enable hybrid search.")
+    return sparse and has_sparse
 
-    with open(filepath, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-        
-    points = []
-    
-    # Handle variations in JSON structure
-    if isinstance(data, dict):
-        if "courses" in data:
-            data = data["courses"]
-        elif "data" in data:
-            data = data["data"]
-        else:
-            data = list(data.values())
-
-    print(f"Starting to embed and upsert {len(data)} courses...")
-
-    for idx, item in enumerate(data):
-        course_name = item.get("course_name", "")
-        provider = item.get("provider", "")
-        level = item.get("level", "")
-        skills = item.get("skills", [])
-        syllabus = item.get("description", "") # Note: updated from "syllabus" based on your dataset format
-        
-        skills_str = ", ".join(skills) if isinstance(skills, list) else str(skills)
-        text_for_embedding = f"Course: {course_name}\nProvider: {provider}\nLevel: {level}\nSkills: {skills_str}\nSyllabus: {syllabus}"
-        
-        embedding = model.encode(text_for_embedding).tolist()
-        
-        points.append(
-            PointStruct(
-                id=idx + 1,
-                vector=embedding,
-                payload={
-                    "course_name": course_name,
-                    "provider": provider,
-                    "level": level,
-                    "skills": skills,
-                    "syllabus": syllabus,
-                    "text": text_for_embedding
-                }
-            )
+
+def fetch_existing_hashes(page_size=1024):
+    """Map every stored point ID to its content_hash (None for legacy points without one)."""
+    existing = {}
+    offset = None
+    while True:
+        records, offset = client.scroll(
+            collection_name=COLLECTION_NAME,
+            limit=page_size,
+            offset=offset,
+            with_payload=["content_hash"],
+            with_vectors=False
         )
-        
-        # --- THE FIX: Batching logic inside the loop ---
-        if len(points) >= 25:
-            client.upsert(
-                collection_name=COLLECTION_NAME,
-                points=points
+        for record in records:
+            existing[str(record.id)] = (record.payload or {}).get("content_hash")
+        if offset is None:
+            return existing
+
+
+def delete_points(point_ids, batch_size=1024):
+    point_ids = list(point_ids)
+    for start in range(0, len(point_ids), batch_size):
+        client.delete(
+            collection_name=COLLECTION_NAME,
+            points_selector=PointIdsList(points=point_ids[start:start + batch_size])
+        )
+    return len(point_ids)
+
+
+def _read_ahead(iterable, maxsize):
+    """Stage 1: parse the dataset on a background thread into a bounded queue."""
+    sentinel = object()
+    buffer = queue.Queue(maxsize=maxsize)
+    errors = []
+
+    def producer():
+        try:
+            for item in iterable:
+                buffer.put(item)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            buffer.put(sentinel)
+
+    threading.Thread(target=producer, name="ingest-reader", daemon=True).start()
+    while True:
+        item = buffer.get()
+        if item is sentinel:
+            break
+        yield item
+    if errors:
+        raise errors[0]
+
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _Upserter:
+    """Stage 3: ship point batches to Qdrant on a small thread pool.
+
+    In-flight batches are capped so a slow Qdrant applies backpressure to the
+    encoder instead of buffering the whole dataset in memory.
+    """
+
+    def __init__(self, workers):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest-upsert")
+        self.slots = threading.Semaphore(workers * 2)
+        self.lock = threading.Lock()
+        self.errors = []
+        self.upserted = 0
+
+    def _upsert(self, points):
+        try:
+            client.upsert(collection_name=COLLECTION_NAME, points=points)
+            with self.lock:
+                self.upserted += len(points)
+        except Exception as e:
+            with self.lock:
+                self.errors.append(e)
+        finally:
+            self.slots.release()
+
+    def submit(self, points):
+        if self.errors:
+            raise self.errors[0]
+        self.slots.acquire()
+        self.executor.submit(self._upsert, points)
+
+    def close(self, commit=True):
+        # Batches already sent to Qdrant stay there either way. On a failed run, drop the queued
+        # ones and leave the original exception to propagate rather than an upsert error
+        self.executor.shutdown(wait=True, cancel_futures=not commit)
+        if commit and self.errors:
+            raise self.errors[0]
+
+
+def _changed_documents(items, existing, counts, with_sparse=False):
+    """Turn raw courses into documents, dropping duplicates and (in diff mode) unchanged ones."""
+    seen = counts["seen_ids"]
+    seen_hashes = set()
+    # The dropped-field list is part of the hash so changing it rewrites every point in diff mode
+    salt = EMBEDDING_MODEL_NAME + "|drop=" + ",".join(sorted(DROP_PAYLOAD_FIELDS))
+    for item in items:
+        point_id, text, payload = build_course_document(item, salt=salt)
+        # Same course_key and same content: a true duplicate
+        if payload["content_hash"] in seen_hashes:
+            counts["duplicates"] += 1
+            continue
+        seen_hashes.add(payload["content_hash"])
+        if point_id in seen:
+            # Different courses can share a key (provider::name when there's no id or url); keep both
+            point_id, text, payload = build_course_document(
+                item, salt=salt, key=f"{payload['course_key']}#{payload['content_hash'][:16]}"
             )
-            print(f"Upserted a batch of 25 courses... (Total processed: {idx + 1})")
-            points = [] # Clear the list for the next batch
-            
-    # Flush any remaining points that didn't divide perfectly into 25
-    if points:
-        client.upsert(
+        seen.add(point_id)
+        # Sparse weights come from the full record, before any payload fields are dropped
+        sparse = document_weights(course_lexical_text(payload)) if with_sparse else None
+        for field in DROP_PAYLOAD_FIELDS:
+            payload.pop(field, None)
+        if existing is None:
+            yield point_id, text, payload, sparse
+            continue
+        stored_hash = existing.get(point_id)
+        if stored_hash == payload["content_hash"]:
+            counts["unchanged"] += 1
+            continue
+        counts["changed" if point_id in existing else "new"] += 1
+        yield point_id, text, payload, sparse
+
+
+def export_local_index(path: str = DEFAULT_LOCAL_INDEX_PATH, dtype: str = "float16", page_size: int = 1024):
+    """Dump the Qdrant collection into a local index without re-embedding anything."""
+    writer = LocalIndexWriter(path, model.get_sentence_embedding_dimension(), dtype=dtype)
+    offset = None
+    while True:
+        records, offset = client.scroll(
             collection_name=COLLECTION_NAME,
-            points=points
+            limit=page_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True
         )
-        print(f"Successfully upserted final batch. Total processed: {len(data)}.")
+        if records:
+            vectors = [r.vector[""] if isinstance(r.vector, dict) else r.vector for r in records]
+            writer.add([str(r.id) for r in records], vectors, [r.payload for r in records])
+        if offset is None:
+            break
+    writer.close()
+    print(f"Exported {writer.upserted} points from '{COLLECTION_NAME}' to local index at {path} ({dtype}).")
+    return writer.upserted
+
+
+def process_and_upsert_data(filepath: str, encode_batch_size: int = None, upsert_batch_size: int = UPSERT_BATCH_SIZE,
+                            upsert_workers: int = UPSERT_WORKERS, multi_process: bool = False, diff: bool = False,
+                            backend: str = BACKEND_QDRANT, local_index_path: str = DEFAULT_LOCAL_INDEX_PATH,
+                            local_dtype: str = "float16", quantization: str = QUANTIZATION,
+                            on_disk_payload: bool = ON_DISK_PAYLOAD, sparse: bool = SPARSE_ENABLED,
+                            recreate: bool = False):
+    """Embed and upsert the course dataset.
+
+    Point IDs are derived from course identity, so re-running is idempotent. With
+    diff=True only new or changed courses (by content_hash) are embedded, and
+    points whose course disappeared from the dataset are deleted. With
+    backend="local" the vectors are written to a memory-mappable local index
+    instead of Qdrant (always a full rebuild). quantization ("int8"/"binary")
+    and on_disk_payload set the Qdrant storage layout; sparse adds BM25 vectors
+    for hybrid search (recreate=True drops the collection first).
+    """
+    if backend not in (BACKEND_QDRANT, BACKEND_LOCAL):
+        raise ValueError(f"Unknown backend '{backend}'.")
+    if backend == BACKEND_LOCAL and diff:
+        raise ValueError("Diff mode only applies to the Qdrant backend; the local index is rebuilt in full.")
+    with_sparse = False
+    if backend == BACKEND_QDRANT:
+        with_sparse = init_collection(quantization=quantization, on_disk_payload=on_disk_payload,
+                                      sparse=sparse, recreate=recreate)
+
+    if not os.path.exists(filepath):
+        print(f"File not found: {filepath}")
+        return
+
+    existing = None
+    if diff:
+        existing = fetch_existing_hashes()
+        print(f"Diff mode: {len(existing)} points already in '{COLLECTION_NAME}'.")
+
+    encode_batch_size = encode_batch_size or default_encode_batch_size()
+    print(f"Starting to embed and upsert courses from {filepath} "
+          f"(encode batch {encode_batch_size}, upsert batch {upsert_batch_size}, {upsert_workers} upsert workers"
+          f"{', multi-process encoding' if multi_process else ''})...")
+
+    if multi_process and not hasattr(model, "start_multi_process_pool"):
+        # The embedding service already batches across callers; there is no local model to fork
+        print("Multi-process encoding is unavailable with EMBEDDING_SERVICE_URL; encoding through the service.")
+        multi_process = False
+    pool = model.start_multi_process_pool() if multi_process else None
+    # In multi-process mode each worker gets a full batch per call
+    chunk_size = encode_batch_size * len(pool["processes"]) if pool else encode_batch_size
+
+    counts = {"seen_ids": set(), "duplicates": 0, "unchanged": 0, "changed": 0, "new": 0}
+    if backend == BACKEND_LOCAL:
+        upserter = LocalIndexWriter(local_index_path, model.get_sentence_embedding_dimension(), dtype=local_dtype)
+    else:
+        upserter = _Upserter(upsert_workers)
+    started = time.perf_counter()
+    processed = 0
+    points = []
+    completed = False
+
+    try:
+        documents_stream = _changed_documents(_read_ahead(iter_courses(filepath), READ_AHEAD), existing, counts, with_sparse)
+        # Stage 2: encode whole chunks at once while earlier chunks are still being upserted
+        for documents in _batched(documents_stream, chunk_size):
+            texts = [document[1] for document in documents]
+            if pool:
+                embeddings = model.encode_multi_process(texts, pool, batch_size=encode_batch_size)
+            else:
+                embeddings = model.encode(texts, batch_size=encode_batch_size, show_progress_bar=False)
+
+            for (point_id, _, payload, sparse_weights), embedding in zip(documents, embeddings):
+                processed += 1
+                vector = embedding.tolist()
+                if sparse_weights is not None:
+                    vector = {"": vector, SPARSE_VECTOR_NAME: to_sparse_vector(sparse_weights)}
+                points.append(PointStruct(id=point_id, vector=vector, payload=payload))
+                if len(points) >= upsert_batch_size:
+                    upserter.submit(points)
+                    points = []
+
+            elapsed = time.perf_counter() - started
+            print(f"Encoded {processed} courses ({processed / elapsed:.1f} courses/sec)")
+
+        # Flush any remaining points that didn't divide perfectly into a batch
+        if points:
+            upserter.submit(points)
+        completed = True
+    finally:
+        upserter.close(commit=completed)
+        if pool:
+            model.stop_multi_process_pool(pool)
+
+    deleted = 0
+    if existing is not None:
+        deleted = delete_points(set(existing) - counts["seen_ids"])
+
+    elapsed = time.perf_counter() - started
+    rss = peak_rss_mb()
+    stats = {
+        "courses": len(counts["seen_ids"]),
+        "embedded": processed,
+        "upserted": upserter.upserted,
+        "unchanged": counts["unchanged"],
+        "new": counts["new"],
+        "changed": counts["changed"],
+        "deleted": deleted,
+        "duplicates": counts["duplicates"],
+        "seconds": round(elapsed, 2),
+        "courses_per_sec": round(processed / elapsed, 1) if elapsed else 0.0,
+        "peak_rss_mb": round(rss, 1) if rss is not None else None,
+    }
+    if diff:
+        print(f"Diff summary: {stats['new']} new, {stats['changed']} changed, "
+              f"{stats['unchanged']} unchanged, {stats['deleted']} deleted.")
+    if stats["duplicates"]:
+        print(f"Skipped {stats['duplicates']} duplicate courses (same course_key and content).")
+    print(f"Successfully upserted {stats['upserted']} courses in {stats['seconds']}s "
+          f"({stats['courses_per_sec']} courses/sec, peak RSS "
+          f"{stats['peak_rss_mb'] if rss is not None else 'n/a'} MB).")
+    return stats
+
 
 if __name__ == "__main__":
     # Resolve path dynamically to apps/api/data/combined_dataset.json
-    api_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    data_path = os.path.join(api_dir, "data", "combined_dataset.json")
-    process_and_upsert_data(data_path)
\ No newline at end of file
+    default_path = os.path.join(API_DIR, "data", "combined_dataset.json")
+
+    parser = argparse.ArgumentParser(description="Embed the course dataset and upsert it into Qdrant (or a local index).")
+    parser.add_argument("filepath", nargs="?", default=default_path)
+    parser.add_argument("--batch-size", type=int, default=None, help="Texts per SentenceTransformer.encode call.")
+    parser.add_argument("--upsert-batch-size", type=int, default=UPSERT_BATCH_SIZE)
+    parser.add_argument("--upsert-workers", type=int, default=UPSERT_WORKERS)
+    parser.add_argument("--multi-process", action="store_true", help="Encode with one worker process per CPU/GPU.")
+    parser.add_argument("--diff", action="store_true", help="Only embed new/changed courses and delete removed ones.")
+    parser.add_argument("--backend", choices=[BACKEND_QDRANT, BACKEND_LOCAL], default=BACKEND_QDRANT)
+    parser.add_argument("--local-index-path", default=DEFAULT_LOCAL_INDEX_PATH)
+    parser.add_argument("--local-dtype", choices=["float16", "float32"], default="float16")
+    parser.add_argument("--quantization", choices=["none", "int8", "binary"], default=QUANTIZATION,
+                        help="Keep compressed vectors in RAM and full-precision originals on disk.")
+    parser.add_argument("--on-disk-payload", action="store_true", default=ON_DISK_PAYLOAD,
+                        help="Store payloads on disk instead of RAM.")
+    parser.add_argument("--no-sparse", action="store_true", help="Skip the BM25 sparse vectors used by hybrid search.")
+    parser.add_argument("--recreate", action="store_true", help="Drop and recreate the collection (needed to add the sparse index).")
+    parser.add_argument("--export-local", action="store_true", help="Copy the existing Qdrant collection into the local index and exit.")
+    args = parser.parse_args()
+
+    if args.export_local:
+        export_local_index(args.local_index_path, dtype=args.local_dtype)
+        sys.exit(0)
+
+    process_and_upsert_data(
+        args.filepath,
+        encode_batch_size=args.batch_size,
+        upsert_batch_size=args.upsert_batch_size,
+        upsert_workers=args.upsert_workers,
+        multi_process=args.multi_process,
+        diff=args.diff,
+        backend=args.backend,
+        local_index_path=args.local_index_path,
+        local_dtype=args.local_dtype,
+        quantization=args.quantization,
+        on_disk_payload=args.on_disk_payload,
+        sparse=SPARSE_ENABLED and not args.no_sparse,
+        recreate=args.recreate,
+    )
@@ -1,10 +1,25 @@
-from fastapi import FastAPI
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
-import json
-import re
+import asyncio
+import importlib
+import os
+import threading
+
+# crewai and torch are deliberately not imported here: the crew modules and the
+# embedding model are loaded by the startup warmup thread (or on first use), not at import.
+from core import tavily_client, models, telemetry
+from core.roadmap import parse_roadmap
+from core.ttl_cache import SQLiteTTLCache, make_key
+from core.job_queue import JobQueue, QueueFullError
+from core.llm_scheduler import get_scheduler
+from core.llm_cache import get_completion_cache
 
-from agents.crew import generate_roadmap
+API_DIR = os.path.dirname(os.path.abspath(__file__))
 
 app = FastAPI(title="AMLS API", description="AI-Powered Autonomous Micro-Learning System backend")
 
@@ -29,53 +44,170 @@ class GenerateRequest(BaseModel):
     experience: str = "Beginner"
     requirements: str = "None"
 
+# Finished roadmaps keyed by the normalized request, shared by every worker on the host
+roadmap_cache = SQLiteTTLCache(
+    os.getenv("ROADMAP_CACHE_PATH", os.path.join(API_DIR, ".cache", "roadmaps.sqlite3")),
+    table="roadmaps",
+    ttl_seconds=int(os.getenv("ROADMAP_CACHE_TTL_SECONDS", "604800")),
+    max_entries=int(os.getenv("ROADMAP_CACHE_MAX_ENTRIES", "1000"))
+)
+
+def _normalize_field(value: str) -> str:
+    return " ".join((value or "").lower().split())
+
+def _roadmap_cache_key(request: GenerateRequest) -> str:
+    requirements = _normalize_field(request.requirements)
+    if requirements in ("", "none", "n/a"):
+        requirements = "none"
+    return make_key("roadmap", _normalize_field(request.topic), _normalize_field(request.experience), requirements)
+
+# Crew runs happen on a fixed worker pool, off the request threadpool. Identical requests
+# that arrive while one is queued or running attach to that job instead of starting their own.
+roadmap_jobs = JobQueue(
+    "roadmap",
+    workers=int(os.getenv("ROADMAP_WORKERS", "2")),
+    max_pending=int(os.getenv("ROADMAP_QUEUE_SIZE", "8"))
+)
+
+# Exported on /metrics next to the crew spans; the search caches only exist once the crew is loaded
+telemetry.registry.register_stats("roadmap_jobs", roadmap_jobs.stats)
+telemetry.registry.register_stats("roadmap_cache", roadmap_cache.stats)
+telemetry.registry.register_stats("llm_scheduler", lambda: get_scheduler().stats())
+telemetry.registry.register_stats("llm_cache", lambda: get_completion_cache().stats() if get_completion_cache() else {})
+
+@app.on_event("shutdown")
+def close_http_pools():
+    tavily_client.close()
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the AMLS API"}
 
+# Readiness waits for these; anything else still loads lazily on first use
+READINESS_COMPONENTS = ("embedding_model", "crew")
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+startup_timings = {"import_seconds": None, "warmup_seconds": None}
+
+def _warmup():
+    started = time.perf_counter()
+    try:
+        # One encode so the first real query doesn't pay for tokenizer/kernel initialisation
+        models.get_embedding_model().encode("warmup")
+        models.warm_component("crew", lambda: importlib.import_module("agents.crew"))
+    except Exception as e:
+        print(f"Warmup failed: {e}")
+    startup_timings["warmup_seconds"] = round(time.perf_counter() - started, 3)
+
+@app.on_event("startup")
+def start_warmup():
+    if WARMUP_ON_STARTUP:
+        threading.Thread(target=_warmup, name="warmup", daemon=True).start()
+
 @app.get("/health")
+@app.get("/health/live")
 def health_check():
+    # Liveness: the process is up and serving, whether or not models have loaded
     return {"status": "healthy"}
 
+@app.get("/health/ready")
+def readiness_check():
+    ready = models.is_ready(READINESS_COMPONENTS) if WARMUP_ON_STARTUP else True
+    body = {
+        "status": "ready" if ready else "starting",
+        "components": models.component_status(),
+        **startup_timings
+    }
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+@app.get("/api/stats")
+def stats():
+    from tools.search_tools import query_embedding_cache, tavily_cache, syllabus_search_stats
+    return {
+        "query_embedding_cache": query_embedding_cache.stats(),
+        "tavily_cache": tavily_cache.stats(),
+        "syllabus_search": dict(syllabus_search_stats),
+        "roadmap_cache": roadmap_cache.stats(),
+        "roadmap_jobs": roadmap_jobs.stats(),
+        "llm_scheduler": get_scheduler().stats(),
+        "llm_cache": get_completion_cache().stats() if get_completion_cache() else {"mode": "off"},
+        "startup": {**startup_timings, "components": models.component_status()}
+    }
+
+@app.get("/metrics")
+def metrics():
+    # Prometheus text format: crew/task/agent/LLM/tool span histograms, token and retry counters
+    return PlainTextResponse(telemetry.render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/spans/{job_id}")
+def get_spans(job_id: str, limit: int = 500):
+    # Spans of one roadmap job, oldest first, while they are still in the in-memory span log
+    return {"job_id": job_id, "spans": telemetry.span_log.recent(job_id, limit)}
+
+@app.post("/api/roadmap/cache/invalidate")
+def invalidate_roadmap(request: GenerateRequest):
+    return {"status": "success", "invalidated": roadmap_cache.delete(_roadmap_cache_key(request))}
+
+@app.delete("/api/roadmap/cache")
+def clear_roadmap_cache():
+    return {"status": "success", "invalidated": roadmap_cache.clear()}
+
 @app.post("/api/roadmap")
-def generate_endpoint(request: GenerateRequest):
+async def generate_endpoint(request: GenerateRequest):
+    cache_key = _roadmap_cache_key(request)
+    # SQLite read (and touch/expiry write) that can wait out the busy timeout; keep it off the event loop
+    cached = await asyncio.to_thread(roadmap_cache.get_with_age, cache_key)
+    if cached is not None:
+        roadmap, age_seconds = cached
+        return {"status": "success", "roadmap": roadmap, "cached": True, "cache_age_seconds": round(age_seconds, 1)}
+
+    try:
+        job_id, shared = roadmap_jobs.submit(cache_key, _run_roadmap_crew, request, cache_key)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail="Too many roadmaps are being generated, try again shortly.", headers={"Retry-After": str(e.retry_after)})
+
+    # Poll /api/roadmap_status/{job_id} for the result
+    return {"status": "processing", "job_id": job_id, "coalesced": shared}
+
+@app.get("/api/roadmap_status/{job_id}")
+async def get_roadmap_status(job_id: str):
+    job = roadmap_jobs.get(job_id)
+    if job is None:
+        return {"status": "unknown"}
+    if job["status"] in ("queued", "processing"):
+        return {"status": job["status"], "job_id": job_id, "position": job.get("position")}
+    return {**job["result"], "job_id": job_id, "cached": False, "cache_age_seconds": 0}
+
+def _run_roadmap_crew(request: GenerateRequest, cache_key: str) -> dict:
     # Combine the form fields into a richer prompt for the CrewAI agents
     enriched_skill_prompt = f"Topic: {request.topic}. User Experience Level: {request.experience}. Special Requirements: {request.requirements}"
     
     try:
         # Call the CrewAI orchestration function
+        from agents.crew import generate_roadmap
         roadmap_result = generate_roadmap(enriched_skill_prompt)
         
-        # Try to parse the result as JSON in case the agent returned a JSON string
-        try:
-            clean_result = roadmap_result.strip()
-            
-            # Use regex to perfectly extract the JSON block even if Gemini includes conversational text
-            match = re.search(r'```(?:json)?\s*(\{.*\}|\[.*\])\s*```', clean_result, re.DOTALL)
-            if match:
-                clean_result = match.group(1)
-            else:
-                # Fallback: extract from first { or [ to last } or ]
-                match_raw = re.search(r'(\{.*\}|\[.*\])', clean_result, re.DOTALL)
-                if match_raw:
-                    clean_result = match_raw.group(1)
-                
-            json_response = json.loads(clean_result)
-            return {"status": "success", "roadmap": json_response}
-        except json.JSONDecodeError as e:
-            print(f"Failed to decode CrewAI JSON payload: {e}")
-            print(f"Raw output was: {roadmap_result}")
-            # If it's not valid JSON after all regex attempts, return an error state
-            # so the frontend doesn't try to save a malformed string to Supabase 'jsonb'
+        # The largest JSON object in the reply that looks like a roadmap, ignoring any conversational text around it
+        roadmap = parse_roadmap(roadmap_result)
+        if roadmap is None:
+            print(f"Failed to extract a roadmap from the CrewAI output. Raw output was: {roadmap_result}")
+            # Return an error state so the frontend doesn't try to save a malformed string to Supabase 'jsonb'
             return {
                 "status": "error", 
                 "message": "CrewAI agents failed to return a valid JSON format.", 
                 "raw": roadmap_result 
             }
+
+        json_response = roadmap.model_dump(exclude_unset=True)
+        # Only parsed roadmaps are cached; error payloads always get a fresh attempt
+        roadmap_cache.set(cache_key, json_response)
+        return {"status": "success", "roadmap": json_response}
             
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+startup_timings["import_seconds"] = round(time.perf_counter() - _IMPORT_STARTED, 3)
+print(f"AMLS API imported in {startup_timings['import_seconds']}s")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
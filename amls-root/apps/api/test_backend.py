@@ -1,10 +1,19 @@
 import requests
 import json
+import time
 
 try:
     response = requests.post('http://localhost:8000/api/roadmap', json={"topic": "React"})
     print("STATUS:", response.status_code)
+    result = response.json()
+
+    # Roadmaps are generated in the background; poll until the job finishes
+    while result.get("status") in ("processing", "queued"):
+        time.sleep(3)
+        result = requests.get(f"http://localhost:8000/api/roadmap_status/{result['job_id']}").json()
+        print("JOB STATUS:", result.get("status"))
+
     print("JSON RESPONSE:")
-    print(json.dumps(response.json(), indent=2))
+    print(json.dumps(result, indent=2))
 except Exception as e:
     print("ERROR:", e)
@@ -1,17 +1,106 @@
 import os
 import json
+import sqlite3
+import threading
 from crewai.tools import tool
-from qdrant_client import QdrantClient
-from sentence_transformers import SentenceTransformer
+from core import tavily_client
+from core.embedding_cache import cache_from_env
+from core.models import EMBEDDING_MODEL_NAME, get_embedding_model, get_qdrant_client
+from core.ttl_cache import SQLiteTTLCache, make_key
+from core.vector_backends import backend_from_env
+from core.sparse import lexical_match
+from core.roadmap import NOT_A_ROADMAP, parse_roadmap, roadmap_problems
 
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-# Initialize clients globally so they don't reload on every tool call
-qdrant_client = QdrantClient(
-    url=os.getenv("QDRANT_URL"),
-    api_key=os.getenv("QDRANT_API_KEY")
+# Agents re-issue near-identical queries constantly; reuse their vectors instead of re-encoding.
+# The model itself is only loaded (once per process, via core.models) on the first cache miss.
+query_embedding_cache = cache_from_env(lambda text: get_embedding_model().encode(text), EMBEDDING_MODEL_NAME)
+
+_vector_backend = None
+_vector_backend_lock = threading.Lock()
+
+def get_vector_backend():
+    # Qdrant server by default (with the local index as a fallback when present), or VECTOR_BACKEND=local
+    global _vector_backend
+    if _vector_backend is None:
+        with _vector_backend_lock:
+            if _vector_backend is None:
+                _vector_backend = backend_from_env(get_qdrant_client, "course_materials", default_index_path=os.path.join(API_DIR, "data", "local_index"))
+    return _vector_backend
+
+# Shared on-disk cache so every uvicorn worker on this host reuses Tavily results
+tavily_cache = SQLiteTTLCache(
+    os.getenv("TAVILY_CACHE_PATH", os.path.join(API_DIR, ".cache", "tavily.sqlite3")),
+    table="tavily_search",
+    ttl_seconds=int(os.getenv("TAVILY_CACHE_TTL_SECONDS", "86400")),
+    max_entries=int(os.getenv("TAVILY_CACHE_MAX_ENTRIES", "5000"))
 )
-embedding_model = SentenceTransformer('BAAI/bge-small-en-v1.5')
-from tavily import TavilyClient
+
+def _tavily_cache_key(query: str, search_depth: str, max_results: int) -> str:
+    return make_key("tavily", " ".join(query.lower().split()), search_depth, max_results)
+
+def _cache_get(key: str):
+    # A locked or unreadable cache file costs a Tavily call, not the search
+    try:
+        return tavily_cache.get(key)
+    except sqlite3.Error as e:
+        print(f"Warning: Tavily cache read failed, searching directly. {e}")
+        return None
+
+def _cache_set(key: str, response: dict):
+    if not (response and response.get("results")):
+        return
+    try:
+        tavily_cache.set(key, response)
+    except sqlite3.Error as e:
+        print(f"Warning: Could not cache Tavily results. {e}")
+
+def cached_tavily_search(api_key: str, query: str, search_depth: str, max_results: int) -> dict:
+    """Tavily search keyed by (query, depth, max_results); only non-empty responses are cached."""
+    key = _tavily_cache_key(query, search_depth, max_results)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    response = tavily_client.search(api_key, query, search_depth=search_depth, max_results=max_results)
+    _cache_set(key, response)
+    return response
+
+def _web_syllabus_query(skill_query: str) -> str:
+    # We prompt Tavily to find step-by-step learning roadmaps or course syllabi
+    return f"Best learning roadmap or complete step-by-step course syllabus for {skill_query} 2026"
+
+def _format_web_syllabus(skill_query: str, response: dict) -> str:
+    if not response or not response.get("results"):
+        return f"No web results found for {skill_query}."
+        
+    formatted_results = [f"Found {len(response['results'])} relevant articles. Use this information to construct a standard learning curriculum for {skill_query}, and MAKE SURE to include the URLs as references:"]
+    
+    for idx, result in enumerate(response["results"]):
+        title = result.get("title", "Unknown Title")
+        url = result.get("url", "")
+        content = result.get("content", "")[:1000] # Take first 1000 characters of each top result
+        
+        formatted_results.append(f"\n--- Source {idx+1} ---\nTitle: {title}\nURL: {url}\nContent Snippet: {content}")
+        
+    return "\n".join(formatted_results)
+
+def _resource_links_query(topic_query: str) -> str:
+    return f"Best free online tutorial, guide, or interactive course for {topic_query} 2026"
+
+def _format_resource_links(topic_query: str, response: dict) -> str:
+    if not response or not response.get("results"):
+        return f"No related tutorials found for {topic_query}."
+        
+    formatted_results = [f"Found the following top resources for {topic_query}:"]
+    
+    for result in response["results"]:
+        title = result.get("title", "Unknown Title")
+        url = result.get("url", "")
+        formatted_results.append(f"- {title}: {url}")
+        
+    return "\n".join(formatted_results)
 
 @tool("Web Syllabus Search")
 def web_syllabus_search(skill: str) -> str:
@@ -23,23 +112,8 @@ def web_syllabus_search(skill: str) -> str:
         return "ERROR: TAVILY_API_KEY is not set in the environment. Cannot perform web search."
         
     try:
-        tavily = TavilyClient(api_key=tavily_key)
-        # We prompt Tavily to find step-by-step learning roadmaps or course syllabi
-        response = tavily.search(query=f"Best learning roadmap or complete step-by-step course syllabus for {skill_query} 2026", search_depth="advanced", max_results=3)
-        
-        if not response or not response.get("results"):
-            return f"No web results found for {skill_query}."
-            
-        formatted_results = [f"Found {len(response['results'])} relevant articles. Use this information to construct a standard learning curriculum for {skill_query}, and MAKE SURE to include the URLs as references:"]
-        
-        for idx, result in enumerate(response["results"]):
-            title = result.get("title", "Unknown Title")
-            url = result.get("url", "")
-            content = result.get("content", "")[:1000] # Take first 1000 characters of each top result
-            
-            formatted_results.append(f"\n--- Source {idx+1} ---\nTitle: {title}\nURL: {url}\nContent Snippet: {content}")
-            
-        return "\n".join(formatted_results)
+        response = cached_tavily_search(tavily_key, _web_syllabus_query(skill_query), search_depth="advanced", max_results=3)
+        return _format_web_syllabus(skill_query, response)
     except Exception as e:
         return f"Error retrieving web results for {skill_query}: {e}"
 
@@ -53,57 +127,70 @@ def find_resource_links(topic: str) -> str:
         return "ERROR: TAVILY_API_KEY is not set."
         
     try:
-        tavily = TavilyClient(api_key=tavily_key)
-        response = tavily.search(query=f"Best free online tutorial, guide, or interactive course for {topic_query} 2026", search_depth="basic", max_results=3)
-        
-        if not response or not response.get("results"):
-            return f"No related tutorials found for {topic_query}."
-            
-        formatted_results = [f"Found the following top resources for {topic_query}:"]
-        
-        for result in response["results"]:
-            title = result.get("title", "Unknown Title")
-            url = result.get("url", "")
-            formatted_results.append(f"- {title}: {url}")
-            
-        return "\n".join(formatted_results)
+        response = cached_tavily_search(tavily_key, _resource_links_query(topic_query), search_depth="basic", max_results=3)
+        return _format_resource_links(topic_query, response)
     except Exception as e:
         return f"Error retrieving resources for {topic_query}: {e}"
 
+# Dense + BM25 fused retrieval; set HYBRID_SEARCH=false for the old dense-only behaviour
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+
+# How often the local database answers versus sending agents to the web fallback
+syllabus_search_stats = {"queries": 0, "answered_locally": 0, "lexical_rescues": 0, "not_found": 0}
+_search_stats_lock = threading.Lock()
+
+def _count_search(key: str):
+    with _search_stats_lock:
+        syllabus_search_stats[key] += 1
+
+def _syllabus_text(payload: dict) -> str:
+    # Slim ingestions (INGEST_DROP_PAYLOAD_FIELDS=text) don't store the pre-joined text
+    if payload.get('text'):
+        return payload['text']
+    skills = payload.get('skills', [])
+    skills_str = ", ".join(skills) if isinstance(skills, list) else str(skills or "")
+    return f"Provider: {payload.get('provider', '')}\nSkills: {skills_str}\n{payload.get('syllabus', '')}"
+
 @tool("Qdrant Syllabus Search")
 def search_syllabi(query: str) -> str:
     """Searches the Qdrant database for top course syllabi matching the skill query."""
-    vector = embedding_model.encode(query).tolist()
-    results = qdrant_client.query_points(
-        collection_name="course_materials",
-        query=vector,
-        limit=5
-    ).points
+    vector = query_embedding_cache.get(query)
+    _count_search("queries")
+    if HYBRID_SEARCH:
+        results = get_vector_backend().hybrid_query(vector, query, limit=5)
+    else:
+        results = get_vector_backend().query(vector, limit=5)
 
     formatted_results = []
+    lexical_rescue = False
     for res in results:
         # Only accept highly confident matches! Adjust the threshold based on your model's typical scores.
-        if hasattr(res, 'score') and res.score < 0.70:
-            continue
+        # Exact skill names matched lexically in the course name/skills are accepted regardless.
+        if res.score is None or res.score < 0.70:
+            if not lexical_match(query, res.payload):
+                continue
+            lexical_rescue = True
             
         # Note: mapping 'course_name' based on vector_store payload, or default to 'name'
         name_val = res.payload.get('course_name') or res.payload.get('name')
-        formatted_results.append(f"Course: {name_val}\nLevel: {res.payload.get('level')}\nSyllabus: {res.payload.get('text')}")
+        formatted_results.append(f"Course: {name_val}\nLevel: {res.payload.get('level')}\nSyllabus: {_syllabus_text(res.payload)}")
         
     if not formatted_results:
+        _count_search("not_found")
         return "ERROR_NOT_FOUND: The local database does not contain this skill. You MUST use the 'Web Syllabus Search' tool instead."
         
+    _count_search("answered_locally")
+    if lexical_rescue:
+        _count_search("lexical_rescues")
     return "\n\n---\n\n".join(formatted_results)
 
-@tool("Roadmap JSON Structurer")
-def format_roadmap_json(raw_text: str) -> str:
-    """Forces raw syllabus text into a structured JSON micro-learning roadmap."""
-    # In a full implementation, this might do additional regex or parsing
-    # For now, it signals the LLM to strictly format its output.
-    return "Ensure your final response is strictly valid JSON matching the UI Node schema."
-
 @tool("Prerequisite Validator")
 def validate_prerequisites(roadmap_json: str) -> str:
-    """Analyzes a JSON roadmap to ensure foundational skills are not skipped."""
-    # This is where the Critic Agent will pass the roadmap for QA
+    """Checks a JSON roadmap for prerequisite cycles, prerequisites that name no step, and steps with too few or too many topics."""
+    roadmap = parse_roadmap(roadmap_json)
+    if roadmap is None:
+        return NOT_A_ROADMAP
+    problems = roadmap_problems(roadmap)
+    if problems:
+        return "Fix these problems:\n" + "\n".join(f"- {problem}" for problem in problems)
     return "Validation complete. No missing prerequisites detected."
@@ -35,6 +35,55 @@ const preInsertRoadmapDB = async (supabase: any, userId: string, activeTopic: st
   return data;
 };
 
+const streamMacroEvents = (Url: string, sessionId: string) => new Promise<any>((resolve, reject) => {
+  const source = new EventSource(`${Url}/api/macro_events/${sessionId}`);
+  let received = false;
+
+  source.addEventListener('blueprint', () => { received = true; console.log("Blueprint ready"); });
+  source.addEventListener('node_completed', (event) => {
+    received = true;
+    console.log("Module ready:", JSON.parse((event as MessageEvent).data).node_id);
+  });
+  source.addEventListener('completed', (event) => {
+    source.close();
+    resolve(JSON.parse((event as MessageEvent).data));
+  });
+  source.addEventListener('error', (event) => {
+    const data = (event as MessageEvent).data;
+    if (data) {
+      source.close();
+      const payload = JSON.parse(data);
+      reject(new Error(`CrewAI execution failed: ${payload.message || 'Unknown error'}`));
+    } else if (!received && source.readyState === EventSource.CLOSED) {
+      // The stream never opened; let the caller fall back to polling
+      reject(new Error('Progress stream closed'));
+    }
+    // Otherwise the browser reconnects on its own and resumes from Last-Event-ID
+  });
+});
+
+const pollMacroStatus = async (Url: string, sessionId: string) => {
+  while (true) {
+    await new Promise(resolve => setTimeout(resolve, 5000));
+
+    try {
+      const statusRes = await fetch(`${Url}/api/macro_status/${sessionId}`);
+      if (!statusRes.ok) throw new Error(`Status check failed with ${statusRes.status}`);
+
+      const statusData = await statusRes.json();
+
+      if (statusData.status === 'completed') {
+        return statusData;
+      } else if (statusData.status === 'error') {
+        throw new Error(`CrewAI execution failed: ${statusData.message || statusData.detail || 'Unknown error'}`);
+      }
+      // if 'processing' or 'unknown', just loop again
+    } catch (e) {
+      console.warn("Polling error, retrying...", e);
+    }
+  }
+};
+
 const fetchRoadmapFromAI = async (sessionId: string, activeTopic: string, payload: any) => {
   const Url = 'http://localhost:8000';
   const response = await fetch(`${Url}/api/start_macro`, {
@@ -57,26 +106,14 @@ const fetchRoadmapFromAI = async (sessionId: string, activeTopic: string, payloa
 
   const initialData = await response.json();
 
-  // If the backend returns that it's processing asynchronously, we poll
+  // If the backend returns that it's processing asynchronously, follow its progress stream
   if (initialData.status === 'processing') {
-    while (true) {
-      await new Promise(resolve => setTimeout(resolve, 5000));
-
-      try {
-        const statusRes = await fetch(`${Url}/api/macro_status/${sessionId}`);
-        if (!statusRes.ok) throw new Error(`Status check failed with ${statusRes.status}`);
-
-        const statusData = await statusRes.json();
-
-        if (statusData.status === 'completed') {
-          return statusData;
-        } else if (statusData.status === 'error') {
-          throw new Error(`CrewAI execution failed: ${statusData.message || statusData.detail || 'Unknown error'}`);
-        }
-        // if 'processing' or 'unknown', just loop again
-      } catch (e) {
-        console.warn("Polling error, retrying...", e);
-      }
+    try {
+      return await streamMacroEvents(Url, sessionId);
+    } catch (e: any) {
+      if (e?.message?.startsWith('CrewAI execution failed')) throw e;
+      console.warn("Progress stream unavailable, falling back to polling...", e);
+      return await pollMacroStatus(Url, sessionId);
     }
   }
 
@@ -1,7 +1,8 @@
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 # Load the environment variables from the .env file
 load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env"))
@@ -10,34 +11,89 @@ from pydantic import BaseModel
 from master_flow.main import MasterFlow
 
 # --- ADDED FOR LOGGING ---
-import re
-class DualLogger:
-    def __init__(self, original_stdout, filename):
-        self.original_stdout = original_stdout
-        self.log_file = open(filename, "a", encoding="utf-8")
-        self.ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-        
-    def write(self, text):
-        self.original_stdout.write(text)
-        clean_text = self.ansi_escape.sub('', text)
-        self.log_file.write(clean_text)
-        self.log_file.flush()
-        
-    def flush(self):
-        self.original_stdout.flush()
-        self.log_file.flush()
-
-sys.stdout = DualLogger(sys.stdout, "temp_master_flow.log")
-sys.stderr = sys.stdout
+# Console output is mirrored to rotating log files by a background writer thread,
+# so verbose crew output never blocks on disk I/O in request handling
+from master_flow.core.log_pipeline import LogPipeline, TeeStream, bind_session
+log_pipeline = LogPipeline(
+    os.getenv("MASTER_FLOW_LOG_DIR", os.path.join(os.path.dirname(__file__), "logs")),
+    json_lines=os.getenv("MASTER_FLOW_LOG_FORMAT", "text").lower() == "json",
+    per_session=os.getenv("MASTER_FLOW_SESSION_LOGS", "1") != "0",
+    max_bytes=int(os.getenv("MASTER_FLOW_LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+    backup_count=int(os.getenv("MASTER_FLOW_LOG_BACKUPS", "5")),
+    rotate_seconds=int(os.getenv("MASTER_FLOW_LOG_ROTATE_SECONDS", "86400"))
+)
+sys.stdout = TeeStream(sys.stdout, log_pipeline, "stdout")
+sys.stderr = TeeStream(sys.stderr, log_pipeline, "stderr")
 # -------------------------
 
 from typing import Optional
 import asyncio
 from master_flow.model.system_state import SystemState
+from master_flow.tools.search_tools import get_query_embedding_cache, get_tavily_cache, syllabus_search_stats
+from master_flow.core import tavily_client
+from master_flow.core.single_flight import SingleFlight
+from master_flow.core.ttl_cache import SQLiteTTLCache, make_key
+from master_flow.core.session_store import SessionStatusStore
+from master_flow.core.progress import progress_bus, format_sse
+from master_flow.core.llm_scheduler import get_scheduler
+from master_flow.core.llm_cache import get_completion_cache
+from master_flow.core import telemetry
+
+# Comment line sent on idle SSE streams so proxies don't drop the connection
+SSE_KEEPALIVE_SECONDS = 15
 
 app = FastAPI()
 
-active_flows = {}  # In-memory dictionary to track background generation tasks
+
+
+def _status_from_persistence(session_id: str):
+    """Rebuild a macro_status payload from the flow's persisted state, if it ever ran here."""
+    from crewai.flow.persistence import SQLiteFlowPersistence
+    state = SQLiteFlowPersistence().load_state(session_id)
+    if not state:
+        return None
+    # Completed only if every blueprint node finished; a checkpoint mid-run or a run with failed nodes is not
+    node_ids = {node.get("node_id") for node in (state.get("blueprint") or {}).get("nodes") or [] if node.get("node_id")}
+    node_status = state.get("node_status") or {}
+    if node_ids and all(node_status.get(node_id) == "completed" for node_id in node_ids):
+        return {
+            "status": "completed",
+            "response": {
+                "status": "complete",
+                "reply": "Your complete, personalized micro-learning course is ready!",
+                "blueprint": state["blueprint"],
+                "course_content": state["completed_modules"]
+            },
+            "state": state,
+            "session_id": session_id
+        }
+    return {"status": "error", "message": "This session stopped before the course was finished. Start it again to resume."}
+
+
+# Status of generation tasks: in-flight and recently finished sessions in memory, everything else on disk
+active_flows = SessionStatusStore(
+    SQLiteTTLCache(
+        os.getenv("MACRO_RESULTS_PATH", os.path.join(os.path.dirname(__file__), "..", ".cache", "macro_results.sqlite3")),
+        table="macro_results",
+        ttl_seconds=int(os.getenv("MACRO_RESULTS_TTL_SECONDS", "604800")),
+        max_entries=int(os.getenv("MACRO_RESULTS_MAX_ENTRIES", "10000"))
+    ),
+    max_entries=int(os.getenv("MACRO_STATUS_MEMORY_ENTRIES", "128")),
+    ttl_seconds=int(os.getenv("MACRO_STATUS_MEMORY_TTL_SECONDS", "900")),
+    fallback=_status_from_persistence
+)
+# In-flight progress histories hold node content too, so they count against the same memory cap
+progress_bus.max_sessions = active_flows.max_entries
+# New sessions asking for an identical course while one is being generated share that run
+macro_flights = SingleFlight("start_macro")
+
+# Exported on /metrics next to the crew spans
+telemetry.registry.register_stats("start_macro_coalescing", macro_flights.stats)
+telemetry.registry.register_stats("session_status", active_flows.stats)
+telemetry.registry.register_stats("query_embedding_cache", lambda: get_query_embedding_cache().stats())
+telemetry.registry.register_stats("tavily_cache", lambda: get_tavily_cache().stats())
+telemetry.registry.register_stats("llm_scheduler", lambda: get_scheduler().stats())
+telemetry.registry.register_stats("llm_cache", lambda: get_completion_cache().stats() if get_completion_cache() else {})
 
 # Allow frontend requests
 app.add_middleware(
@@ -50,12 +106,32 @@ app.add_middleware(
 
 
 
+@app.on_event("shutdown")
+async def close_http_pools():
+    tavily_client.close()
+    await tavily_client.aclose()
+    log_pipeline.close()
+
+
 class StartMacroRequest(BaseModel):
     session_id: str
     topic: str
     experience: str
     goal: str
     constraints: str
+    # Reuse a persisted blueprint and finished nodes for this session when the inputs haven't changed
+    resume: bool = True
+
+
+def _macro_flight_key(req: StartMacroRequest) -> str:
+    normalize = lambda value: " ".join((value or "").lower().split())
+    return make_key("macro", normalize(req.topic), normalize(req.experience), normalize(req.goal), normalize(req.constraints))
+
+
+def _rebind_session(final_response: dict, session_id: str) -> dict:
+    """Copy a finished flow response produced for another session over to session_id."""
+    state = {**final_response.get("state", {}), "id": session_id}
+    return {**final_response, "state": state, "session_id": session_id, "coalesced": True}
 
 @app.post("/api/start_macro")
 async def start_macro_endpoint(req: StartMacroRequest):
@@ -66,8 +142,8 @@ async def start_macro_endpoint(req: StartMacroRequest):
     
     # Instantiate persistence layer to check if a session already exists
     from crewai.flow.persistence import SQLiteFlowPersistence
-    persistence = SQLiteFlowPersistence()
-    previous_state = persistence.load_state(req.session_id)
+    persistence = await asyncio.to_thread(SQLiteFlowPersistence)
+    previous_state = await asyncio.to_thread(persistence.load_state, req.session_id)
     
     # If a previous state exists, completely hydrate our newly instantiated flow
     if previous_state:
@@ -82,23 +158,48 @@ async def start_macro_endpoint(req: StartMacroRequest):
     flow.state.experience = req.experience
     flow.state.goal = req.goal
     flow.state.constraints = req.constraints
+    flow.state.resume = bool(
+        req.resume and previous_state
+        and all(previous_state.get(field) == getattr(req, field) for field in ("topic", "experience", "goal", "constraints"))
+    )
     
     print(f"Starting macro flow for session {flow.state.id} with topic: {req.topic}")
     
     # Initialize state in dictionary
-    active_flows[req.session_id] = {"status": "processing"}
+    await asyncio.to_thread(active_flows.set, req.session_id, {"status": "processing"})
+    progress_bus.reset(req.session_id)
+    progress_bus.publish(req.session_id, "started", {"session_id": req.session_id, "topic": req.topic})
+
+    async def run_flow():
+        result = await flow.kickoff_async() 
+        response_data = result if isinstance(result, dict) else {"status": "completed", "result": result}
+        return {
+            "status": "completed",
+            "response": response_data,
+            "state": flow.state.model_dump(),
+            "session_id": flow.state.id
+        }
 
     async def execute_flow():
+        # Everything printed while this flow runs also lands in logs/sessions/<session_id>.log
+        bind_session(req.session_id)
         try:
-            result = await flow.kickoff_async() 
-            response_data = result if isinstance(result, dict) else {"status": "completed", "result": result}
-            final_response = {
-                "status": "completed",
-                "response": response_data,
-                "state": flow.state.model_dump(),
-                "session_id": flow.state.id
-            }
-            active_flows[req.session_id] = final_response
+            if previous_state:
+                # Resumed sessions carry their own history, so they never share a run
+                final_response = await run_flow()
+            else:
+                final_response, shared = await macro_flights.ado(_macro_flight_key(req), run_flow)
+                if shared:
+                    final_response = _rebind_session(final_response, req.session_id)
+                    # Persist the copied state so this session can be resumed like any other
+                    await asyncio.to_thread(persistence.save_state, req.session_id, "finish_course", final_response["state"])
+                    # The shared run published its progress under the leader's session; replay it here
+                    progress_bus.publish(req.session_id, "blueprint", {"blueprint": final_response["state"].get("blueprint")})
+                    for module in final_response["state"].get("completed_modules", []):
+                        progress_bus.publish(req.session_id, "node_completed", {"node_id": module.get("node_id"), "content": module})
+            # Writes the whole course through to disk, so off the loop like every store and persistence call
+            await asyncio.to_thread(active_flows.set, req.session_id, final_response)
+            progress_bus.publish(req.session_id, "completed", final_response)
             
             import json
             with open("temp_master_flow_output.json", "w", encoding="utf-8") as f:
@@ -106,7 +207,9 @@ async def start_macro_endpoint(req: StartMacroRequest):
                 
         except Exception as e:
             print(f"Error during CrewAI execution: {str(e)}")
-            active_flows[req.session_id] = {"status": "error", "message": str(e)}
+            error_response = {"status": "error", "message": str(e)}
+            await asyncio.to_thread(active_flows.set, req.session_id, error_response)
+            progress_bus.publish(req.session_id, "error", error_response)
 
     # Dispatch to background task to prevent browser HTTP timeout
     asyncio.create_task(execute_flow())
@@ -116,8 +219,91 @@ async def start_macro_endpoint(req: StartMacroRequest):
 
 @app.get("/api/macro_status/{session_id}")
 async def get_macro_status(session_id: str):
-    if session_id in active_flows:
-        return active_flows[session_id]
-    
-    # If not found in active memory, check if persistence DB has it marked complete (future implementation)
+    # Memory first, then the on-disk result store, then the flow's persisted state
+    status = await asyncio.to_thread(active_flows.get, session_id)
+    if status is not None:
+        return status
     return {"status": "unknown"}
+
+
+@app.get("/api/macro_events/{session_id}")
+async def stream_macro_events(session_id: str, request: Request):
+    """Server-sent events: started, blueprint, node_completed/node_failed per node, then completed or error."""
+    known = progress_bus.has_session(session_id)
+    final = None if known else await asyncio.to_thread(active_flows.get, session_id)
+    if not known and final is None:
+        raise HTTPException(status_code=404, detail="Unknown session_id.")
+
+    try:
+        last_event_id = int(request.headers.get("last-event-id", "0"))
+    except ValueError:
+        last_event_id = 0
+
+    async def event_stream():
+        if not known:
+            # History was evicted, so all that can be reported is the final outcome
+            if final.get("status") in ("completed", "error"):
+                yield format_sse({"id": 0, "event": final["status"], "data": final})
+                return
+
+        events = progress_bus.subscribe(session_id, last_event_id).__aiter__()
+        next_event = None
+        try:
+            while True:
+                if next_event is None:
+                    next_event = asyncio.ensure_future(events.__anext__())
+                done, _ = await asyncio.wait({next_event}, timeout=SSE_KEEPALIVE_SECONDS)
+                if not done:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                try:
+                    message = next_event.result()
+                except StopAsyncIteration:
+                    return
+                next_event = None
+                if message["event"] in ("completed", "error") and message["data"] is None:
+                    # The bus keeps no payload for finished sessions; the status store has it
+                    message = {**message, "data": await asyncio.to_thread(active_flows.get, session_id)}
+                yield format_sse(message)
+        finally:
+            if next_event is not None:
+                next_event.cancel()
+                try:
+                    await next_event
+                except (asyncio.CancelledError, StopAsyncIteration):
+                    pass
+            await events.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# Plain def: the cache stats count SQLite rows, so FastAPI runs these in its threadpool
+@app.get("/api/stats")
+def get_stats():
+    return {
+        "query_embedding_cache": get_query_embedding_cache().stats(),
+        "tavily_cache": get_tavily_cache().stats(),
+        "syllabus_search": dict(syllabus_search_stats),
+        "start_macro_coalescing": macro_flights.stats(),
+        "session_status": active_flows.stats(),
+        "llm_scheduler": get_scheduler().stats(),
+        "llm_cache": get_completion_cache().stats() if get_completion_cache() else {"mode": "off"}
+    }
+
+
+@app.get("/metrics")
+def metrics():
+    # Prometheus text format: crew/task/agent/LLM/tool span histograms, token and retry counters
+    return PlainTextResponse(telemetry.render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/api/spans/{session_id}")
+async def get_spans(session_id: str, limit: int = 500):
+    # Spans of one session, oldest first, while they are still in the in-memory span log
+    return {"session_id": session_id, "spans": telemetry.span_log.recent(session_id, limit)}
@@ -0,0 +1,118 @@
+import heapq
+
+
+def topological_order(nodes):
+    """Order blueprint nodes so every node comes after its prerequisites.
+
+    Ties are broken by the node's position in the blueprint, so the result is
+    deterministic and keeps the architect's ordering wherever the DAG allows.
+    Prerequisites that name unknown nodes are ignored; nodes caught in a cycle
+    are appended at the end in blueprint order rather than dropped. A node
+    without a node_id can't be anyone's prerequisite but is still ordered.
+    """
+    # First node for each id; duplicates and id-less nodes are only placed by their own prerequisites
+    index = {}
+    for i, node in enumerate(nodes):
+        if node.get("node_id"):
+            index.setdefault(node["node_id"], i)
+    dependents = [[] for _ in nodes]
+    indegree = [0] * len(nodes)
+    for i, node in enumerate(nodes):
+        for prereq in set(node.get("prerequisites") or []):
+            j = index.get(prereq)
+            if j is not None and j != i:
+                dependents[j].append(i)
+                indegree[i] += 1
+
+    ready = [i for i, degree in enumerate(indegree) if degree == 0]
+    heapq.heapify(ready)
+    ordered = []
+    while ready:
+        i = heapq.heappop(ready)
+        ordered.append(nodes[i])
+        for dependent in dependents[i]:
+            indegree[dependent] -= 1
+            if indegree[dependent] == 0:
+                heapq.heappush(ready, dependent)
+
+    if len(ordered) < len(nodes):
+        placed = {id(node) for node in ordered}
+        ordered.extend(node for node in nodes if id(node) not in placed)
+    return ordered
+
+
+def _find_cycles(prerequisites):
+    """Prerequisite cycles in {node_id: [prerequisite ids]}, each as the list of ids around it."""
+    state = {}  # node_id -> 1 while on the DFS path, 2 once finished
+    cycles = []
+    for root in prerequisites:
+        if root in state:
+            continue
+        path, on_path = [], {}
+        stack = [(root, iter(prerequisites[root]))]
+        state[root] = 1
+        path.append(root)
+        on_path[root] = 0
+        while stack:
+            node_id, children = stack[-1]
+            for child in children:
+                if child not in prerequisites:
+                    continue
+                if state.get(child) == 1:
+                    cycles.append(path[on_path[child]:] + [child])
+                elif child not in state:
+                    state[child] = 1
+                    on_path[child] = len(path)
+                    path.append(child)
+                    stack.append((child, iter(prerequisites[child])))
+                    break
+            else:
+                stack.pop()
+                state[node_id] = 2
+                path.pop()
+                del on_path[node_id]
+    return cycles
+
+
+def dag_problems(nodes, min_topics=None, max_topics=None, topics_key="suggested_micro_topics"):
+    """Structural problems with blueprint nodes, one readable message each; empty if the graph is sound.
+
+    Checks for missing and duplicate node_ids, prerequisites that name the node
+    itself or no node at all, prerequisite cycles and, where the bounds are
+    given, nodes whose topics_key list is outside [min_topics, max_topics].
+    Nodes listed before their prerequisites are not a problem:
+    topological_order fixes that without another LLM call.
+    """
+    problems = []
+    prerequisites = {}
+    unique = []
+    for i, node in enumerate(nodes):
+        node_id = node.get("node_id")
+        if not node_id:
+            problems.append(f"Node {i + 1} ({node.get('title', 'untitled')}) has no node_id.")
+            continue
+        if node_id in prerequisites:
+            problems.append(f"node_id '{node_id}' is used by more than one node.")
+            continue
+        prerequisites[node_id] = list(dict.fromkeys(node.get("prerequisites") or []))
+        unique.append(node)
+
+    for node in unique:
+        node_id = node["node_id"]
+        for prereq in prerequisites[node_id]:
+            if prereq == node_id:
+                problems.append(f"'{node_id}' lists itself as a prerequisite.")
+            elif prereq not in prerequisites:
+                problems.append(f"'{node_id}' requires '{prereq}', which does not exist.")
+        topics = node.get(topics_key)
+        if topics is not None:
+            if min_topics is not None and len(topics) < min_topics:
+                problems.append(f"'{node_id}' has {len(topics)} {topics_key}, fewer than {min_topics}.")
+            if max_topics is not None and len(topics) > max_topics:
+                problems.append(f"'{node_id}' has {len(topics)} {topics_key}, more than {max_topics}.")
+
+    # Self-references are already reported above
+    graph = {node_id: [p for p in prereqs if p != node_id] for node_id, prereqs in prerequisites.items()}
+    for cycle in _find_cycles(graph):
+        problems.append("Prerequisite cycle (each node requires the next): " + " -> ".join(cycle) + ".")
+    return problems
@@ -0,0 +1,51 @@
+import os
+
+BACKEND_TORCH = "torch"
+BACKEND_ONNX = "onnx"
+BACKEND_ONNX_INT8 = "onnx-int8"
+EMBEDDING_BACKENDS = (BACKEND_TORCH, BACKEND_ONNX, BACKEND_ONNX_INT8)
+
+DEFAULT_ONNX_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".cache", "onnx"))  # per-app
+
+
+def _quantized_model_dir(model_name, onnx_dir):
+    return os.path.join(onnx_dir, model_name.replace("/", "__"))
+
+
+def _ensure_int8_export(model_name, onnx_dir, quantization_config):
+    """Export the ONNX model with dynamic int8 quantization once; later loads reuse the files."""
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    target = _quantized_model_dir(model_name, onnx_dir)
+    file_name = f"onnx/model_qint8_{quantization_config}.onnx"
+    if not os.path.exists(os.path.join(target, file_name)):
+        print(f"Exporting int8 ONNX model for {model_name} ({quantization_config}) to {target}...")
+        fp32 = SentenceTransformer(model_name, backend=BACKEND_ONNX)
+        fp32.save(target)
+        export_dynamic_quantized_onnx_model(fp32, quantization_config, target)
+    return target, file_name
+
+
+def load_sentence_transformer(model_name, backend=None, onnx_dir=None, quantization_config=None):
+    """SentenceTransformer for model_name on the selected CPU inference backend.
+
+    backend is EMBEDDING_BACKEND by default: "torch" (PyTorch, the default),
+    "onnx" (ONNX Runtime, fp32) or "onnx-int8" (ONNX Runtime with dynamic int8
+    quantization, exported on first use under EMBEDDING_ONNX_DIR). All three
+    keep the model's pooling and normalization, so vectors stay comparable with
+    an index built by another backend; the amls API's
+    benchmarks/bench_embedding_backends.py checks that agreement.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    backend = (backend or os.getenv("EMBEDDING_BACKEND", BACKEND_TORCH)).lower()
+    if backend == BACKEND_TORCH:
+        return SentenceTransformer(model_name)
+    if backend == BACKEND_ONNX:
+        return SentenceTransformer(model_name, backend=BACKEND_ONNX)
+    if backend == BACKEND_ONNX_INT8:
+        # avx512_vnni / avx512 / avx2 / arm64; match the CPUs that serve traffic
+        quantization_config = quantization_config or os.getenv("EMBEDDING_ONNX_QUANTIZATION", "avx2")
+        path, file_name = _ensure_int8_export(model_name, onnx_dir or os.getenv("EMBEDDING_ONNX_DIR", DEFAULT_ONNX_DIR), quantization_config)
+        return SentenceTransformer(path, backend=BACKEND_ONNX, model_kwargs={"file_name": file_name})
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}'. Use one of {', '.join(EMBEDDING_BACKENDS)}.")
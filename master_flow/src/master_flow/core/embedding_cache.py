@@ -0,0 +1,141 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+# Trailing phrases agents tack onto a skill that do not change what we retrieve
+_FILLER_SUFFIXES = (
+    "for absolute beginners",
+    "for beginners",
+    "for dummies",
+    "from scratch",
+    "tutorial",
+    "course",
+)
+_FILLER_RE = re.compile(r"(?:\s+(?:" + "|".join(re.escape(s) for s in _FILLER_SUFFIXES) + r"))+$")
+_TRIM_CHARS = " \t\r\n.,;:!?\"'`"
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form used as the cache key (and as the text we actually encode)."""
+    text = " ".join(str(query).lower().split()).strip(_TRIM_CHARS)
+    stripped = _FILLER_RE.sub("", text).strip(_TRIM_CHARS)
+    return stripped or text
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU of query vectors with an optional SQLite tier that survives restarts.
+
+    Keys are normalized query text scoped by model name, so two spellings of the
+    same question share one encode and a model swap never returns stale vectors.
+    """
+
+    def __init__(self, encode_fn, model_name, max_entries=4096, disk_path=None):
+        self.encode_fn = encode_fn
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.encode_seconds = 0.0
+
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self._db = sqlite3.connect(disk_path, timeout=10.0, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+
+    def _key(self, normalized):
+        return f"{self.model_name}\0{normalized}"
+
+    def _remember(self, key, vector):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_get(self, key):
+        row = self._db.execute("SELECT vector FROM query_embeddings WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return array("f", row[0]).tolist()
+
+    def _disk_put(self, key, vector):
+        self._db.execute(
+            "INSERT OR REPLACE INTO query_embeddings (key, vector) VALUES (?, ?)",
+            (key, array("f", vector).tobytes())
+        )
+        self._db.commit()
+
+    def get(self, query: str) -> list:
+        normalized = normalize_query(query)
+        key = self._key(normalized)
+
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+            if self._db is not None:
+                vector = self._disk_get(key)
+                if vector is not None:
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                    return vector
+
+        # Encode outside the lock so concurrent tool calls don't serialize on the model
+        started = time.perf_counter()
+        vector = self.encode_fn(normalized)
+        vector = vector.tolist() if hasattr(vector, "tolist") else list(vector)
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self.misses += 1
+            self.encode_seconds += elapsed
+            self._remember(key, vector)
+            if self._db is not None:
+                self._disk_put(key, vector)
+        return vector
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM query_embeddings")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.disk_hits + self.misses
+            avg_encode = self.encode_seconds / self.misses if self.misses else 0.0
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk_tier": self._db is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / total, 4) if total else 0.0,
+                "encode_seconds": round(self.encode_seconds, 4),
+                "saved_encode_seconds": round((self.hits + self.disk_hits) * avg_encode, 4),
+            }
+
+
+def cache_from_env(encode_fn, model_name):
+    return QueryEmbeddingCache(
+        encode_fn,
+        model_name,
+        max_entries=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "4096")),
+        disk_path=os.getenv("QUERY_EMBEDDING_CACHE_PATH") or None
+    )
@@ -0,0 +1,50 @@
+"""Client for the host-wide embedding service.
+
+The service itself lives in the amls API (core/embedding_service.py) and is
+started once per host:
+
+    python -m core.embedding_service --port 8765
+
+master_flow workers only talk to it, via EMBEDDING_SERVICE_URL, so a host
+running both APIs still loads a single bge-small model.
+"""
+import httpx
+import numpy as np
+
+
+class EmbeddingServiceClient:
+    """Stands in for a SentenceTransformer by calling the local embedding service.
+
+    url is http://host:port or unix:///path/to.sock. Only encode() and
+    get_sentence_embedding_dimension() are provided, which is all the search
+    tools and the ingestion pipeline use.
+    """
+
+    def __init__(self, url, timeout=30.0):
+        self.url = url
+        if url.startswith("unix://"):
+            transport = httpx.HTTPTransport(uds=url[len("unix://"):])
+            self._client = httpx.Client(transport=transport, base_url="http://embedding", timeout=timeout)
+        else:
+            self._client = httpx.Client(base_url=url, timeout=timeout)
+        self._dimension = None
+
+    def encode(self, sentences, batch_size=None, show_progress_bar=None, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        response = self._client.post("/encode", json={"texts": texts})
+        response.raise_for_status()
+        vectors = np.asarray(response.json()["vectors"], dtype=np.float32)
+        return vectors[0] if single else vectors
+
+    def get_sentence_embedding_dimension(self):
+        if self._dimension is None:
+            response = self._client.get("/health")
+            response.raise_for_status()
+            self._dimension = response.json()["dimension"]
+        return self._dimension
+
+    def stats(self) -> dict:
+        response = self._client.get("/stats")
+        response.raise_for_status()
+        return response.json()
@@ -0,0 +1,120 @@
+import bisect
+import json
+import re
+
+_OPENERS = {"{": "}", "[": "]"}
+_CLOSERS = {"}", "]"}
+# Everything else is skipped at regex speed
+_TOKENS = re.compile(r'[{}\[\]"\\\n]')
+# Deeper spans would hit the json module's recursion limit; their nested spans are still tried
+MAX_DEPTH = 500
+_decoder = json.JSONDecoder()
+
+
+class _Span:
+    __slots__ = ("start", "end", "children", "depth")
+
+    def __init__(self, start, end, children):
+        self.start = start
+        self.end = end
+        self.children = children
+        self.depth = 1 + max((child.depth for child in children), default=0)
+
+
+def _bracket_spans(text):
+    """Top-level balanced {...} / [...] spans of text, each with its nested spans, in one pass.
+
+    Quotes only open a string inside a bracket, so apostrophes in the prose
+    around the JSON don't matter. JSON strings can't contain a raw newline, so
+    meeting one inside a string means the bracket was prose ("[see above]")
+    and the open brackets are dropped. Spans nested in dropped or mismatched
+    brackets are kept as top-level spans of their own.
+    """
+    roots = []
+    stack = []  # [opening char, start index, closed child spans]
+    in_string = False
+    escaped_at = -2  # index of the last backslash inside a string
+
+    def abandon():
+        for _, _, children in stack:
+            roots.extend(children)
+        stack.clear()
+
+    for match in _TOKENS.finditer(text):
+        i, ch = match.start(), match.group()
+        if in_string:
+            if i == escaped_at + 1:
+                continue  # the escaped character of \" or \\
+            if ch == "\\":
+                escaped_at = i
+            elif ch == '"':
+                in_string = False
+            elif ch == "\n":
+                in_string = False
+                abandon()
+        elif ch in _OPENERS:
+            stack.append([ch, i, []])
+        elif not stack:
+            continue
+        elif ch == '"':
+            in_string = True
+        elif ch in _CLOSERS:
+            if _OPENERS[stack[-1][0]] != ch:
+                abandon()
+                continue
+            _, start, children = stack.pop()
+            span = _Span(start, i + 1, children)
+            (stack[-1][2] if stack else roots).append(span)
+    abandon()
+    return roots
+
+
+def extract_json(text, validate=None):
+    """The largest JSON object or array embedded in text (an LLM reply), or None.
+
+    Markdown fences, chatty preambles and trailing notes are all skipped.
+    Brackets are matched in a single pass. Candidates are then parsed from the
+    outermost spans inwards, one level of disjoint spans at a time and largest
+    first within a level, so the first one that parses is the answer. A greedy
+    `\\{.*\\}` regex backtracks on long replies and can join two unrelated
+    objects; this approach avoids both.
+
+    When a span fails to parse at some offset, every span nested in it that
+    contains that offset would fail at the same place, so those are skipped.
+    Without validate, no part of the text is parsed twice, so deep nesting
+    like [[[...x...]]] stays linear. Spans nested deeper than MAX_DEPTH are
+    not parsed at all.
+
+    validate, if given, is called with each parsed candidate. Its return value
+    is what gets returned (e.g. Blueprint.model_validate). A candidate it
+    rejects with ValueError or TypeError (pydantic's ValidationError is a
+    ValueError) is skipped, and the spans nested inside it are tried next. That
+    way a roadmap wrapped in an unexpected outer object is still found.
+    """
+    if not text:
+        return None
+    failed_at = []  # sorted offsets where a parse failed
+    level = _bracket_spans(text)
+    while level:
+        # Largest first, so prose like "{topic}" is only parsed if nothing bigger is valid
+        for span in sorted(level, key=lambda span: span.start - span.end):
+            if span.depth > MAX_DEPTH:
+                continue
+            i = bisect.bisect_right(failed_at, span.start)
+            if i < len(failed_at) and failed_at[i] < span.end:
+                continue
+            try:
+                value, end = _decoder.raw_decode(text, span.start)
+            except json.JSONDecodeError as e:
+                bisect.insort(failed_at, e.pos)
+                continue
+            except RecursionError:
+                continue
+            if end != span.end:
+                continue
+            try:
+                return validate(value) if validate is not None else value
+            except (ValueError, TypeError):
+                continue
+        level = [child for span in level for child in span.children]
+    return None
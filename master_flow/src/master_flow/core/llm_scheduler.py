@@ -0,0 +1,227 @@
+import asyncio
+import functools
+import heapq
+import itertools
+import os
+import threading
+import time
+
+from master_flow.core.telemetry import record_span
+
+# Lower runs first. Interactive requests jump batch work; macro planning gates
+# every micro crew, so it goes ahead of node content.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_MACRO = 10
+PRIORITY_MICRO = 20
+PRIORITY_BATCH = 30
+
+# How often a queued coroutine checks whether it has reached the head of the line, and the
+# longest it sleeps at the head (settle() can hand back budget before the computed refill)
+ASYNC_POLL_SECONDS = 0.05
+ASYNC_MAX_SLEEP_SECONDS = 1.0
+
+# Rough chars-per-token for Gemini-style tokenizers; only used to size requests
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(payload) -> int:
+    """Cheap token estimate for a prompt (str, message dicts, or anything str()-able)."""
+    if payload is None:
+        return 0
+    if isinstance(payload, str):
+        return len(payload) // CHARS_PER_TOKEN + 1
+    if isinstance(payload, dict):
+        return estimate_tokens(payload.get("content", ""))
+    if isinstance(payload, (list, tuple)):
+        return sum(estimate_tokens(item) for item in payload)
+    return estimate_tokens(str(payload))
+
+
+class RateLimitScheduler:
+    """Process-wide token buckets for requests-per-minute and tokens-per-minute.
+
+    Every LLM call in the process acquires here before it is sent, so however
+    many crews run concurrently they share one quota instead of each applying
+    its own limit to the same API key. Waiters are served strictly by
+    (priority, arrival). A call's token cost is estimated up front and
+    corrected with settle() once the response is known.
+    """
+
+    def __init__(self, rpm=15, tpm=250000, name="llm"):
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self._cond = threading.Condition()
+        self._request_budget = float(rpm)
+        self._token_budget = float(tpm)
+        self._refilled_at = time.monotonic()
+        self._waiters = []
+        self._seq = itertools.count()
+        self.granted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        self._request_budget = min(self.rpm, self._request_budget + elapsed * self.rpm / 60.0)
+        self._token_budget = min(self.tpm, self._token_budget + elapsed * self.tpm / 60.0)
+
+    def _delay_for(self, tokens) -> float:
+        request_gap = max(0.0, 1.0 - self._request_budget) * 60.0 / self.rpm
+        token_gap = max(0.0, tokens - self._token_budget) * 60.0 / self.tpm
+        return max(request_gap, token_gap)
+
+    def _grant_or_delay(self, ticket, tokens):
+        """With the lock held: take the budget if ticket is first in line and it's available.
+
+        Returns 0.0 once granted, the seconds until the budget refills if ticket
+        is first in line, or None while another waiter is ahead of it.
+        """
+        self._refill()
+        if self._waiters[0] != ticket:
+            return None
+        delay = self._delay_for(tokens)
+        if delay > 0:
+            return delay
+        self._request_budget -= 1
+        self._token_budget -= tokens
+        return 0.0
+
+    def _leave(self, ticket):
+        self._waiters.remove(ticket)
+        heapq.heapify(self._waiters)
+        # The next head may be able to go now
+        self._cond.notify_all()
+
+    def _granted(self, start) -> float:
+        waited = time.monotonic() - start
+        self.granted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        return waited
+
+    def acquire(self, priority=PRIORITY_MICRO, tokens=0) -> float:
+        """Block until this call may be sent. Returns the seconds spent waiting."""
+        # A single call larger than the whole per-minute quota can only ever wait for a full bucket
+        tokens = min(tokens, self.tpm)
+        start = time.monotonic()
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    delay = self._grant_or_delay(ticket, tokens)
+                    if delay == 0:
+                        break
+                    self._cond.wait(delay)
+            finally:
+                self._leave(ticket)
+            return self._granted(start)
+
+    async def aacquire(self, priority=PRIORITY_MICRO, tokens=0) -> float:
+        """acquire() for coroutines, waiting on the event loop instead of in a thread.
+
+        Async waiters share the same (priority, arrival) queue as threads but
+        poll with asyncio.sleep, since the Condition can only wake threads.
+        Budget is taken at the moment of the grant, so a call cancelled while
+        queued just leaves the queue without spending any.
+        """
+        tokens = min(tokens, self.tpm)
+        start = time.monotonic()
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiters, ticket)
+        try:
+            while True:
+                with self._cond:
+                    delay = self._grant_or_delay(ticket, tokens)
+                if delay == 0:
+                    break
+                await asyncio.sleep(ASYNC_POLL_SECONDS if delay is None else min(delay, ASYNC_MAX_SLEEP_SECONDS))
+        finally:
+            with self._cond:
+                self._leave(ticket)
+        with self._cond:
+            return self._granted(start)
+
+    def settle(self, estimated_tokens, actual_tokens):
+        """Charge the difference between the up-front estimate and what the call really used."""
+        with self._cond:
+            self._token_budget -= actual_tokens - min(estimated_tokens, self.tpm)
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            self._refill()
+            depth = {}
+            for priority, _ in self._waiters:
+                depth[priority] = depth.get(priority, 0) + 1
+            return {
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+                "queue_depth": len(self._waiters),
+                "queue_depth_by_priority": depth,
+                "available_requests": round(self._request_budget, 2),
+                "available_tokens": int(self._token_budget),
+                "granted": self.granted,
+                "avg_wait_seconds": round(self.total_wait / self.granted, 3) if self.granted else 0.0,
+                "max_wait_seconds": round(self.max_wait, 3),
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RateLimitScheduler:
+    """The process-wide Gemini scheduler (GEMINI_RPM / GEMINI_TPM)."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = RateLimitScheduler(
+                    rpm=int(os.getenv("GEMINI_RPM", "15")),
+                    tpm=int(os.getenv("GEMINI_TPM", "250000")),
+                    name="gemini"
+                )
+    return _scheduler
+
+
+def _record_queue_span(scheduler, priority, waited, tokens, call_kwargs):
+    # crewai passes the calling agent as from_agent; the span lands in the caller's session
+    agent = getattr(call_kwargs.get("from_agent"), "role", None)
+    record_span("llm_queue", f"{scheduler.name}:{priority}", waited, agent=agent, tokens=tokens)
+
+
+def rate_limited(llm, priority=PRIORITY_MICRO, scheduler=None):
+    """Route llm.call / llm.acall through the shared scheduler. Returns the same llm object."""
+    scheduler = scheduler or get_scheduler()
+    call = getattr(llm, "call", None)
+    acall = getattr(llm, "acall", None)
+
+    if call is not None:
+        @functools.wraps(call)
+        def scheduled_call(messages, *args, **kwargs):
+            estimated = estimate_tokens(messages)
+            waited = scheduler.acquire(priority, estimated)
+            _record_queue_span(scheduler, priority, waited, estimated, kwargs)
+            result = call(messages, *args, **kwargs)
+            scheduler.settle(estimated, estimated + estimate_tokens(result))
+            return result
+        # object.__setattr__ so this also works when the LLM class is a pydantic model
+        object.__setattr__(llm, "call", scheduled_call)
+
+    if acall is not None:
+        @functools.wraps(acall)
+        async def scheduled_acall(messages, *args, **kwargs):
+            estimated = estimate_tokens(messages)
+            waited = await scheduler.aacquire(priority, estimated)
+            _record_queue_span(scheduler, priority, waited, estimated, kwargs)
+            result = await acall(messages, *args, **kwargs)
+            scheduler.settle(estimated, estimated + estimate_tokens(result))
+            return result
+        object.__setattr__(llm, "acall", scheduled_acall)
+
+    return llm
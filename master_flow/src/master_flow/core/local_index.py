@@ -0,0 +1,149 @@
+import json
+import os
+import numpy as np
+
+from master_flow.core.sparse import SparseIndex
+
+VECTORS_FILE = "vectors.npy"
+META_FILE = "meta.json"
+
+# float16 matrices that fit this budget are upcast once at load; larger ones are
+# scored block by block so we never materialise a full float32 copy per query
+_UPCAST_BUDGET_MB = float(os.getenv("LOCAL_INDEX_UPCAST_MB", "512"))
+_SCORE_BLOCK_ROWS = 16384
+
+
+class LocalHit:
+    """Same shape as qdrant_client's ScoredPoint for the fields the search tools read."""
+    __slots__ = ("id", "score", "payload")
+
+    def __init__(self, id, score, payload):
+        self.id = id
+        self.score = score
+        self.payload = payload
+
+    def __repr__(self):
+        return f"LocalHit(id={self.id!r}, score={self.score:.4f})"
+
+
+def _normalize_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class LocalVectorIndex:
+    """Exact top-k cosine search over a memory-mapped, pre-normalized embedding matrix."""
+
+    def __init__(self, vectors, ids, payloads, path=None):
+        self.vectors = vectors
+        self.ids = ids
+        self.payloads = payloads
+        self.path = path
+        self._sparse = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1]
+
+    @classmethod
+    def exists(cls, path):
+        return bool(path) and os.path.exists(os.path.join(path, VECTORS_FILE)) and os.path.exists(os.path.join(path, META_FILE))
+
+    @classmethod
+    def load(cls, path, upcast_budget_mb=_UPCAST_BUDGET_MB):
+        vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r")
+        if vectors.dtype != np.float32 and vectors.size * 4 <= upcast_budget_mb * 1024 * 1024:
+            # float16 on disk halves the file; float32 in RAM keeps scoring on the BLAS fast path
+            vectors = np.asarray(vectors, dtype=np.float32)
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(vectors, meta["ids"], meta["payloads"], path=path)
+
+    def scores(self, vector):
+        query = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        if self.vectors.dtype == np.float32:
+            return self.vectors @ query
+        out = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), _SCORE_BLOCK_ROWS):
+            block = self.vectors[start:start + _SCORE_BLOCK_ROWS]
+            out[start:start + len(block)] = block.astype(np.float32) @ query
+        return out
+
+    def search(self, vector, limit=5):
+        if not self.ids:
+            return []
+        scores = self.scores(vector)
+        limit = min(limit, len(scores))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [LocalHit(self.ids[i], float(scores[i]), self.payloads[i]) for i in top]
+
+    def sparse_search(self, query, limit=20):
+        # Built on first use so dense-only deployments never pay for tokenizing the payloads
+        if self._sparse is None:
+            self._sparse = SparseIndex(self.payloads)
+        return [LocalHit(self.ids[doc], score, self.payloads[doc]) for doc, score in self._sparse.search(query, limit)]
+
+
+class LocalIndexWriter:
+    """Streams vectors to disk during ingestion and finalizes them into a .npy matrix.
+
+    Exposes submit/close like the Qdrant upserter so the ingestion pipeline can
+    target either backend.
+    """
+
+    def __init__(self, path, dim, dtype="float16"):
+        self.path = path
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.ids = []
+        self.payloads = []
+        self.upserted = 0
+        os.makedirs(path, exist_ok=True)
+        self._raw_path = os.path.join(path, VECTORS_FILE + ".raw")
+        self._raw = open(self._raw_path, "wb")
+
+    def submit(self, points):
+        # Hybrid points carry {"": dense, "bm25": sparse}; the local index keeps only the dense part
+        matrix = _normalize_rows([p.vector[""] if isinstance(p.vector, dict) else p.vector for p in points]).astype(self.dtype)
+        matrix.tofile(self._raw)
+        for point in points:
+            self.ids.append(point.id)
+            self.payloads.append(point.payload)
+        self.upserted += len(points)
+
+    def add(self, ids, vectors, payloads):
+        matrix = _normalize_rows(vectors).astype(self.dtype)
+        matrix.tofile(self._raw)
+        self.ids.extend(ids)
+        self.payloads.extend(payloads)
+        self.upserted += len(ids)
+
+    def close(self, commit=True):
+        self._raw.close()
+        if not commit:
+            # Leave any previously published index untouched
+            os.remove(self._raw_path)
+            return
+        raw = np.memmap(self._raw_path, dtype=self.dtype, mode="r", shape=(len(self.ids), self.dim)) if self.ids else np.zeros((0, self.dim), dtype=self.dtype)
+        tmp_vectors = os.path.join(self.path, VECTORS_FILE + ".tmp")
+        out = np.lib.format.open_memmap(tmp_vectors, mode="w+", dtype=self.dtype, shape=(len(self.ids), self.dim))
+        out[:] = raw[:]
+        out.flush()
+        del out, raw
+
+        tmp_meta = os.path.join(self.path, META_FILE + ".tmp")
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "dtype": self.dtype.name, "ids": self.ids, "payloads": self.payloads}, f, ensure_ascii=False)
+
+        os.replace(tmp_vectors, os.path.join(self.path, VECTORS_FILE))
+        os.replace(tmp_meta, os.path.join(self.path, META_FILE))
+        os.remove(self._raw_path)
@@ -0,0 +1,218 @@
+import contextvars
+import json
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+
+ANSI_ESCAPE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+
+# Session that output written from the current task/thread belongs to
+current_session = contextvars.ContextVar("log_session_id", default=None)
+
+
+def bind_session(session_id):
+    """Route output from the current context (and tasks/threads spawned from it) to session_id's log."""
+    return current_session.set(session_id)
+
+
+class RotatingFile:
+    """Append-only text file rotated to path.1 .. path.N by size or age."""
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backup_count=5, rotate_seconds=0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.rotate_seconds = rotate_seconds
+        self._open()
+
+    def _open(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._size = self._file.tell()
+        self._opened_at = time.time()
+
+    def _should_rotate(self, incoming) -> bool:
+        if self.max_bytes and self._size + incoming > self.max_bytes and self._size > 0:
+            return True
+        return bool(self.rotate_seconds) and time.time() - self._opened_at > self.rotate_seconds and self._size > 0
+
+    def _rotate(self):
+        self._file.close()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                src = f"{self.path}.{i}"
+                if os.path.exists(src):
+                    os.replace(src, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def write(self, text):
+        size = len(text.encode("utf-8"))
+        if self._should_rotate(size):
+            self._rotate()
+        self._file.write(text)
+        self._size += size
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class LogPipeline:
+    """Background writer for captured stdout/stderr.
+
+    submit() only enqueues, so callers (including the event loop thread) never
+    touch the disk. A single writer thread drains the queue in batches, strips
+    ANSI codes, and writes each batch to the main log and to a per-session log
+    before flushing once. With json_lines=True every complete line becomes a
+    {"ts", "session_id", "stream", "message"} object. If the queue is full,
+    output is dropped (and counted) rather than blocking the writer.
+    """
+
+    def __init__(self, directory, filename="master_flow.log", json_lines=False, per_session=True,
+                 max_bytes=10 * 1024 * 1024, backup_count=5, rotate_seconds=86400,
+                 session_max_bytes=2 * 1024 * 1024, max_open_sessions=32,
+                 batch_size=1000, flush_interval=0.5, max_queue=100000):
+        self.directory = directory
+        self.json_lines = json_lines
+        self.per_session = per_session
+        self.session_max_bytes = session_max_bytes
+        self.max_open_sessions = max_open_sessions
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._main = RotatingFile(os.path.join(directory, filename), max_bytes, backup_count, rotate_seconds)
+        self._sessions = OrderedDict()
+        self._partial = {}
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="log-pipeline", daemon=True)
+        self._stopped = threading.Event()
+        self.dropped = 0
+        self._thread.start()
+
+    def submit(self, stream, text):
+        if not text or self._stopped.is_set():
+            return
+        try:
+            self._queue.put_nowait((time.time(), current_session.get(), stream, text))
+        except queue.Full:
+            self.dropped += 1
+
+    def _session_file(self, session_id):
+        handle = self._sessions.get(session_id)
+        if handle is None:
+            safe_id = re.sub(r"[^A-Za-z0-9_.-]", "_", session_id)
+            ext = "jsonl" if self.json_lines else "log"
+            path = os.path.join(self.directory, "sessions", f"{safe_id}.{ext}")
+            handle = RotatingFile(path, self.session_max_bytes, backup_count=1)
+            self._sessions[session_id] = handle
+            while len(self._sessions) > self.max_open_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                evicted.close()
+        else:
+            self._sessions.move_to_end(session_id)
+        return handle
+
+    def _format(self, batch):
+        """Group a batch into {session_id: text} ready to write."""
+        out = {}
+        if not self.json_lines:
+            for _, session_id, _, text in batch:
+                out.setdefault(session_id, []).append(text)
+            return {sid: ANSI_ESCAPE.sub("", "".join(parts)) for sid, parts in out.items()}
+
+        for ts, session_id, stream, text in batch:
+            # Writers emit fragments; only complete lines become records
+            key = (session_id, stream)
+            buffered = self._partial.pop(key, "") + ANSI_ESCAPE.sub("", text)
+            *lines, rest = buffered.split("\n")
+            if rest:
+                self._partial[key] = rest
+            for line in lines:
+                if line.strip():
+                    record = {"ts": round(ts, 3), "session_id": session_id, "stream": stream, "message": line}
+                    out.setdefault(session_id, []).append(json.dumps(record, ensure_ascii=False) + "\n")
+        return {sid: "".join(parts) for sid, parts in out.items()}
+
+    def _write(self, batch):
+        touched = {self._main}
+        for session_id, text in self._format(batch).items():
+            if not text:
+                continue
+            self._main.write(text)
+            if self.per_session and session_id:
+                handle = self._session_file(session_id)
+                handle.write(text)
+                touched.add(handle)
+        for handle in touched:
+            handle.flush()
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if self._stopped.is_set():
+                    break
+                continue
+            if first is None:
+                batch, stop = [], True
+            else:
+                batch, stop = [first], False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                self._write(batch)
+            except Exception:
+                # Never let a logging failure kill the writer
+                pass
+            if stop:
+                break
+
+    def close(self, timeout=5.0):
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._main.close()
+        for handle in self._sessions.values():
+            handle.close()
+        self._sessions.clear()
+
+
+class TeeStream:
+    """Drop-in sys.stdout/sys.stderr that echoes to the console and hands a copy to a LogPipeline."""
+
+    def __init__(self, original, pipeline, stream_name):
+        self.original = original
+        self.pipeline = pipeline
+        self.stream_name = stream_name
+
+    def write(self, text):
+        self.original.write(text)
+        self.pipeline.submit(self.stream_name, text)
+        return len(text)
+
+    def flush(self):
+        self.original.flush()
+
+    def __getattr__(self, name):
+        # isatty(), fileno(), encoding, ... come from the real stream
+        return getattr(self.original, name)
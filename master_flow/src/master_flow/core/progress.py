@@ -0,0 +1,105 @@
+import asyncio
+import json
+import threading
+from collections import OrderedDict
+
+# Events after which a session's stream is closed
+TERMINAL_EVENTS = ("completed", "error")
+
+
+class ProgressBus:
+    """Per-session event log that MasterFlow publishes to and SSE clients stream from.
+
+    publish() may be called from any thread (crew steps run in worker threads);
+    events are appended to the session's history and handed to every live
+    subscriber on its own event loop. History is replayed on subscribe, so a
+    client that connects late, or reconnects with Last-Event-ID, misses nothing.
+    Only the most recent max_sessions histories are kept.
+
+    Once a session publishes a terminal event its history is cut down to that
+    event's id and name, with data None: node content and the final state are
+    the bulk of it, and the caller already keeps the final payload in its own
+    status store. Live subscribers still receive the full terminal message.
+    """
+
+    def __init__(self, max_sessions=256):
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._history = OrderedDict()
+        self._subscribers = {}
+        # Ids are unique across sessions so a reset session never reuses one a client has seen
+        self._seq = 0
+
+    def reset(self, session_id):
+        with self._lock:
+            self._history.pop(session_id, None)
+
+    def has_session(self, session_id) -> bool:
+        with self._lock:
+            return session_id in self._history
+
+    def publish(self, session_id, event, data=None):
+        if not session_id:
+            return
+        with self._lock:
+            history = self._history.setdefault(session_id, [])
+            self._history.move_to_end(session_id)
+            while len(self._history) > self.max_sessions:
+                self._history.popitem(last=False)
+            self._seq += 1
+            message = {"id": self._seq, "event": event, "data": data}
+            if event in TERMINAL_EVENTS:
+                self._history[session_id] = [{"id": self._seq, "event": event, "data": None}]
+            else:
+                history.append(message)
+            subscribers = list(self._subscribers.get(session_id, ()))
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, message)
+            except RuntimeError:
+                # The subscriber's loop has already shut down
+                pass
+
+    async def subscribe(self, session_id, last_event_id=0):
+        """Yield messages for session_id, replaying history first, until a terminal event.
+
+        A finished session replays only its terminal event, with data None.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        entry = (loop, queue)
+        with self._lock:
+            backlog = [m for m in self._history.get(session_id, ()) if m["id"] > last_event_id]
+            self._subscribers.setdefault(session_id, []).append(entry)
+
+        try:
+            seen = last_event_id
+            for message in backlog:
+                seen = message["id"]
+                yield message
+                if message["event"] in TERMINAL_EVENTS:
+                    return
+            while True:
+                message = await queue.get()
+                if message["id"] <= seen:
+                    continue
+                seen = message["id"]
+                yield message
+                if message["event"] in TERMINAL_EVENTS:
+                    return
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(session_id, [])
+                if entry in subscribers:
+                    subscribers.remove(entry)
+                if not subscribers:
+                    self._subscribers.pop(session_id, None)
+
+
+def format_sse(message) -> str:
+    data = json.dumps(message["data"], ensure_ascii=False, default=str)
+    return f"id: {message['id']}\nevent: {message['event']}\ndata: {data}\n\n"
+
+
+progress_bus = ProgressBus()
@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Statuses whose payload is final and can be written to disk and evicted from memory
+TERMINAL_STATUSES = ("completed", "error")
+
+
+class SessionStatusStore:
+    """Bounded in-memory map of session_id -> status payload with an on-disk tail.
+
+    In-flight sessions ("processing") are always kept in memory; they are small
+    and bounded by how many flows can run at once. Finished payloads are written
+    through to `results` (a SQLiteTTLCache) and kept in memory only while they
+    are among the `max_entries` most recently used and younger than
+    `ttl_seconds`. Lookups that miss memory fall back to `results`, then to the
+    optional `fallback(session_id)` loader (e.g. rebuilding from flow
+    persistence), so evicted sessions and sessions from before a restart still
+    resolve.
+    """
+
+    def __init__(self, results, max_entries=128, ttl_seconds=900, fallback=None):
+        self.results = results
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.fallback = fallback
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.fallback_hits = 0
+        self.evictions = 0
+
+    def set(self, session_id, status: dict):
+        if status.get("status") in TERMINAL_STATUSES:
+            self.results.set(session_id, status)
+        with self._lock:
+            self._entries[session_id] = (status, time.time())
+            self._entries.move_to_end(session_id)
+            self._evict()
+
+    def get(self, session_id):
+        """Status payload for session_id, or None if it has never been seen."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and not self._expired(entry):
+                self._entries.move_to_end(session_id)
+                self.memory_hits += 1
+                return entry[0]
+
+        status = self.results.get(session_id)
+        if status is not None:
+            self.disk_hits += 1
+        elif self.fallback is not None:
+            status = self.fallback(session_id)
+            if status is None:
+                return None
+            self.fallback_hits += 1
+            self.results.set(session_id, status)
+        else:
+            return None
+
+        with self._lock:
+            self._entries[session_id] = (status, time.time())
+            self._evict()
+        return status
+
+    def _expired(self, entry) -> bool:
+        status, stored_at = entry
+        return (
+            status.get("status") in TERMINAL_STATUSES
+            and self.ttl_seconds
+            and time.time() - stored_at > self.ttl_seconds
+        )
+
+    def _evict(self):
+        # Oldest first; in-flight entries are skipped rather than dropped
+        finished = [sid for sid, entry in self._entries.items() if entry[0].get("status") in TERMINAL_STATUSES]
+        excess = len(finished) - self.max_entries
+        for sid in finished:
+            if excess <= 0 and not self._expired(self._entries[sid]):
+                continue
+            del self._entries[sid]
+            excess -= 1
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = sum(1 for status, _ in self._entries.values() if status.get("status") not in TERMINAL_STATUSES)
+            return {
+                "in_memory": len(self._entries),
+                "in_flight": in_flight,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "fallback_hits": self.fallback_hits,
+                "evictions": self.evictions,
+            }
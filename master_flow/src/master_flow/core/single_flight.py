@@ -0,0 +1,49 @@
+import asyncio
+import threading
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key onto one execution.
+
+    The first caller for a key (the leader) runs the work; anyone arriving with
+    the same key while it is still running waits and receives the leader's
+    result or exception. Nothing is kept once the call finishes, so this is a
+    dedup layer for in-flight work only, not a cache.
+    """
+
+    def __init__(self, name="single_flight"):
+        self.name = name
+        # stats() is read from threadpool handlers as well as the event loop
+        self._lock = threading.Lock()
+        self._tasks = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def ado(self, key, coro_factory):
+        """Run coro_factory() once per key at a time; only the leader invokes it. Returns (result, shared)."""
+        with self._lock:
+            task = self._tasks.get(key)
+            shared = task is not None
+            if shared:
+                self.coalesced += 1
+            else:
+                task = asyncio.ensure_future(coro_factory())
+                self._tasks[key] = task
+                self.leaders += 1
+                task.add_done_callback(lambda _t, k=key: self._forget_task(k, _t))
+
+        # shield() so one waiter being cancelled doesn't cancel the run for everyone else
+        return await asyncio.shield(task), shared
+
+    def _forget_task(self, key, task):
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._tasks),
+                "leaders": self.leaders,
+                "coalesced_waiters": self.coalesced,
+            }
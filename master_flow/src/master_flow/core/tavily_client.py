@@ -0,0 +1,86 @@
+import asyncio
+import os
+import threading
+import weakref
+import httpx
+
+TAVILY_SEARCH_URL = os.getenv("TAVILY_SEARCH_URL", "https://api.tavily.com/search")
+
+# One keep-alive pool per process instead of a fresh TavilyClient (and TLS handshake) per search
+_MAX_CONNECTIONS = int(os.getenv("TAVILY_MAX_CONNECTIONS", "32"))
+_MAX_KEEPALIVE = int(os.getenv("TAVILY_MAX_KEEPALIVE", "16"))
+_TIMEOUT = httpx.Timeout(float(os.getenv("TAVILY_TIMEOUT_SECONDS", "30")), connect=10.0)
+
+_client = None
+_client_lock = threading.Lock()
+# httpx.AsyncClient is bound to the loop it was first used on, so keep one per loop
+_async_clients = weakref.WeakKeyDictionary()
+
+
+class TavilySearchError(Exception):
+    pass
+
+
+def _limits():
+    return httpx.Limits(
+        max_connections=_MAX_CONNECTIONS,
+        max_keepalive_connections=_MAX_KEEPALIVE,
+        keepalive_expiry=60.0
+    )
+
+
+def get_http_client() -> httpx.Client:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(timeout=_TIMEOUT, limits=_limits())
+    return _client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(timeout=_TIMEOUT, limits=_limits())
+        _async_clients[loop] = client
+    return client
+
+
+def _request(api_key, query, search_depth, max_results, extra):
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+    body = {"query": query, "search_depth": search_depth, "max_results": max_results, **extra}
+    return headers, body
+
+
+def _parse(response: httpx.Response) -> dict:
+    if response.status_code >= 400:
+        raise TavilySearchError(f"Tavily search failed with HTTP {response.status_code}: {response.text[:200]}")
+    return response.json()
+
+
+def search(api_key: str, query: str, search_depth: str = "basic", max_results: int = 5, **extra) -> dict:
+    """Blocking Tavily search over the shared keep-alive connection pool."""
+    headers, body = _request(api_key, query, search_depth, max_results, extra)
+    return _parse(get_http_client().post(TAVILY_SEARCH_URL, headers=headers, json=body))
+
+
+async def asearch(api_key: str, query: str, search_depth: str = "basic", max_results: int = 5, **extra) -> dict:
+    """Asyncio-native Tavily search; concurrent callers share one pooled AsyncClient per loop."""
+    headers, body = _request(api_key, query, search_depth, max_results, extra)
+    response = await get_async_http_client().post(TAVILY_SEARCH_URL, headers=headers, json=body)
+    return _parse(response)
+
+
+def close():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+async def aclose():
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
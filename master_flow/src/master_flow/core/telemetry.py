@@ -0,0 +1,370 @@
+import bisect
+import threading
+import time
+from collections import OrderedDict, deque
+
+from master_flow.core.log_pipeline import current_session  # per-app
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + [f'{n}="{_escape(v)}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Prometheus histogram with labels; buckets are cumulative only when rendered."""
+
+    def __init__(self, name, help, labelnames=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                running = 0
+                for bound, n in zip(self.buckets + (float("inf"),), counts):
+                    running += n
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', _format_value(bound))])} {running}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Metrics rendered in the Prometheus text exposition format (version 0.0.4).
+
+    Besides counters and histograms it accepts collectors: callables returning
+    an existing stats() dict, whose top-level numbers are exported as gauges
+    named <prefix>_<key> at scrape time.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=DURATION_BUCKETS):
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_stats(self, prefix, stats_fn):
+        self._collectors.append((prefix, stats_fn))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, stats_fn in self._collectors:
+            try:
+                stats = stats_fn() or {}
+            except Exception as e:
+                lines.append(f"# {prefix} stats unavailable: {_escape(e)}")
+                continue
+            for key, value in stats.items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if isinstance(value, (int, float)):
+                    lines.append(f"# TYPE {prefix}_{key} gauge")
+                    lines.append(f"{prefix}_{key} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Session ids stay out of the metric labels (one series per session would never be
+# garbage collected); they are kept on the individual spans in span_log instead.
+span_seconds = registry.histogram(
+    "crew_span_duration_seconds", "Duration of crew kickoffs, tasks, agent executions, LLM calls, tool calls and LLM queueing.",
+    ("kind", "name", "status"))
+llm_tokens = registry.counter("crew_llm_tokens_total", "LLM tokens by agent; provider-reported where available, estimated otherwise.", ("agent", "type"))
+llm_retries = registry.counter("crew_llm_retries_total", "LLM calls made again by the same agent and task after a failed call.", ("agent",))
+tool_cache_hits = registry.counter("crew_tool_cache_hits_total", "Tool calls answered from crewai's tool cache.", ("tool",))
+tool_retries = registry.counter("crew_tool_retries_total", "Tool calls that needed more than one attempt.", ("tool",))
+crew_tokens = registry.counter("crew_tokens_total", "Total tokens reported by crewai when a crew finishes.", ("crew",))
+
+
+class SpanLog:
+    """The most recent spans, kept for per-session inspection."""
+
+    def __init__(self, max_spans=5000):
+        self._lock = threading.Lock()
+        self._spans = deque(maxlen=max_spans)
+
+    def append(self, span):
+        with self._lock:
+            self._spans.append(span)
+
+    def recent(self, session_id=None, limit=500):
+        with self._lock:
+            spans = [s for s in self._spans if session_id is None or s["session_id"] == session_id]
+        return spans[-limit:]
+
+
+span_log = SpanLog()
+
+
+def record_span(kind, name, seconds, status="ok", session_id=None, ended_at=None, **attrs):
+    """Record one finished span in the duration histogram and the span log."""
+    name = name or "unknown"
+    span_seconds.observe(seconds, kind=kind, name=name, status=status)
+    span_log.append({
+        "kind": kind,
+        "name": name,
+        "status": status,
+        "seconds": round(seconds, 4),
+        "ended_at": ended_at or time.time(),
+        "session_id": session_id if session_id is not None else current_session.get(),
+        **{k: v for k, v in attrs.items() if v is not None},
+    })
+
+
+class span:
+    """Time a block as a span: `with span("tool", "Qdrant Syllabus Search"):`."""
+
+    def __init__(self, kind, name, **attrs):
+        self.kind = kind
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record_span(self.kind, self.name, time.perf_counter() - self._started,
+                    status="error" if exc_type else "ok", **self.attrs)
+        return False
+
+
+def _short(text, limit=60):
+    if not text:
+        return None
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+class _Pending:
+    """Start events waiting for their matching end event, bounded so leaks can't grow forever."""
+
+    def __init__(self, max_entries=4096):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.max_entries = max_entries
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            return self._entries.pop(key, None)
+
+
+class CrewTelemetry:
+    """Turns crewai event-bus events into spans and token/retry counters.
+
+    crewai runs sync handlers on a thread pool with a copy of the emitting
+    context, so current_session still names the session that caused the
+    event, and durations come from the events' own timestamps rather than
+    from when the handler happens to run.
+    """
+
+    def __init__(self):
+        self._pending = _Pending()
+        self._failed_calls = _Pending()
+        self._token_totals = _Pending()
+
+    @staticmethod
+    def _seconds(start_event, end_event):
+        return max(0.0, (end_event.timestamp - start_event.timestamp).total_seconds())
+
+    def _finish(self, kind, key, event, name, status="ok", **attrs):
+        started = self._pending.pop(key)
+        if started is None:
+            return
+        record_span(kind, name, self._seconds(started, event), status=status,
+                    ended_at=event.timestamp.timestamp(), agent=event.agent_role or started.agent_role,
+                    task=_short(event.task_name or started.task_name), **attrs)
+
+    def _llm_key(self, source, event):
+        return ("llm", event.agent_id, event.task_id, id(source))
+
+    def _llm_tokens(self, source, event):
+        """(prompt, completion) for one call: the delta of the LLM's usage counters, or an estimate."""
+        # Imported here: llm_scheduler records its queue waits through this module
+        from master_flow.core.llm_scheduler import estimate_tokens
+
+        usage = getattr(source, "_token_usage", None)
+        if isinstance(usage, dict) and usage.get("total_tokens"):
+            previous = self._token_totals.pop(id(source)) or {}
+            self._token_totals.put(id(source), dict(usage))
+            prompt = usage.get("prompt_tokens", 0) - previous.get("prompt_tokens", 0)
+            completion = usage.get("completion_tokens", 0) - previous.get("completion_tokens", 0)
+            if prompt or completion:
+                return prompt, completion
+        return estimate_tokens(event.messages), estimate_tokens(event.response)
+
+    def install(self, bus):
+        from crewai.events import (
+            AgentExecutionCompletedEvent, AgentExecutionErrorEvent, AgentExecutionStartedEvent,
+            CrewKickoffCompletedEvent, CrewKickoffFailedEvent, CrewKickoffStartedEvent,
+            LLMCallCompletedEvent, LLMCallFailedEvent, LLMCallStartedEvent,
+            TaskCompletedEvent, TaskFailedEvent, TaskStartedEvent,
+            ToolUsageErrorEvent, ToolUsageFinishedEvent, ToolUsageStartedEvent,
+        )
+
+        @bus.on(CrewKickoffStartedEvent)
+        def crew_started(source, event):
+            self._pending.put(("crew", id(source)), event)
+
+        @bus.on(CrewKickoffCompletedEvent)
+        def crew_completed(source, event):
+            self._finish("crew", ("crew", id(source)), event, event.crew_name, total_tokens=event.total_tokens)
+            if event.total_tokens:
+                crew_tokens.inc(event.total_tokens, crew=event.crew_name or "crew")
+
+        @bus.on(CrewKickoffFailedEvent)
+        def crew_failed(source, event):
+            self._finish("crew", ("crew", id(source)), event, event.crew_name, status="error", error=_short(event.error, 200))
+
+        @bus.on(TaskStartedEvent)
+        def task_started(source, event):
+            self._pending.put(("task", id(source)), event)
+
+        @bus.on(TaskCompletedEvent)
+        def task_completed(source, event):
+            self._finish("task", ("task", id(source)), event, _short(getattr(source, "name", None) or event.task_name))
+
+        @bus.on(TaskFailedEvent)
+        def task_failed(source, event):
+            self._finish("task", ("task", id(source)), event, _short(getattr(source, "name", None) or event.task_name),
+                         status="error", error=_short(event.error, 200))
+
+        @bus.on(AgentExecutionStartedEvent)
+        def agent_started(source, event):
+            self._pending.put(("agent", id(event.agent), id(event.task)), event)
+
+        @bus.on(AgentExecutionCompletedEvent)
+        def agent_completed(source, event):
+            self._finish("agent", ("agent", id(event.agent), id(event.task)), event, event.agent.role)
+
+        @bus.on(AgentExecutionErrorEvent)
+        def agent_failed(source, event):
+            self._finish("agent", ("agent", id(event.agent), id(event.task)), event, event.agent.role,
+                         status="error", error=_short(event.error, 200))
+
+        @bus.on(LLMCallStartedEvent)
+        def llm_started(source, event):
+            key = self._llm_key(source, event)
+            if self._failed_calls.pop(key):
+                llm_retries.inc(agent=event.agent_role or "none")
+            self._pending.put(key, event)
+
+        @bus.on(LLMCallCompletedEvent)
+        def llm_completed(source, event):
+            agent = event.agent_role or "none"
+            prompt, completion = self._llm_tokens(source, event)
+            llm_tokens.inc(prompt, agent=agent, type="prompt")
+            llm_tokens.inc(completion, agent=agent, type="completion")
+            self._finish("llm", self._llm_key(source, event), event, agent, model=event.model,
+                         prompt_tokens=prompt, completion_tokens=completion)
+
+        @bus.on(LLMCallFailedEvent)
+        def llm_failed(source, event):
+            key = self._llm_key(source, event)
+            self._failed_calls.put(key, True)
+            self._finish("llm", key, event, event.agent_role or "none", status="error", error=_short(event.error, 200))
+
+        @bus.on(ToolUsageStartedEvent)
+        def tool_started(source, event):
+            self._pending.put(("tool", event.agent_id, event.tool_name), event)
+
+        @bus.on(ToolUsageFinishedEvent)
+        def tool_finished(source, event):
+            self._pending.pop(("tool", event.agent_id, event.tool_name))
+            if event.from_cache:
+                tool_cache_hits.inc(tool=event.tool_name)
+            if (event.run_attempts or 1) > 1:
+                tool_retries.inc(tool=event.tool_name)
+            record_span("tool", event.tool_name, max(0.0, (event.finished_at - event.started_at).total_seconds()),
+                        ended_at=event.finished_at.timestamp(), agent=event.agent_role,
+                        task=_short(event.task_name), cached=event.from_cache, attempts=event.run_attempts)
+
+        @bus.on(ToolUsageErrorEvent)
+        def tool_failed(source, event):
+            self._finish("tool", ("tool", event.agent_id, event.tool_name), event, event.tool_name,
+                         status="error", error=_short(event.error, 200))
+
+
+_crew_telemetry = None
+_install_lock = threading.Lock()
+
+
+def install_crew_telemetry():
+    """Register the crewai event-bus listener once per process."""
+    global _crew_telemetry
+    with _install_lock:
+        if _crew_telemetry is None:
+            from crewai.events import crewai_event_bus
+            _crew_telemetry = CrewTelemetry()
+            _crew_telemetry.install(crewai_event_bus)
+    return _crew_telemetry
+
+
+def render_metrics() -> str:
+    return registry.render()
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Don't rewrite accessed_at on every read; recency only needs to be roughly right for eviction
+_TOUCH_INTERVAL_SECONDS = 60.0
+
+
+def make_key(*parts) -> str:
+    """Stable hash of arbitrary JSON-serializable key parts."""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SQLiteTTLCache:
+    """JSON value cache in a SQLite file with per-entry TTL and LRU size eviction.
+
+    SQLite in WAL mode lets every uvicorn worker on the host open the same file,
+    so a result fetched by one worker is served by all of them. Each thread gets
+    its own connection, which is what sqlite3 expects.
+    """
+
+    def __init__(self, path, table="cache", ttl_seconds=86400, max_entries=5000):
+        self.path = path
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        db = self._conn()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        db.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed_at)")
+        db.commit()
+
+    def _conn(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10.0)
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _count(self, hit):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_with_age(self, key):
+        """Return (value, age_seconds) or None when missing or expired."""
+        db = self._conn()
+        row = db.execute(
+            f"SELECT value, created_at, accessed_at FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None:
+            self._count(False)
+            return None
+
+        value, created_at, accessed_at = row
+        if self.ttl_seconds and now - created_at > self.ttl_seconds:
+            db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            db.commit()
+            self._count(False)
+            return None
+
+        if now - accessed_at > _TOUCH_INTERVAL_SECONDS:
+            db.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+            db.commit()
+        self._count(True)
+        return json.loads(value), now - created_at
+
+    def get(self, key):
+        found = self.get_with_age(key)
+        return found[0] if found else None
+
+    def set(self, key, value):
+        now = time.time()
+        db = self._conn()
+        db.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value, ensure_ascii=False, default=str), now, now)
+        )
+        if self.max_entries:
+            # Drop the least recently used rows beyond the cap
+            db.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY accessed_at ASC "
+                f"LIMIT MAX(0, (SELECT COUNT(*) FROM {self.table}) - ?))",
+                (self.max_entries,)
+            )
+        db.commit()
+
+    def delete(self, key):
+        db = self._conn()
+        deleted = db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,)).rowcount
+        db.commit()
+        return deleted
+
+    def clear(self):
+        db = self._conn()
+        deleted = db.execute(f"DELETE FROM {self.table}").rowcount
+        db.commit()
+        return deleted
+
+    def purge_expired(self):
+        if not self.ttl_seconds:
+            return 0
+        db = self._conn()
+        deleted = db.execute(
+            f"DELETE FROM {self.table} WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+        ).rowcount
+        db.commit()
+        return deleted
+
+    def stats(self) -> dict:
+        entries = self._conn().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        with self._stats_lock:
+            total = self.hits + self.misses
+            return {
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,166 @@
+import os
+import time
+
+from master_flow.core.local_index import LocalVectorIndex
+from master_flow.core.sparse import SPARSE_VECTOR_NAME, query_weights, to_sparse_vector
+
+# "qdrant" (default): query the Qdrant server, falling back to the local index if one exists and Qdrant errors
+# "local": answer every query from the in-process index at LOCAL_INDEX_PATH
+BACKEND_QDRANT = "qdrant"
+BACKEND_LOCAL = "local"
+
+# Reciprocal-rank-fusion constant; 60 is the usual value from the original RRF paper
+RRF_K = 60
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+# After a transient failure of the hybrid query, stay dense-only for this long before trying sparse again
+SPARSE_RETRY_SECONDS = float(os.getenv("HYBRID_SPARSE_RETRY_SECONDS", "60"))
+
+
+class HybridHit:
+    """A fused result. score is the dense cosine (None if only the lexical side found it)."""
+    __slots__ = ("id", "payload", "score", "fused", "lexical_rank")
+
+    def __init__(self, id, payload):
+        self.id = id
+        self.payload = payload
+        self.score = None
+        self.fused = 0.0
+        self.lexical_rank = None
+
+
+def rrf_fuse(dense_points, sparse_points, limit):
+    merged = {}
+    for rank, point in enumerate(dense_points):
+        hit = merged.setdefault(str(point.id), HybridHit(point.id, point.payload))
+        hit.score = point.score
+        hit.fused += 1.0 / (RRF_K + rank + 1)
+    for rank, point in enumerate(sparse_points):
+        hit = merged.setdefault(str(point.id), HybridHit(point.id, point.payload))
+        hit.lexical_rank = rank
+        hit.fused += 1.0 / (RRF_K + rank + 1)
+    return sorted(merged.values(), key=lambda h: h.fused, reverse=True)[:limit]
+
+
+def _missing_sparse_vector(error) -> bool:
+    """Whether Qdrant rejected the query because the collection has no such vector (a schema problem, not an outage)."""
+    # REST raises UnexpectedResponse with the HTTP status; gRPC raises RpcError with a status code
+    status = getattr(error, "status_code", None)
+    if status is None and callable(getattr(error, "code", None)):
+        status = getattr(error.code(), "name", None)
+    return status in (400, 404, "INVALID_ARGUMENT", "NOT_FOUND") and "vector" in str(error).lower()
+
+
+def quantization_search_params():
+    """Rescore oversampled candidates against the on-disk originals when the collection is quantized.
+
+    Qdrant ignores these params for collections without quantization, so they are always safe to send.
+    """
+    from qdrant_client.models import SearchParams, QuantizationSearchParams
+    return SearchParams(quantization=QuantizationSearchParams(
+        rescore=os.getenv("QDRANT_QUANT_RESCORE", "true").lower() == "true",
+        oversampling=float(os.getenv("QDRANT_QUANT_OVERSAMPLING", "2.0"))
+    ))
+
+
+class QdrantBackend:
+    name = BACKEND_QDRANT
+
+    def __init__(self, client, collection_name, search_params=None):
+        self.client = client
+        self.collection_name = collection_name
+        self.search_params = search_params
+        self.sparse_available = None
+        self._sparse_retry_at = 0.0
+
+    def query(self, vector, limit=5):
+        return self.client.query_points(
+            collection_name=self.collection_name,
+            query=vector,
+            limit=limit,
+            search_params=self.search_params
+        ).points
+
+    def hybrid_query(self, vector, query_text, limit=5, candidates=HYBRID_CANDIDATES):
+        weights = query_weights(query_text)
+        if self.sparse_available is False or not weights or time.monotonic() < self._sparse_retry_at:
+            return rrf_fuse(self.query(vector, candidates), [], limit)
+
+        from qdrant_client.models import QueryRequest
+        try:
+            # One round trip for both sides of the hybrid query
+            dense, sparse = self.client.query_batch_points(
+                collection_name=self.collection_name,
+                requests=[
+                    QueryRequest(query=vector, limit=candidates, params=self.search_params, with_payload=True),
+                    QueryRequest(query=to_sparse_vector(weights), using=SPARSE_VECTOR_NAME, limit=candidates, with_payload=True),
+                ]
+            )
+        except Exception as e:
+            dense_points = self.query(vector, candidates)
+            if _missing_sparse_vector(e):
+                # Collections ingested before the sparse index existed: the dense query still works
+                self.sparse_available = False
+                print(f"Sparse '{SPARSE_VECTOR_NAME}' index unavailable on '{self.collection_name}' ({e}); using dense search only.")
+            else:
+                # A timeout or hiccup on the batch call; don't give up on sparse for the life of the process
+                self._sparse_retry_at = time.monotonic() + SPARSE_RETRY_SECONDS
+                print(f"Hybrid query on '{self.collection_name}' failed ({e}); dense search only for {SPARSE_RETRY_SECONDS:g}s.")
+            return rrf_fuse(dense_points, [], limit)
+
+        self.sparse_available = True
+        return rrf_fuse(dense.points, sparse.points, limit)
+
+
+class LocalBackend:
+    name = BACKEND_LOCAL
+
+    def __init__(self, index):
+        self.index = index
+
+    def query(self, vector, limit=5):
+        return self.index.search(vector, limit)
+
+    def hybrid_query(self, vector, query_text, limit=5, candidates=HYBRID_CANDIDATES):
+        return rrf_fuse(self.index.search(vector, candidates), self.index.sparse_search(query_text, candidates), limit)
+
+
+class FallbackBackend:
+    """Use the primary backend and only touch the secondary when the primary raises."""
+
+    def __init__(self, primary, secondary):
+        self.primary = primary
+        self.secondary = secondary
+        self.name = f"{primary.name}+{secondary.name}"
+        self.fallbacks = 0
+
+    def query(self, vector, limit=5):
+        try:
+            return self.primary.query(vector, limit)
+        except Exception as e:
+            self.fallbacks += 1
+            print(f"Vector backend '{self.primary.name}' failed ({e}); answering from '{self.secondary.name}'.")
+            return self.secondary.query(vector, limit)
+
+    def hybrid_query(self, vector, query_text, limit=5):
+        try:
+            return self.primary.hybrid_query(vector, query_text, limit)
+        except Exception as e:
+            self.fallbacks += 1
+            print(f"Vector backend '{self.primary.name}' failed ({e}); answering from '{self.secondary.name}'.")
+            return self.secondary.hybrid_query(vector, query_text, limit)
+
+
+def backend_from_env(client_factory, collection_name, default_index_path=None):
+    """Build the configured backend. client_factory is only called when Qdrant is actually used."""
+    kind = os.getenv("VECTOR_BACKEND", BACKEND_QDRANT).lower()
+    index_path = os.getenv("LOCAL_INDEX_PATH", default_index_path or "")
+
+    if kind == BACKEND_LOCAL:
+        return LocalBackend(LocalVectorIndex.load(index_path))
+    if kind != BACKEND_QDRANT:
+        raise ValueError(f"Unknown VECTOR_BACKEND '{kind}'. Use '{BACKEND_QDRANT}' or '{BACKEND_LOCAL}'.")
+
+    qdrant = QdrantBackend(client_factory(), collection_name, search_params=quantization_search_params())
+    if LocalVectorIndex.exists(index_path):
+        return FallbackBackend(qdrant, LocalBackend(LocalVectorIndex.load(index_path)))
+    return qdrant
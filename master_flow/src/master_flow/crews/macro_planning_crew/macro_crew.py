@@ -1,6 +1,8 @@
 import os
 from crewai import Agent, Crew, Task, LLM
 from crewai.project import CrewBase, agent, crew, task
+from master_flow.core.llm_scheduler import rate_limited, PRIORITY_MACRO
+from master_flow.core.llm_cache import cached, get_completion_cache
 from master_flow.model.macro_models import Blueprint
 from master_flow.tools.search_tools import search_syllabi, web_syllabus_search
 
@@ -11,11 +13,12 @@ class MacroPlanningCrew():
     tasks_config = 'config/macro_tasks.yaml'
 
     def get_llm(self) -> LLM:
-        return LLM(
+        # All crews share one process-wide Gemini RPM/TPM budget instead of a max_rpm each
+        return cached(rate_limited(LLM(
             model="gemini/gemini-2.5-flash", 
             api_key=os.getenv("GEMINI_API_KEY"),
             temperature=0.5
-        )
+        ), priority=PRIORITY_MACRO), get_completion_cache())
 
     @agent
     def architect(self) -> Agent:
@@ -40,6 +43,5 @@ class MacroPlanningCrew():
             agents=[self.architect()],
             tasks=[self.blueprint_task()],
             verbose=True,
-            output_log_file="macro_planning.log",
-            max_rpm=15
+            output_log_file="macro_planning.log"
         )
@@ -1,12 +1,15 @@
 import os
 from crewai import Agent, Crew, Task, LLM
 from crewai.project import CrewBase, agent, crew, task
+from master_flow.core.llm_scheduler import rate_limited, PRIORITY_MICRO
+from master_flow.core.llm_cache import cached, get_completion_cache
 from master_flow.model.micro_models import MacroNodeContent, FullScrapeResult
-from crewai_tools import TavilySearchTool
+from master_flow.tools.search_tools import PooledTavilySearchTool
 
 os.environ["OPENAI_API_KEY"] = "sk-dummy-key-to-bypass-pydantic-bug"
 # 2. Initialize the Tools WITH the configuration
-tavily_tool = TavilySearchTool() # Tavily doesn't use an internal LLM, just its own API key
+# Shared by every concurrent micro crew: one keep-alive pool and result cache instead of a client per search
+tavily_tool = PooledTavilySearchTool() # Tavily doesn't use an internal LLM, just its own API key
 
 @CrewBase
 class MicroLearningCrew():
@@ -15,11 +18,12 @@ class MicroLearningCrew():
     tasks_config = 'config/micro_tasks.yaml'
 
     def get_llm(self) -> LLM:
-        return LLM(
+        # Node crews run concurrently, so they queue behind macro planning on the shared Gemini quota
+        return cached(rate_limited(LLM(
             model="gemini/gemini-2.5-flash", 
             api_key=os.getenv("GEMINI_API_KEY"),
             temperature=0.5
-        )
+        ), priority=PRIORITY_MICRO), get_completion_cache())
 
     @agent
     def scraper(self) -> Agent:
@@ -73,6 +77,5 @@ class MicroLearningCrew():
             agents=[self.scraper(), self.educator(), self.estimator()],
             tasks=[self.scrape_task(), self.educate_task(), self.estimate_and_compile_task()],
             verbose=True,
-            output_log_file="micro_learning.log",
-            max_rpm=15
+            output_log_file="micro_learning.log"
         )
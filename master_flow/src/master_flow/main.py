@@ -8,20 +8,50 @@ import asyncio
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from crewai.flow.flow import Flow, start, listen, router, or_
-from crewai.flow.persistence import persist
+from crewai.flow.persistence import persist, SQLiteFlowPersistence
 
 # Import the SystemState from the model folder
 from master_flow.model.system_state import SystemState
+from master_flow.model.macro_models import Blueprint
 
 # Import the crews
 from master_flow.crews.macro_planning_crew.macro_crew import MacroPlanningCrew
 from master_flow.crews.micro_learning_crew.micro_crew import MicroLearningCrew
+from master_flow.core.progress import progress_bus
+from master_flow.core.dag import dag_problems, topological_order
+from master_flow.core.json_extract import extract_json
+from master_flow.core.telemetry import install_crew_telemetry
+
+# How many micro crews may run at once; each one is three agents
+NODE_CONCURRENCY = max(1, int(os.getenv("MASTER_FLOW_NODE_CONCURRENCY", "3")))
+
+# Bounds on suggested_micro_topics per node, as the Blueprint schema asks of the architect
+MICRO_TOPICS_PER_NODE = (3, 10)
+
+# Crew, task, agent, LLM and tool spans for /metrics, tagged with the bound session id
+install_crew_telemetry()
 
 @persist()
 class MasterFlow(Flow[SystemState]):
     
+    def _checkpoint(self, method_name, state=None):
+        """Persist state mid-method; @persist() only saves once a whole step has returned."""
+        try:
+            SQLiteFlowPersistence().save_state(self.state.id, method_name, state if state is not None else self.state)
+        except Exception as e:
+            print(f"Warning: Could not checkpoint flow state. {e}")
+
+    async def _acheckpoint(self, method_name):
+        """_checkpoint from a coroutine: the state is copied on the loop, the SQLite write runs in a thread."""
+        await asyncio.to_thread(self._checkpoint, method_name, self.state.model_dump())
+
     @start()
     def execute_macro_planning(self):
+        if self.state.resume and self.state.blueprint and self.state.blueprint.get("nodes"):
+            print("--- RESUMING WITH PERSISTED BLUEPRINT ---")
+            progress_bus.publish(self.state.id, "blueprint", {"blueprint": self.state.blueprint})
+            return
+
         print(f"--- MACRO PLANNING CREW ACTIVATED ---")
         
         inputs = {
@@ -63,16 +93,9 @@ class MasterFlow(Flow[SystemState]):
             elif result.json_dict:
                 self.state.blueprint = result.json_dict
             else:
-                raw_text = getattr(result, "raw", "")
-                if raw_text:
-                    import re
-                    match = re.search(r'\{.*\}', raw_text, re.DOTALL)
-                    if match:
-                        self.state.blueprint = json.loads(match.group(0))
-                    else:
-                        self.state.blueprint = {"nodes": []}
-                else:
-                    self.state.blueprint = {"nodes": []}
+                # The largest object in the raw reply that validates as a Blueprint
+                blueprint = extract_json(getattr(result, "raw", ""), Blueprint.model_validate)
+                self.state.blueprint = blueprint.model_dump() if blueprint else {"nodes": []}
         except Exception as e:
             print(f"Warning: Could not extract architect blueprint. {e}")
             self.state.blueprint = {"nodes": []}
@@ -86,12 +109,37 @@ class MasterFlow(Flow[SystemState]):
             print(f"Warning: Could not write final blueprint to {final_blueprint_path}: {e}")
 
         print("--- BLUEPRINT GENERATED BY ARCHITECT ---")
+        # Checked in code rather than by another agent; process_all_nodes already orders nodes and
+        # tolerates dangling prerequisites and cycles, so problems are reported, not fatal
+        problems = dag_problems(self.state.blueprint.get("nodes", []), *MICRO_TOPICS_PER_NODE)
+        for problem in problems:
+            print(f"Warning: blueprint problem: {problem}")
+        progress_bus.publish(self.state.id, "blueprint", {"blueprint": self.state.blueprint, "problems": problems})
 
     @listen(execute_macro_planning)
     async def process_all_nodes(self):
-        """Process all nodes concurrently using async kickoff."""
+        """Generate node content NODE_CONCURRENCY micro crews at a time, each node after its prerequisites."""
         blueprint_data = self.state.blueprint # This is the dict saved from Macro Crew
-        pending_nodes = blueprint_data.get("nodes", [])
+        nodes = blueprint_data.get("nodes", [])
+        # Content, checkpoints and resume are all keyed by node_id; dag_problems has already reported these
+        skipped = [node.get("title", "untitled") for node in nodes if not node.get("node_id")]
+        if skipped:
+            print(f"Warning: skipping {len(skipped)} blueprint nodes without a node_id: {', '.join(map(str, skipped))}")
+        ordered_nodes = topological_order([node for node in nodes if node.get("node_id")])
+        node_ids = {node['node_id'] for node in ordered_nodes}
+
+        if self.state.resume:
+            # Keep whatever finished last time and only regenerate missing or failed nodes
+            self.state.completed_modules = [m for m in self.state.completed_modules if m.get('node_id') in node_ids]
+            done = {m.get('node_id') for m in self.state.completed_modules}
+            self.state.node_status = {k: v for k, v in self.state.node_status.items() if k in done}
+        else:
+            self.state.completed_modules = []
+            self.state.node_status = {}
+            done = set()
+        pending_nodes = [node for node in ordered_nodes if node['node_id'] not in done]
+        if done:
+            print(f"--- RESUMING: {len(done)} NODES REUSED, {len(pending_nodes)} TO GENERATE ---")
         
         async def process_single_node(node):
             print(f"--- GENERATING CONTENT FOR (ASYNC): {node['title']} ---")
@@ -105,18 +153,78 @@ class MasterFlow(Flow[SystemState]):
             try:
                 result = await MicroLearningCrew().crew().akickoff(inputs=inputs)
                 if result.pydantic:
-                    return result.pydantic.model_dump()
+                    content = result.pydantic.model_dump()
                 elif result.json_dict:
-                    return result.json_dict
+                    content = result.json_dict
                 else:
                     print(f"Warning: No valid pydantic output from Micro Crew for {node['title']}")
+                    self.state.node_status[node['node_id']] = "failed"
+                    progress_bus.publish(self.state.id, "node_failed", {"node_id": node['node_id'], "title": node['title'], "message": "No valid output from Micro Crew"})
                     return None
+                self.state.node_status[node['node_id']] = "completed"
+                progress_bus.publish(self.state.id, "node_completed", {"node_id": node['node_id'], "title": node['title'], "content": content})
+                return content
             except Exception as e:
                 print(f"Error processing node {node['title']}: {e}")
+                self.state.node_status[node['node_id']] = "failed"
+                progress_bus.publish(self.state.id, "node_failed", {"node_id": node['node_id'], "title": node['title'], "message": str(e)})
                 return None
 
-        results = await asyncio.gather(*[process_single_node(n) for n in pending_nodes])
-        self.state.completed_modules = [r for r in results if r is not None]
+        # A node is only queued once every prerequisite ahead of it in pending_nodes has finished; resumed
+        # and unknown prerequisites count as met. Counting only earlier prerequisites breaks cycles the same
+        # way topological_order does. A failed prerequisite still releases its dependents, since a micro
+        # crew is never given its prerequisites' content
+        position = {}
+        for i, node in enumerate(pending_nodes):
+            position.setdefault(node['node_id'], i)
+        waiting_on = [0] * len(pending_nodes)
+        dependents = [[] for _ in pending_nodes]
+        for i, node in enumerate(pending_nodes):
+            for prereq in set(node.get('prerequisites') or []):
+                j = position.get(prereq)
+                if j is not None and j < i:
+                    dependents[j].append(i)
+                    waiting_on[i] += 1
+
+        ready = asyncio.Queue()
+        for i, count in enumerate(waiting_on):
+            if count == 0:
+                ready.put_nowait(i)
+        workers = min(NODE_CONCURRENCY, len(pending_nodes))
+        unfinished = len(pending_nodes)
+
+        # One checkpoint at a time, so an older snapshot never lands after a newer one
+        checkpoint_lock = asyncio.Lock()
+
+        async def worker():
+            nonlocal unfinished
+            while True:
+                i = await ready.get()
+                if i is None:
+                    return
+                try:
+                    content = await process_single_node(pending_nodes[i])
+                    if content is not None:
+                        # Visible in state as soon as it's done rather than after the slowest node
+                        self.state.completed_modules.append(content)
+                    # Checkpoint per node so a crash or failure only costs the unfinished nodes
+                    async with checkpoint_lock:
+                        await self._acheckpoint("process_all_nodes")
+                finally:
+                    # Even if the checkpoint raised, so the other workers aren't left waiting
+                    for dependent in dependents[i]:
+                        waiting_on[dependent] -= 1
+                        if waiting_on[dependent] == 0:
+                            ready.put_nowait(dependent)
+                    unfinished -= 1
+                    if unfinished == 0:
+                        for _ in range(workers):
+                            ready.put_nowait(None)
+
+        await asyncio.gather(*[worker() for _ in range(workers)])
+
+        order = {node['node_id']: i for i, node in enumerate(ordered_nodes)}
+        self.state.completed_modules.sort(key=lambda module: order.get(module.get('node_id'), len(order)))
 
     @listen(process_all_nodes)
     def finish_course(self):
@@ -126,7 +234,9 @@ class MasterFlow(Flow[SystemState]):
             "status": "complete", 
             "reply": reply, 
             "blueprint": self.state.blueprint,
-            "course_content": self.state.completed_modules
+            "course_content": self.state.completed_modules,
+            # Resubmit the session with resume enabled to regenerate just these
+            "failed_nodes": [node_id for node_id, status in self.state.node_status.items() if status == "failed"]
         }
 
 def kickoff():
@@ -22,4 +22,8 @@ class SystemState(BaseModel):
     # --- MICRO LEARNING FIELDS ---
     pending_nodes: list = []
     completed_modules: list = []
+    # node_id -> "completed" | "failed", checkpointed as each micro crew finishes
+    node_status: Dict[str, str] = {}
+    # When set, reuse the persisted blueprint and finished nodes instead of starting over
+    resume: bool = False
     chat_history: list = []
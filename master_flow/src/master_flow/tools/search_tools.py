@@ -1,13 +1,28 @@
 import os
 import json
-from crewai.tools import tool
+import asyncio
+import sqlite3
+import threading
+from typing import Literal, Type
+from pydantic import BaseModel, Field
+from crewai.tools import BaseTool, tool
 from qdrant_client import QdrantClient
-from sentence_transformers import SentenceTransformer
-from tavily import TavilyClient
+from master_flow.core import tavily_client
+from master_flow.core.embedding_backends import load_sentence_transformer
+from master_flow.core.embedding_cache import cache_from_env
+from master_flow.core.embedding_service import EmbeddingServiceClient
+from master_flow.core.ttl_cache import SQLiteTTLCache, make_key
+from master_flow.core.vector_backends import backend_from_env
+from master_flow.core.sparse import lexical_match
+
+EMBEDDING_MODEL_NAME = 'BAAI/bge-small-en-v1.5'
 
 # We use a getter for clients to avoid crushing the process if env vars are missing at startup
 _qdrant_client = None
 _embedding_model = None
+_query_embedding_cache = None
+_tavily_cache = None
+_vector_backend = None
 
 def get_qdrant_client():
     global _qdrant_client
@@ -18,12 +33,108 @@ def get_qdrant_client():
         )
     return _qdrant_client
 
+def get_vector_backend():
+    # Qdrant by default (falling back to LOCAL_INDEX_PATH when it exists), or VECTOR_BACKEND=local
+    global _vector_backend
+    if _vector_backend is None:
+        _vector_backend = backend_from_env(get_qdrant_client, "course_materials")
+    return _vector_backend
+
 def get_embedding_model():
+    # EMBEDDING_SERVICE_URL shares one batched model across every worker on the host;
+    # otherwise EMBEDDING_BACKEND picks torch, onnx or onnx-int8 for the in-process model
     global _embedding_model
     if _embedding_model is None:
-        _embedding_model = SentenceTransformer('BAAI/bge-small-en-v1.5')
+        service_url = os.getenv("EMBEDDING_SERVICE_URL")
+        if service_url:
+            _embedding_model = EmbeddingServiceClient(service_url)
+        else:
+            _embedding_model = load_sentence_transformer(EMBEDDING_MODEL_NAME)
     return _embedding_model
 
+def get_query_embedding_cache():
+    # Agents re-issue near-identical queries constantly; reuse their vectors instead of re-encoding
+    global _query_embedding_cache
+    if _query_embedding_cache is None:
+        _query_embedding_cache = cache_from_env(lambda text: get_embedding_model().encode(text), EMBEDDING_MODEL_NAME)
+    return _query_embedding_cache
+
+def get_tavily_cache():
+    # Shared on-disk cache so every uvicorn worker on this host reuses Tavily results
+    global _tavily_cache
+    if _tavily_cache is None:
+        project_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+        _tavily_cache = SQLiteTTLCache(
+            os.getenv("TAVILY_CACHE_PATH", os.path.join(project_dir, ".cache", "tavily.sqlite3")),
+            table="tavily_search",
+            ttl_seconds=int(os.getenv("TAVILY_CACHE_TTL_SECONDS", "86400")),
+            max_entries=int(os.getenv("TAVILY_CACHE_MAX_ENTRIES", "5000"))
+        )
+    return _tavily_cache
+
+def _tavily_cache_key(query: str, search_depth: str, max_results: int) -> str:
+    return make_key("tavily", " ".join(query.lower().split()), search_depth, max_results)
+
+def _cache_get(cache, key: str):
+    # A locked or unreadable cache file costs a Tavily call, not the search
+    try:
+        return cache.get(key)
+    except sqlite3.Error as e:
+        print(f"Warning: Tavily cache read failed, searching directly. {e}")
+        return None
+
+def _cache_set(cache, key: str, response: dict):
+    if not (response and response.get("results")):
+        return
+    try:
+        cache.set(key, response)
+    except sqlite3.Error as e:
+        print(f"Warning: Could not cache Tavily results. {e}")
+
+def cached_tavily_search(api_key: str, query: str, search_depth: str, max_results: int) -> dict:
+    """Tavily search keyed by (query, depth, max_results); only non-empty responses are cached."""
+    cache = get_tavily_cache()
+    key = _tavily_cache_key(query, search_depth, max_results)
+    cached = _cache_get(cache, key)
+    if cached is not None:
+        return cached
+
+    response = tavily_client.search(api_key, query, search_depth=search_depth, max_results=max_results)
+    _cache_set(cache, key, response)
+    return response
+
+async def acached_tavily_search(api_key: str, query: str, search_depth: str, max_results: int) -> dict:
+    """Awaitable twin of cached_tavily_search for callers already on an event loop."""
+    cache = get_tavily_cache()
+    key = _tavily_cache_key(query, search_depth, max_results)
+    # SQLite reads and writes block (up to the busy timeout when locked), so they run off the loop
+    cached = await asyncio.to_thread(_cache_get, cache, key)
+    if cached is not None:
+        return cached
+
+    response = await tavily_client.asearch(api_key, query, search_depth=search_depth, max_results=max_results)
+    await asyncio.to_thread(_cache_set, cache, key, response)
+    return response
+
+def _web_syllabus_query(skill_query: str) -> str:
+    # We prompt Tavily to find step-by-step learning roadmaps or course syllabi
+    return f"Best learning roadmap or complete step-by-step course syllabus for {skill_query} 2026"
+
+def _format_web_syllabus(skill_query: str, response: dict) -> str:
+    if not response or not response.get("results"):
+        return f"No web results found for {skill_query}."
+        
+    formatted_results = [f"Found {len(response['results'])} relevant articles. Use this information to construct a standard learning curriculum for {skill_query}, and MAKE SURE to include the URLs as references:"]
+    
+    for idx, result in enumerate(response["results"]):
+        title = result.get("title", "Unknown Title")
+        url = result.get("url", "")
+        content = result.get("content", "")[:1000] # Take first 1000 characters of each top result
+        
+        formatted_results.append(f"\n--- Source {idx+1} ---\nTitle: {title}\nURL: {url}\nContent Snippet: {content}")
+        
+    return "\n".join(formatted_results)
+
 @tool("Web Syllabus Search")
 def web_syllabus_search(skill: str) -> str:
     """Fetches course syllabus and curriculum steps from the web when local database fails. Use this to find the live industry standard roadmap for a skill."""
@@ -34,55 +145,102 @@ def web_syllabus_search(skill: str) -> str:
         return "ERROR: TAVILY_API_KEY is not set in the environment. Cannot perform web search."
         
     try:
-        tavily = TavilyClient(api_key=tavily_key)
-        # We prompt Tavily to find step-by-step learning roadmaps or course syllabi
-        response = tavily.search(query=f"Best learning roadmap or complete step-by-step course syllabus for {skill_query} 2026", search_depth="advanced", max_results=3)
-        
-        if not response or not response.get("results"):
-            return f"No web results found for {skill_query}."
-            
-        formatted_results = [f"Found {len(response['results'])} relevant articles. Use this information to construct a standard learning curriculum for {skill_query}, and MAKE SURE to include the URLs as references:"]
-        
-        for idx, result in enumerate(response["results"]):
-            title = result.get("title", "Unknown Title")
-            url = result.get("url", "")
-            content = result.get("content", "")[:1000] # Take first 1000 characters of each top result
-            
-            formatted_results.append(f"\n--- Source {idx+1} ---\nTitle: {title}\nURL: {url}\nContent Snippet: {content}")
-            
-        return "\n".join(formatted_results)
+        response = cached_tavily_search(tavily_key, _web_syllabus_query(skill_query), search_depth="advanced", max_results=3)
+        return _format_web_syllabus(skill_query, response)
     except Exception as e:
         return f"Error retrieving web results for {skill_query}: {e}"
 
+class TavilySearchInput(BaseModel):
+    query: str = Field(..., description="The search query to send to Tavily.")
+    search_depth: Literal["basic", "advanced"] = Field("basic", description="Use 'advanced' only when basic results are poor.")
+    max_results: int = Field(5, description="Maximum number of results to return.")
+
+class PooledTavilySearchTool(BaseTool):
+    """Drop-in for crewai_tools' TavilySearchTool that reuses the process-wide connection pool and result cache."""
+    name: str = "Tavily Search"
+    description: str = "Searches the web with Tavily and returns titles, URLs and short content snippets for the query."
+    args_schema: Type[BaseModel] = TavilySearchInput
+
+    def _format(self, response: dict) -> str:
+        results = [
+            {"title": r.get("title", ""), "url": r.get("url", ""), "content": (r.get("content") or "")[:500]}
+            for r in (response or {}).get("results", [])
+        ]
+        return json.dumps({"query": (response or {}).get("query"), "results": results}, ensure_ascii=False)
+
+    def _run(self, query: str, search_depth: str = "basic", max_results: int = 5) -> str:
+        tavily_key = os.getenv("TAVILY_API_KEY")
+        if not tavily_key:
+            return "ERROR: TAVILY_API_KEY is not set."
+        try:
+            return self._format(cached_tavily_search(tavily_key, query, search_depth, max_results))
+        except Exception as e:
+            return f"Error retrieving Tavily results for {query}: {e}"
+
+    async def _arun(self, query: str, search_depth: str = "basic", max_results: int = 5) -> str:
+        tavily_key = os.getenv("TAVILY_API_KEY")
+        if not tavily_key:
+            return "ERROR: TAVILY_API_KEY is not set."
+        try:
+            return self._format(await acached_tavily_search(tavily_key, query, search_depth, max_results))
+        except Exception as e:
+            return f"Error retrieving Tavily results for {query}: {e}"
+
+# Dense + BM25 fused retrieval; set HYBRID_SEARCH=false for the old dense-only behaviour
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+
+# How often the local database answers versus sending agents to the web fallback
+syllabus_search_stats = {"queries": 0, "answered_locally": 0, "lexical_rescues": 0, "not_found": 0}
+_search_stats_lock = threading.Lock()
+
+def _count_search(key: str):
+    with _search_stats_lock:
+        syllabus_search_stats[key] += 1
+
+def _syllabus_text(payload: dict) -> str:
+    # Slim ingestions (INGEST_DROP_PAYLOAD_FIELDS=text) don't store the pre-joined text
+    if payload.get('text'):
+        return payload['text']
+    skills = payload.get('skills', [])
+    skills_str = ", ".join(skills) if isinstance(skills, list) else str(skills or "")
+    return f"Provider: {payload.get('provider', '')}\nSkills: {skills_str}\n{payload.get('syllabus', '')}"
+
 @tool("Qdrant Syllabus Search")
 def search_syllabi(query: str) -> str:
     """Searches the Qdrant database for top course syllabi matching the skill query."""
     query_str = query.get("query", query) if isinstance(query, dict) else query
     
     try:
-        model = get_embedding_model()
-        client = get_qdrant_client()
+        backend = get_vector_backend()
         
-        vector = model.encode(query_str).tolist()
-        results = client.query_points(
-            collection_name="course_materials",
-            query=vector,
-            limit=5
-        ).points
+        vector = get_query_embedding_cache().get(query_str)
+        _count_search("queries")
+        if HYBRID_SEARCH:
+            results = backend.hybrid_query(vector, query_str, limit=5)
+        else:
+            results = backend.query(vector, limit=5)
 
         formatted_results = []
+        lexical_rescue = False
         for res in results:
             # Only accept highly confident matches! Adjust the threshold based on your model's typical scores.
-            if hasattr(res, 'score') and res.score < 0.60:
-                continue
+            # Exact skill names matched lexically in the course name/skills are accepted regardless.
+            if res.score is None or res.score < 0.60:
+                if not lexical_match(query_str, res.payload):
+                    continue
+                lexical_rescue = True
                 
             # Note: mapping 'course_name' based on vector_store payload, or default to 'name'
             name_val = res.payload.get('course_name') or res.payload.get('name')
-            formatted_results.append(f"Course: {name_val}\nLevel: {res.payload.get('level')}\nSyllabus: {res.payload.get('text')}")
+            formatted_results.append(f"Course: {name_val}\nLevel: {res.payload.get('level')}\nSyllabus: {_syllabus_text(res.payload)}")
             
         if not formatted_results:
+            _count_search("not_found")
             return "ERROR_NOT_FOUND: The local database does not contain this skill or no high-confidence match. You MUST use the 'Web Syllabus Search' tool instead."
             
+        _count_search("answered_locally")
+        if lexical_rescue:
+            _count_search("lexical_rescues")
         return "\n\n---\n\n".join(formatted_results)
     except Exception as e:
         return f"ERROR_DATABASE_FAILURE: Qdrant database error: {e}. You MUST fall back to using the 'Web Syllabus Search' tool immediately."
@@ -0,0 +1,89 @@
+"""Check that the core modules shared by the two APIs are still the same code.
+
+The amls API (amls-root/apps/api, imported as `core.*`) and MasterFlow
+(master_flow/src, imported as `master_flow.core.*`) are deployed and run
+separately, neither is an installable package the other could depend on, so
+the infrastructure modules they share are kept as copies. This script is
+what keeps them copies: after rewriting `master_flow.core.` imports to
+`core.`, each pair must be identical apart from lines ending in `# per-app`
+(paths relative to each app, and where the session context variable lives).
+tavily_client.py is not checked: MasterFlow also needs its asyncio half,
+which the amls copy doesn't carry.
+
+Usage (from the repository root):
+    python scripts/check_core_sync.py            # exit 1 and print a diff on drift
+    python scripts/check_core_sync.py --list     # the modules that are checked
+
+Make a fix in one copy, then mirror it into the other before committing.
+"""
+import argparse
+import difflib
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AMLS_CORE = os.path.join(ROOT, "amls-root", "apps", "api", "core")
+MASTER_FLOW_CORE = os.path.join(ROOT, "master_flow", "src", "master_flow", "core")
+
+SHARED_MODULES = (
+    "dag.py",
+    "embedding_backends.py",
+    "embedding_cache.py",
+    "json_extract.py",
+    "llm_cache.py",
+    "llm_scheduler.py",
+    "local_index.py",
+    "sparse.py",
+    "telemetry.py",
+    "ttl_cache.py",
+    "vector_backends.py",
+)
+
+PER_APP_MARKER = "# per-app"
+
+
+def _normalized(path, rewrite_imports):
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    if rewrite_imports:
+        lines = [line.replace("master_flow.core.", "core.") for line in lines]
+    return [line for line in lines if not line.rstrip().endswith(PER_APP_MARKER)]
+
+
+def drift(module):
+    """Unified diff between the two copies of module, empty when they agree."""
+    amls_path = os.path.join(AMLS_CORE, module)
+    master_flow_path = os.path.join(MASTER_FLOW_CORE, module)
+    missing = [path for path in (amls_path, master_flow_path) if not os.path.exists(path)]
+    if missing:
+        return [f"missing: {os.path.relpath(path, ROOT)}" for path in missing]
+    return list(difflib.unified_diff(
+        _normalized(amls_path, False), _normalized(master_flow_path, True),
+        fromfile=os.path.relpath(amls_path, ROOT), tofile=os.path.relpath(master_flow_path, ROOT), lineterm=""
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--list", action="store_true", help="Print the checked modules and exit.")
+    args = parser.parse_args()
+
+    if args.list:
+        print("\n".join(SHARED_MODULES))
+        return 0
+
+    out_of_sync = 0
+    for module in SHARED_MODULES:
+        diff = drift(module)
+        if diff:
+            out_of_sync += 1
+            print("\n".join(diff))
+    if out_of_sync:
+        print(f"{out_of_sync} of {len(SHARED_MODULES)} shared core modules differ between the two APIs.")
+        return 1
+    print(f"All {len(SHARED_MODULES)} shared core modules are in sync.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())